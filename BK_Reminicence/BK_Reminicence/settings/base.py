@@ -10,7 +10,11 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import functools
 import json
+import os
+import tempfile
+from datetime import timedelta
 from pathlib import Path
 from django.core.exceptions import ImproperlyConfigured
 import warnings
@@ -23,9 +27,16 @@ BASE_DIR = Path(__file__).resolve().parent.parent.parent
 # See https://docs.djangoproject.com/en/5.2/howto/deployment/checklist/
 
 # SECURITY WARNING: keep the secret key used in production secret!
-with open ("secret.json") as f:
-    secret=json.loads(f.read())
-def get_secret(secret_name, secrets=secret):
+# secret.json se lee una sola vez por proceso, aunque varios módulos de
+# settings (o el código de la aplicación) pidan secretos.
+@functools.lru_cache(maxsize=None)
+def load_secrets(path=BASE_DIR / 'secret.json'):
+    with open(path) as f:
+        return json.load(f)
+
+def get_secret(secret_name, secrets=None):
+    if secrets is None:
+        secrets = load_secrets()
     try:
         return secrets[secret_name]
     except KeyError:
@@ -34,6 +45,10 @@ def get_secret(secret_name, secrets=secret):
     
 SECRET_KEY = get_secret("SECRET KEY")
 
+# Credenciales de la aplicación en Spotify (flujo OAuth y client credentials).
+SPOTIFY_CLIENT_ID = get_secret("SPOTIFY_CLIENT_ID")
+SPOTIFY_CLIENT_SECRET = get_secret("SPOTIFY_CLIENT_SECRET")
+
 # Application definition
 
 DJANGO_APPS = (
@@ -50,19 +65,26 @@ LOCAL_APPS = (
     'applications.core',
     'applications.users',
     'applications.spotify_api',
-    'applications.auditing'
+    'applications.auditing',
+    'applications.api',
 )
 
-THIRD_PARTY_APPS = ()
+THIRD_PARTY_APPS = (
+    'rest_framework',
+    'django_filters',
+)
 
 INSTALLED_APPS = DJANGO_APPS + LOCAL_APPS + THIRD_PARTY_APPS
 
 MIDDLEWARE = [
+    'applications.core.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'applications.auditing.middleware.AuditMiddleware',
+    'applications.core.middleware.ActivityMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -71,7 +93,8 @@ ROOT_URLCONF = 'BK_Reminicence.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        # Backend de Django instrumentado: suma el tiempo de renderizado a Server-Timing
+        'BACKEND': 'applications.core.instrumentation.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -91,6 +114,146 @@ STATIC_URL = 'static/'
 
 STATICFILES_DIRS = [BASE_DIR / "static"]
 
+# Caché compartida por todos los workers y procesos (web, tareas en segundo
+# plano, run_sync_scheduler): versiones de la biblioteca, índices, tokens de
+# acceso, bloqueos. Con más de un proceso hace falta Redis (REDIS_URL): con la
+# caché en memoria cada proceso tiene la suya y las invalidaciones no llegan a
+# los demás. Sin REDIS_URL (desarrollo con runserver) se usa la de memoria.
+REDIS_URL = os.environ.get('REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': REDIS_URL,
+            'OPTIONS': {
+                'CLIENT_CLASS': 'django_redis.client.DefaultClient',
+            },
+            'KEY_PREFIX': 'reminicence',
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'reminicence',
+        }
+    }
+
+# Miniaturas de portadas generadas por el proxy de imágenes (core:image_proxy)
+# El comando prune_image_cache (p. ej. desde cron) borra lo usado hace más
+# tiempo hasta dejar la caché en IMAGE_CACHE_MAX_BYTES. Cada uso renueva la
+# fecha del archivo como mucho una vez cada IMAGE_CACHE_TOUCH_INTERVAL segundos.
+IMAGE_CACHE_DIR = BASE_DIR / 'media' / 'image_cache'
+IMAGE_CACHE_MAX_BYTES = 2 * 1024 ** 3
+IMAGE_CACHE_TOUCH_INTERVAL = 60 * 60 * 24
+
+# Segundos que se conserva el fragmento renderizado de "Tu biblioteca" en el sidebar.
+# Se invalida antes si la sincronización detecta cambios en las playlists.
+SIDEBAR_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Raíz de la Web API de Spotify. Los benchmarks y pruebas de carga la apuntan
+# al servidor local de applications/spotify_api/stub.py (la variable de entorno
+# permite arrancar los workers de la aplicación contra el stub).
+SPOTIFY_API_PREFIX = os.environ.get('SPOTIFY_API_PREFIX', 'https://api.spotify.com/v1/')
+
+# Un worker no debe quedarse más de unos segundos esperando a Spotify: timeout
+# corto, un solo reintento y circuit breaker por grupo de endpoints
+# (core:circuit_breaker). Con el circuito abierto se sirve la última respuesta
+# buena de cada usuario, que se conserva SPOTIFY_STALE_TTL segundos.
+SPOTIFY_REQUESTS_TIMEOUT = 3
+SPOTIFY_RETRIES = 1
+SPOTIFY_STALE_TTL = 60 * 60 * 24
+SPOTIFY_CIRCUIT_BREAKER = {
+    'window': 20,
+    'min_calls': 5,
+    'failure_rate': 0.5,
+    'slow_call_seconds': 2.0,
+    'reset_timeout': 30,
+}
+
+# Dashboard (core:dashboard): segundos que un snapshot se considera fresco antes de
+# refrescarlo en segundo plano, tiempo máximo que se espera a un refresco y
+# segundos que se cachean los conteos del panel de estadísticas.
+DASHBOARD_FRESHNESS = 60 * 5
+DASHBOARD_REFRESH_TIMEOUT = 60
+DASHBOARD_STATS_TIMEOUT = 60
+
+# Hilos del pool de tareas en segundo plano de cada worker (core:background).
+BACKGROUND_WORKERS = 4
+
+# Sincronización de favoritos (music:sync_service): cada cuántos segundos se
+# recorren todas las canciones guardadas para detectar las que se quitaron.
+# Entre tanto solo se piden las nuevas (una petición si no hay cambios).
+FAVORITES_RECONCILE_INTERVAL = 60 * 60 * 24 * 7
+
+# Sincronización automática (music:scheduler, comando run_sync_scheduler). El
+# intervalo de cada usuario (segundos) se reduce a la mitad cuando la
+# sincronización trae cambios y se duplica cuando no, entre min_interval y
+# max_interval; quien usó la web en las últimas active_window nunca espera más
+# de active_interval. La actividad se registra como mucho una vez cada
+# activity_resolution por usuario. Cada pasada toma hasta batch_size usuarios
+# vencidos y los sincroniza con workers hilos; lease es cuánto queda reservado
+# un usuario mientras se sincroniza (si el proceso muere, se reintenta después).
+SYNC_SCHEDULER = {
+    'min_interval': 60 * 15,
+    'active_interval': 60 * 60,
+    'max_interval': 60 * 60 * 24 * 7,
+    'active_window': 60 * 60 * 24,
+    'activity_resolution': 60 * 5,
+    'change_rate_alpha': 0.3,
+    'jitter': 0.1,
+    'batch_size': 20,
+    'workers': 4,
+    'lease': 60 * 30,
+}
+
+# Reserva de sincronización completa por usuario (music:sync_lease): la
+# sincronización renueva su latido como mucho cada SYNC_LEASE_HEARTBEAT
+# segundos mientras avanza; sin latido durante SYNC_LEASE_TIMEOUT se da por
+# perdida (el worker se reinició) y se permite empezar otra.
+SYNC_LEASE_HEARTBEAT = 30
+SYNC_LEASE_TIMEOUT = 60 * 5
+
+# Índice de la biblioteca por usuario (music:library_index): segundos que se
+# conserva serializado en la caché y cuántos índices ya deserializados guarda
+# cada worker en memoria.
+LIBRARY_INDEX_TIMEOUT = 60 * 60 * 24
+LIBRARY_INDEX_LOCAL_ENTRIES = 32
+
+# Importación del historial extendido de Spotify (music:history_import): tamaño
+# máximo del archivo subido y segundos que se conserva en la caché el desglose
+# de sus conteos. El estado y el bloqueo van en SpotifySyncLog/SyncLease.
+HISTORY_IMPORT_MAX_UPLOAD_SIZE = 500 * 1024 * 1024
+HISTORY_IMPORT_TIMEOUT = 60 * 60
+
+# API REST v1 (applications.api): solo JSON, misma sesión que la web,
+# paginación por cursor y filtros por campo con django-filter.
+REST_FRAMEWORK = {
+    'DEFAULT_AUTHENTICATION_CLASSES': [
+        'rest_framework.authentication.SessionAuthentication',
+    ],
+    'DEFAULT_PERMISSION_CLASSES': [
+        'rest_framework.permissions.IsAuthenticated',
+    ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+    ],
+    'DEFAULT_PAGINATION_CLASS': 'applications.api.pagination.ApiCursorPagination',
+    'DEFAULT_FILTER_BACKENDS': [
+        'django_filters.rest_framework.DjangoFilterBackend',
+    ],
+}
+
+# Token firmado del reproductor (spotify_api:player_token). Es de corta
+# duración porque no se puede revocar: identifica al usuario por sus claims,
+# sin consultar la sesión ni la tabla de usuarios.
+SIMPLE_JWT = {
+    'ACCESS_TOKEN_LIFETIME': timedelta(minutes=15),
+    'AUTH_HEADER_TYPES': ('Bearer',),
+    'UPDATE_LAST_LOGIN': False,
+}
+
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'users:login'
 LOGOUT_REDIRECT_URL = 'users:login'
@@ -116,6 +279,57 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Entorno en el que corre la aplicación; se guarda en cada registro de auditoría.
+ENVIRONMENT = os.environ.get('DJANGO_ENVIRONMENT', 'local')
+
+# Auditoría de requests (auditing:middleware). Los eventos se encolan en memoria
+# y un hilo por proceso los inserta por lotes de AUDIT_BATCH_SIZE o cada
+# AUDIT_FLUSH_INTERVAL segundos. Con la cola llena, un request espera como
+# mucho AUDIT_ENQUEUE_TIMEOUT segundos antes de descartar su evento.
+AUDIT_APPLICATION_NAME = 'reminicence'
+AUDIT_QUEUE_SIZE = 10000
+AUDIT_BATCH_SIZE = 500
+AUDIT_FLUSH_INTERVAL = 2.0
+AUDIT_ENQUEUE_TIMEOUT = 0.01
+AUDIT_EXCLUDED_PATHS = ('/static/', '/media/', '/img/', '/metrics')
+
+# Cabecera Server-Timing (core.middleware.PerformanceMiddleware). Expone tiempos
+# y conteos internos, así que fuera de DEBUG solo la reciben los usuarios staff
+# salvo que se active aquí.
+SERVER_TIMING_ENABLED = False
+
+# Métricas de Prometheus (core:metrics)
+# Cada worker vuelca sus métricas en METRICS_DIR; debe ser un directorio local
+# de ejecución (fuera de media/, que se sirve) compartido por todos los workers
+# del mismo host y vaciarse en cada despliegue.
+# /metrics solo responde a staff, a METRICS_ALLOWED_IPS y a quien envíe
+# "Authorization: Bearer <METRICS_TOKEN>" (el scraper de Prometheus).
+
+METRICS_DIR = Path(os.environ.get('METRICS_DIR', Path(tempfile.gettempdir()) / 'reminicence-metrics'))
+METRICS_FLUSH_INTERVAL = 5
+METRICS_ALLOWED_IPS = ()
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+
+# Logging
+# Los logs de las aplicaciones (sincronización, métricas por request) van a consola.
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'applications': {
+            'handlers': ['console'],
+            'level': 'INFO',
+        },
+    },
+}
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.2/topics/i18n/
 
@@ -132,6 +346,9 @@ USE_TZ = True
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Pruebas (manage.py test): crea también las tablas de los modelos managed = False.
+TEST_RUNNER = 'applications.core.test_runner.ManagedModelTestRunner'
+
 warnings.filterwarnings(
     'ignore',
     message='DateTimeField.*received a naive datetime',
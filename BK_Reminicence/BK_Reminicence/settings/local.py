@@ -30,10 +30,6 @@ MEDIA_ROOT = BASE_DIR / 'media'
 # SPOTIFY API CONFIGURATION
 # ==================================================
 
-SPOTIFY_CLIENT_ID = get_secret("SPOTIFY_CLIENT_ID")
-SPOTIFY_CLIENT_SECRET = get_secret("SPOTIFY_CLIENT_SECRET")
-
-
 SPOTIFY_REDIRECT_URI = 'http://127.0.0.1:8000/spotify/callback/'
 
 
@@ -1,5 +1,7 @@
 from .base import *
 
+ENVIRONMENT = 'production'
+
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
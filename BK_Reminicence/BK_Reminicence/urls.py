@@ -23,4 +23,6 @@ urlpatterns = [
     path('', include('applications.core.urls')),
     path('accounts/', include('applications.users.urls')),
     path('spotify/', include('applications.spotify_api.urls')),
+    path('auditing/', include('applications.auditing.urls')),
+    path('api/v1/', include('applications.api.urls')),
 ]
@@ -0,0 +1,25 @@
+# applications/api/pagination.py
+"""
+Paginación por cursor de la API: cada página es una consulta con
+``WHERE campo > cursor ORDER BY campo LIMIT n`` (sin ``COUNT`` ni ``OFFSET``),
+así que cuesta lo mismo la primera página que la milésima y no se repiten ni
+saltan filas si la tabla cambia entre páginas.
+"""
+
+from rest_framework.pagination import CursorPagination
+
+
+class ApiCursorPagination(CursorPagination):
+    """Ordena por la clave primaria; las vistas con otro orden lo declaran en ``ordering``."""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = 'pk'
+
+
+class PlaylistSongPagination(ApiCursorPagination):
+    ordering = ('position', 'id')
+
+
+class PlaybackPagination(ApiCursorPagination):
+    ordering = ('-playback_date', '-playback_id')
@@ -0,0 +1,114 @@
+# applications/api/serializers.py
+"""
+Serializadores de solo lectura de la API. Los anidados (álbum, artista,
+canción) salen de ``select_related``/``prefetch_related`` de cada vista, así
+que ninguno dispara consultas por fila.
+"""
+
+from rest_framework import serializers
+
+from applications.music.models import Albums, Artists, PlaybackHistory, Playlist, PlaylistSong, Songs
+
+
+class SparseFieldsMixin:
+    """
+    ``fields``: campos a conservar (``?fields=id,title``); los demás no se
+    calculan ni se envían. Solo aplica al serializador raíz de la respuesta.
+    """
+
+    def __init__(self, *args, fields=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if fields:
+            unknown = set(fields) - set(self.fields)
+            if unknown:
+                raise serializers.ValidationError({
+                    'fields': f"Campos desconocidos: {', '.join(sorted(unknown))}. "
+                              f"Disponibles: {', '.join(self.fields)}"
+                })
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
+
+
+class ArtistSummarySerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='artist_id')
+
+    class Meta:
+        model = Artists
+        fields = ('id', 'spotify_id', 'name')
+
+
+class AlbumSummarySerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(source='album_id')
+
+    class Meta:
+        model = Albums
+        fields = ('id', 'spotify_id', 'title', 'cover_image_url', 'release_year')
+
+
+class ArtistSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(source='artist_id')
+
+    class Meta:
+        model = Artists
+        fields = (
+            'id', 'spotify_id', 'name', 'image_url', 'popularity', 'followers', 'country',
+            'artist_type', 'formation_year', 'updated_at',
+        )
+
+
+class AlbumSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(source='album_id')
+    artist = ArtistSummarySerializer()
+
+    class Meta:
+        model = Albums
+        fields = (
+            'id', 'spotify_id', 'title', 'album_type', 'release_date', 'release_year', 'total_tracks',
+            'record_label', 'cover_image_url', 'artist', 'updated_at',
+        )
+
+
+class SongSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(source='song_id')
+    explicit = serializers.BooleanField(source='explicit_content')
+    album = AlbumSummarySerializer()
+    artist = ArtistSummarySerializer(source='album.artist')
+    genres = serializers.SlugRelatedField(slug_field='name', many=True, read_only=True)
+
+    class Meta:
+        model = Songs
+        fields = (
+            'id', 'spotify_id', 'title', 'duration', 'track_number', 'disc_number', 'isrc', 'popularity',
+            'explicit', 'preview_url', 'album', 'artist', 'genres',
+        )
+
+
+class PlaylistSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(source='playlist_id')
+    song_count = serializers.IntegerField()
+
+    class Meta:
+        model = Playlist
+        fields = (
+            'id', 'spotify_id', 'name', 'description', 'status', 'cover_image_url', 'song_count',
+            'is_synced_with_spotify', 'last_sync_date', 'updated_at',
+        )
+
+
+class PlaylistSongSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    song = SongSerializer()
+
+    class Meta:
+        model = PlaylistSong
+        fields = ('position', 'date_added', 'song')
+
+
+class PlaybackSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    id = serializers.IntegerField(source='playback_id')
+    played_at = serializers.DateTimeField(source='playback_date')
+    device_type = serializers.CharField(source='device.device_type')
+    song = SongSerializer()
+
+    class Meta:
+        model = PlaybackHistory
+        fields = ('id', 'played_at', 'completed', 'playback_duration', 'skipped', 'rating', 'device_type', 'song')
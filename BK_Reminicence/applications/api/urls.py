@@ -0,0 +1,18 @@
+from django.urls import include, path
+from rest_framework.routers import SimpleRouter
+
+from . import views
+
+app_name = 'api'
+
+router = SimpleRouter()
+router.register('playlists', views.PlaylistViewSet, basename='playlist')
+router.register(r'playlists/(?P<playlist_pk>\d+)/songs', views.PlaylistSongViewSet, basename='playlist-song')
+router.register('history', views.PlaybackViewSet, basename='playback')
+router.register('songs', views.SongViewSet, basename='song')
+router.register('albums', views.AlbumViewSet, basename='album')
+router.register('artists', views.ArtistViewSet, basename='artist')
+
+urlpatterns = [
+    path('', include(router.urls)),
+]
@@ -0,0 +1,142 @@
+# applications/api/views.py
+"""
+API REST v1 de solo lectura sobre la biblioteca del usuario (playlists,
+canciones de cada playlist, historial) y el catálogo (canciones, álbumes,
+artistas).
+
+Todas las respuestas GET llevan ``ETag`` y responden ``304`` a
+``If-None-Match``. Las de la biblioteca calculan la ETag a partir de la
+versión de la biblioteca (``core.library_cache``) antes de consultar la base
+de datos; las demás, a partir del cuerpo de la respuesta.
+"""
+
+import hashlib
+
+from django.db.models import Count
+from django.http import HttpResponseNotModified
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from rest_framework import mixins, viewsets
+
+from applications.core.library_cache import get_library_version
+from applications.music.models import Albums, Artists, PlaybackHistory, Playlist, PlaylistSong, Songs
+
+from . import pagination, serializers
+
+
+class NotModified(Exception):
+    """La ETag de la versión coincide con If-None-Match: se responde 304 sin consultar nada."""
+
+
+def _etag(*parts):
+    return '"%s"' % hashlib.md5('|'.join(str(part) for part in parts).encode()).hexdigest()
+
+
+class ApiViewSetMixin:
+    """Campos dispersos (``?fields=``) y peticiones condicionales para las vistas de la API."""
+    version_etag = None
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.request.query_params.get('fields')
+        if fields:
+            kwargs['fields'] = [name.strip() for name in fields.split(',') if name.strip()]
+        return super().get_serializer(*args, **kwargs)
+
+    def etag_version(self, request):
+        """Versión barata de los datos de la vista (sin consultar la base de datos), o None."""
+        return None
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.version_etag = None
+        if request.method in ('GET', 'HEAD'):
+            version = self.etag_version(request)
+            if version is not None:
+                self.version_etag = _etag(request.user.pk, version, request.get_full_path(), request.accepted_media_type)
+                if get_conditional_response(request, etag=self.version_etag) is not None:
+                    raise NotModified()
+
+    def handle_exception(self, exc):
+        if isinstance(exc, NotModified):
+            response = HttpResponseNotModified()
+            response['ETag'] = self.version_etag
+            return response
+        return super().handle_exception(exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if request.method not in ('GET', 'HEAD') or response.status_code not in (200, 304):
+            return response
+        patch_cache_control(response, private=True, no_cache=True)
+        if response.status_code == 304:
+            return response
+        if self.version_etag:
+            response['ETag'] = self.version_etag
+            return response
+        response.render()
+        response['ETag'] = '"%s"' % hashlib.md5(response.content).hexdigest()
+        return get_conditional_response(request, etag=response['ETag'], response=response)
+
+
+class LibraryViewSetMixin(ApiViewSetMixin):
+    def etag_version(self, request):
+        return get_library_version(request.user.pk)
+
+
+class PlaylistViewSet(LibraryViewSetMixin, viewsets.ReadOnlyModelViewSet):
+    """Playlists del usuario."""
+    serializer_class = serializers.PlaylistSerializer
+
+    def get_queryset(self):
+        return Playlist.objects.filter(user=self.request.user).annotate(song_count=Count('playlistsong'))
+
+
+class PlaylistSongViewSet(LibraryViewSetMixin, mixins.ListModelMixin, viewsets.GenericViewSet):
+    """Canciones de una playlist del usuario, en su orden."""
+    serializer_class = serializers.PlaylistSongSerializer
+    pagination_class = pagination.PlaylistSongPagination
+
+    def get_queryset(self):
+        playlist = get_object_or_404(Playlist, pk=self.kwargs['playlist_pk'], user=self.request.user)
+        return (
+            PlaylistSong.objects.filter(playlist=playlist)
+            .select_related('song__album__artist')
+            .prefetch_related('song__genres')
+        )
+
+
+class PlaybackViewSet(ApiViewSetMixin, viewsets.ReadOnlyModelViewSet):
+    """Historial de reproducción del usuario, del más reciente al más antiguo."""
+    serializer_class = serializers.PlaybackSerializer
+    pagination_class = pagination.PlaybackPagination
+    filterset_fields = {'playback_date': ['gte', 'lt'], 'song': ['exact'], 'completed': ['exact']}
+
+    def get_queryset(self):
+        return (
+            PlaybackHistory.objects.filter(user=self.request.user)
+            .select_related('device', 'song__album__artist')
+            .prefetch_related('song__genres')
+        )
+
+
+class SongViewSet(ApiViewSetMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = serializers.SongSerializer
+    queryset = Songs.objects.select_related('album__artist').prefetch_related('genres')
+    filterset_fields = {
+        'spotify_id': ['exact'], 'isrc': ['exact'], 'album': ['exact'], 'album__artist': ['exact'],
+        'explicit_content': ['exact'],
+    }
+
+
+class AlbumViewSet(ApiViewSetMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = serializers.AlbumSerializer
+    queryset = Albums.objects.select_related('artist')
+    filterset_fields = {
+        'spotify_id': ['exact'], 'artist': ['exact'], 'album_type': ['exact'], 'release_year': ['exact', 'gte', 'lte'],
+    }
+
+
+class ArtistViewSet(ApiViewSetMixin, viewsets.ReadOnlyModelViewSet):
+    serializer_class = serializers.ArtistSerializer
+    queryset = Artists.objects.all()
+    filterset_fields = {'spotify_id': ['exact'], 'normalized_name': ['exact']}
@@ -0,0 +1,145 @@
+# applications/auditing/export.py
+"""
+Exportación de ``AuditLog`` en streaming (JSONL o CSV, opcionalmente gzip).
+
+Las filas se recorren por páginas con paginación keyset sobre
+``(timestamp, audit_id)`` y cada página se lee con ``.iterator()`` (cursor del
+lado del servidor en PostgreSQL), así que la memoria no crece con el tamaño
+del extracto ni las páginas se vuelven más lentas al avanzar.
+"""
+
+import csv
+import json
+import zlib
+from datetime import datetime, time
+
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import AuditLog
+
+FORMATS = {
+    'jsonl': 'application/x-ndjson',
+    'csv': 'text/csv',
+}
+
+FIELDS = [
+    'audit_id', 'timestamp', 'db_user_name', 'app_user_id', 'app_user_email', 'app_user_role',
+    'action_type', 'table_name', 'record_id', 'old_values', 'new_values', 'connection_ip',
+    'user_agent', 'api_endpoint', 'request_id', 'application_name', 'environment',
+]
+
+PAGE_SIZE = 10000
+
+# Tamaño aproximado de cada bloque que se entrega al cliente.
+_BLOCK_SIZE = 64 * 1024
+
+
+def parse_bound(value, end=False):
+    """
+    Convierte una fecha (``2025-01-31``) o fecha y hora ISO en un datetime
+    consciente de zona horaria. Una fecha sola como límite final incluye todo ese día.
+    """
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f"Fecha no válida: {value!r}")
+        moment = datetime.combine(day, time.max if end else time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def filter_queryset(start=None, end=None, table_name=None, user_id=None):
+    queryset = AuditLog.objects.all()
+    if start:
+        queryset = queryset.filter(timestamp__gte=start)
+    if end:
+        queryset = queryset.filter(timestamp__lte=end)
+    if table_name:
+        queryset = queryset.filter(table_name=table_name)
+    if user_id:
+        queryset = queryset.filter(app_user_id=user_id)
+    return queryset
+
+
+def iter_rows(queryset, page_size=PAGE_SIZE, chunk_size=2000):
+    """Recorre el queryset en orden (timestamp, audit_id) con paginación keyset."""
+    queryset = queryset.order_by('timestamp', 'audit_id').values(*FIELDS)
+    last = None
+    while True:
+        page = queryset
+        if last is not None:
+            last_ts, last_id = last
+            page = page.filter(Q(timestamp__gt=last_ts) | Q(timestamp=last_ts, audit_id__gt=last_id))
+        count = 0
+        for row in page[:page_size].iterator(chunk_size=chunk_size):
+            count += 1
+            last = (row['timestamp'], row['audit_id'])
+            yield row
+        if count < page_size:
+            return
+
+
+def _jsonl_lines(rows):
+    for row in rows:
+        yield json.dumps(row, default=str, ensure_ascii=False) + '\n'
+
+
+class _Echo:
+    """Pseudo-buffer para ``csv.writer``: devuelve la línea en vez de guardarla."""
+
+    def write(self, value):
+        return value
+
+
+def _csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(FIELDS)
+    for row in rows:
+        yield writer.writerow([
+            json.dumps(row[field], default=str) if isinstance(row[field], (dict, list)) else row[field]
+            for field in FIELDS
+        ])
+
+
+def _blocks(lines):
+    """Agrupa líneas en bloques de bytes de ~64 KB para no emitir un chunk HTTP por fila."""
+    buffer, size = [], 0
+    for line in lines:
+        data = line.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= _BLOCK_SIZE:
+            yield b''.join(buffer)
+            buffer, size = [], 0
+    if buffer:
+        yield b''.join(buffer)
+
+
+def _gzip(blocks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits=31: cabecera y pie gzip
+    for block in blocks:
+        data = compressor.compress(block)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_stream(queryset, fmt='jsonl', compress=False, page_size=PAGE_SIZE, chunk_size=2000):
+    """Iterador de bytes con el extracto completo, apto para ``StreamingHttpResponse``."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato no soportado: {fmt}")
+    rows = iter_rows(queryset, page_size=page_size, chunk_size=chunk_size)
+    lines = _jsonl_lines(rows) if fmt == 'jsonl' else _csv_lines(rows)
+    blocks = _blocks(lines)
+    return _gzip(blocks) if compress else blocks
+
+
+def export_filename(fmt, compress=False):
+    stamp = timezone.now().strftime('%Y%m%d_%H%M%S')
+    return f"audit_log_{stamp}.{fmt}{'.gz' if compress else ''}"
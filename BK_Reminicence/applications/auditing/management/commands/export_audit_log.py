@@ -0,0 +1,55 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from applications.auditing import export
+
+
+class Command(BaseCommand):
+    help = (
+        'Exporta el registro de auditoría en streaming como JSONL o CSV (opcionalmente gzip), '
+        'con memoria constante sin importar el número de filas.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--start', help='Fecha o fecha y hora ISO inicial (incluida).')
+        parser.add_argument('--end', help='Fecha o fecha y hora ISO final (incluida).')
+        parser.add_argument('--table', help='Filtra por table_name.')
+        parser.add_argument('--user', type=int, help='Filtra por app_user_id.')
+        parser.add_argument('--format', choices=sorted(export.FORMATS), default='jsonl')
+        parser.add_argument('--gzip', action='store_true', help='Comprime la salida con gzip.')
+        parser.add_argument('--output', '-o', default='-', help="Archivo de salida ('-' para stdout).")
+        parser.add_argument('--page-size', type=int, default=export.PAGE_SIZE,
+                            help='Filas por página de la paginación keyset.')
+        parser.add_argument('--chunk-size', type=int, default=2000,
+                            help='Filas que trae el cursor del servidor en cada viaje.')
+
+    def handle(self, *args, **options):
+        try:
+            queryset = export.filter_queryset(
+                start=export.parse_bound(options['start']),
+                end=export.parse_bound(options['end'], end=True),
+                table_name=options['table'],
+                user_id=options['user'],
+            )
+        except ValueError as e:
+            raise CommandError(e)
+
+        stream = export.export_stream(
+            queryset, options['format'], options['gzip'],
+            page_size=options['page_size'], chunk_size=options['chunk_size'],
+        )
+
+        if options['output'] == '-':
+            out = sys.stdout.buffer
+            for block in stream:
+                out.write(block)
+            out.flush()
+            return
+
+        written = 0
+        with open(options['output'], 'wb') as f:
+            for block in stream:
+                f.write(block)
+                written += len(block)
+        self.stderr.write(self.style.SUCCESS(f"Exportados {written} bytes a {options['output']}"))
@@ -0,0 +1,71 @@
+# applications/auditing/middleware.py
+
+import re
+import time
+import uuid
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import AuditLog
+from .writer import writer
+
+# Un X-Request-ID externo solo se respeta si tiene una forma razonable.
+_REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._-]{8,100}$')
+
+
+def _user_role(user):
+    if user.is_superuser:
+        return 'superuser'
+    if user.is_staff:
+        return 'staff'
+    return 'user'
+
+
+class AuditMiddleware:
+    """
+    Asigna un identificador a cada request (``request.request_id`` y la cabecera
+    ``X-Request-ID``) y registra el request en ``AuditLog`` a través del
+    escritor en segundo plano, sin añadir consultas al request.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.db_user = settings.DATABASES['default'].get('USER') or ''
+
+    def __call__(self, request):
+        incoming = request.headers.get('X-Request-ID', '')
+        request.request_id = incoming if _REQUEST_ID_RE.match(incoming) else uuid.uuid4().hex
+        start = time.perf_counter()
+
+        response = self.get_response(request)
+
+        response['X-Request-ID'] = request.request_id
+        if not request.path.startswith(settings.AUDIT_EXCLUDED_PATHS):
+            writer.enqueue(self._build_entry(request, response, time.perf_counter() - start))
+        return response
+
+    def _build_entry(self, request, response, duration):
+        user = getattr(request, 'user', None)
+        authenticated = user is not None and user.is_authenticated
+        match = getattr(request, 'resolver_match', None)
+        return AuditLog(
+            db_user_name=self.db_user,
+            app_user_id=user.pk if authenticated else None,
+            app_user_email=(user.email or None) if authenticated else None,
+            app_user_role=_user_role(user) if authenticated else None,
+            action_type=request.method[:10],
+            timestamp=timezone.now(),
+            table_name='http_request',
+            new_values={
+                'status': response.status_code,
+                'view': match.view_name if match else None,
+                'duration_ms': round(duration * 1000, 2),
+            },
+            connection_ip=request.META.get('REMOTE_ADDR') or None,
+            user_agent=request.headers.get('User-Agent'),
+            api_endpoint=request.get_full_path()[:255],
+            request_id=request.request_id,
+            application_name=settings.AUDIT_APPLICATION_NAME,
+            environment=settings.ENVIRONMENT,
+        )
@@ -0,0 +1,8 @@
+from django.urls import path
+from . import views
+
+app_name = 'auditing'
+
+urlpatterns = [
+    path('export/', views.export_audit_log_view, name='export_audit_log'),
+]
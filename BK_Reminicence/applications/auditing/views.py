@@ -1,3 +1,35 @@
-from django.shortcuts import render
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import HttpResponseBadRequest, StreamingHttpResponse
+from django.views.decorators.http import require_GET
 
-# Create your views here.
+from . import export
+
+
+@staff_member_required
+@require_GET
+def export_audit_log_view(request):
+    """
+    Descarga del registro de auditoría en streaming (solo personal del admin).
+    Filtros opcionales: ``start``, ``end``, ``table``, ``user``; ``format=jsonl|csv`` y ``gzip=1``.
+    """
+    fmt = request.GET.get('format', 'jsonl')
+    if fmt not in export.FORMATS:
+        return HttpResponseBadRequest("Formato no soportado; use jsonl o csv.")
+    compress = request.GET.get('gzip') in ('1', 'true')
+
+    try:
+        queryset = export.filter_queryset(
+            start=export.parse_bound(request.GET.get('start')),
+            end=export.parse_bound(request.GET.get('end'), end=True),
+            table_name=request.GET.get('table'),
+            user_id=int(request.GET['user']) if request.GET.get('user') else None,
+        )
+    except ValueError as e:
+        return HttpResponseBadRequest(str(e))
+
+    response = StreamingHttpResponse(
+        export.export_stream(queryset, fmt, compress),
+        content_type='application/gzip' if compress else export.FORMATS[fmt],
+    )
+    response['Content-Disposition'] = f'attachment; filename="{export.export_filename(fmt, compress)}"'
+    return response
@@ -0,0 +1,103 @@
+# applications/auditing/writer.py
+"""
+Escritura asíncrona y por lotes de ``AuditLog``.
+
+Los requests solo encolan el evento en una cola acotada en memoria; un hilo
+del proceso los inserta con ``bulk_create`` cuando se junta un lote o pasa el
+intervalo de vaciado. Si la cola está llena se espera brevemente y, si sigue
+llena, el evento se descarta y se cuenta: la auditoría nunca debe frenar las
+respuestas. Al terminar el proceso se vacía lo pendiente.
+"""
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+from applications.core import metrics
+
+from .models import AuditLog
+
+logger = logging.getLogger(__name__)
+
+
+class AuditWriter:
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pid = None
+        self.queue = None
+        self.stopping = threading.Event()
+        self.thread = None
+
+    def _ensure_started(self):
+        # Tras un fork (p. ej. gunicorn con --preload) el hilo del padre no existe en el hijo.
+        if self.pid == os.getpid():
+            return
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+            self.queue = queue.Queue(maxsize=settings.AUDIT_QUEUE_SIZE)
+            self.stopping = threading.Event()
+            self.thread = threading.Thread(target=self._run, name='audit-writer', daemon=True)
+            self.thread.start()
+            self.pid = os.getpid()
+
+    def enqueue(self, entry):
+        """Encola un ``AuditLog`` sin guardar. Retorna False si se descartó por falta de espacio."""
+        self._ensure_started()
+        try:
+            self.queue.put(entry, timeout=settings.AUDIT_ENQUEUE_TIMEOUT)
+        except queue.Full:
+            metrics.inc('audit_events_total', result='dropped')
+            return False
+        return True
+
+    def _next_batch(self):
+        """Bloquea hasta tener un evento y junta más hasta llenar el lote o agotar el intervalo."""
+        try:
+            batch = [self.queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + settings.AUDIT_FLUSH_INTERVAL
+        while len(batch) < settings.AUDIT_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self.stopping.is_set():
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        try:
+            AuditLog.objects.bulk_create(batch, batch_size=settings.AUDIT_BATCH_SIZE)
+            metrics.inc('audit_events_total', len(batch), result='written')
+        except Exception:
+            logger.exception("No se pudieron guardar %s eventos de auditoría", len(batch))
+            metrics.inc('audit_events_total', len(batch), result='failed')
+            connections.close_all()
+
+    def _run(self):
+        while not (self.stopping.is_set() and self.queue.empty()):
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+        connections.close_all()
+
+    def drain(self, timeout=10):
+        """Detiene el hilo tras escribir lo pendiente (se llama al terminar el proceso)."""
+        if self.pid != os.getpid() or self.thread is None:
+            return
+        self.stopping.set()
+        self.thread.join(timeout)
+
+
+writer = AuditWriter()
+atexit.register(writer.drain)
@@ -0,0 +1,44 @@
+# applications/core/background.py
+"""
+Pool de hilos del proceso para trabajo que no debe bloquear el request
+(refrescos de datos de Spotify, sincronizaciones).
+
+Las tareas corren en el mismo worker que las encola; si el proceso se recicla
+a mitad de una tarea, esta se pierde, así que solo debe usarse para trabajo
+que se puede repetir sin daño.
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=settings.BACKGROUND_WORKERS, thread_name_prefix='background')
+        return _executor
+
+
+def _run(fn, args, kwargs):
+    try:
+        fn(*args, **kwargs)
+    except Exception:
+        logger.exception("Error en la tarea en segundo plano %s", getattr(fn, '__name__', fn))
+    finally:
+        # Cada hilo abre sus propias conexiones; no deben quedar abiertas entre tareas.
+        connections.close_all()
+
+
+def submit(fn, *args, **kwargs):
+    """Ejecuta ``fn(*args, **kwargs)`` en segundo plano y retorna el ``Future``."""
+    return _get_executor().submit(_run, fn, args, kwargs)
@@ -0,0 +1,114 @@
+# applications/core/circuit_breaker.py
+"""
+Circuit breaker por grupo de endpoints de la API de Spotify.
+
+Cada grupo (reproductor, biblioteca, catálogo, ...) lleva una ventana con el
+resultado de sus últimas llamadas. Si la proporción de fallos (errores 5xx/429,
+errores de red o llamadas más lentas que ``slow_call_seconds``) supera el
+umbral, el circuito se abre y las llamadas fallan de inmediato durante
+``reset_timeout`` segundos. Después se deja pasar una sola llamada de prueba
+(half-open): si sale bien el circuito se cierra, si no vuelve a abrirse.
+
+El estado es por proceso: cada worker detecta la caída por su cuenta con unas
+pocas llamadas, sin depender de un almacén compartido que también podría fallar.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+# Prefijo de endpoint (ver instrumentation.spotify_endpoint) -> grupo. Gana el prefijo más largo.
+ENDPOINT_GROUPS = {
+    'me/player/recently-played': 'personalization',
+    'me/player': 'player',
+    'me/top': 'personalization',
+    'me': 'library',
+    'playlists': 'library',
+    'users': 'library',
+    'search': 'search',
+    'artists': 'catalog',
+    'albums': 'catalog',
+    'tracks': 'catalog',
+}
+
+
+def endpoint_group(endpoint):
+    for prefix in sorted(ENDPOINT_GROUPS, key=len, reverse=True):
+        if endpoint == prefix or endpoint.startswith(prefix + '/'):
+            return ENDPOINT_GROUPS[prefix]
+    return 'other'
+
+
+class CircuitBreaker:
+
+    def __init__(self, name, window=20, min_calls=5, failure_rate=0.5, slow_call_seconds=2.0, reset_timeout=30):
+        self.name = name
+        self.min_calls = min_calls
+        self.failure_rate = failure_rate
+        self.slow_call_seconds = slow_call_seconds
+        self.reset_timeout = reset_timeout
+        self.lock = threading.Lock()
+        self.outcomes = deque(maxlen=window)
+        self.state = CLOSED
+        self.opened_at = 0.0
+        self.probe_in_flight = False
+
+    def allow(self):
+        """Indica si la llamada puede salir hacia Spotify. En half-open solo pasa una prueba a la vez."""
+        with self.lock:
+            if self.state == CLOSED:
+                return True
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.reset_timeout:
+                    return False
+                self._transition(HALF_OPEN)
+            if self.probe_in_flight:
+                return False
+            self.probe_in_flight = True
+            return True
+
+    def record(self, ok, duration):
+        """Registra el resultado de una llamada que ``allow`` dejó pasar."""
+        failed = not ok or duration >= self.slow_call_seconds
+        with self.lock:
+            if self.state == HALF_OPEN:
+                self.probe_in_flight = False
+                self._transition(OPEN if failed else CLOSED)
+                return
+            self.outcomes.append(failed)
+            if (self.state == CLOSED and len(self.outcomes) >= self.min_calls
+                    and sum(self.outcomes) / len(self.outcomes) >= self.failure_rate):
+                self._transition(OPEN)
+
+    def _transition(self, state):
+        self.state = state
+        if state == OPEN:
+            self.opened_at = time.monotonic()
+        elif state == CLOSED:
+            self.outcomes.clear()
+        metrics.inc('spotify_circuit_transitions_total', group=self.name, state=state)
+        log = logger.warning if state == OPEN else logger.info
+        log("Circuito de Spotify '%s' -> %s", self.name, state)
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def get_breaker(group):
+    with _breakers_lock:
+        breaker = _breakers.get(group)
+        if breaker is None:
+            breaker = _breakers[group] = CircuitBreaker(group, **settings.SPOTIFY_CIRCUIT_BREAKER)
+        return breaker
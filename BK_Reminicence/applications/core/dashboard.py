@@ -0,0 +1,165 @@
+# applications/core/dashboard.py
+"""
+Snapshots del dashboard por usuario (stale-while-revalidate).
+
+Cada sección del dashboard se guarda en ``SpotifyApiCache`` con la clave
+``dashboard:<user_id>:<sección>``; ``expires_at`` marca hasta cuándo se
+considera fresca. La vista pinta siempre desde el snapshot y, si alguna sección
+caducó, encola un refresco en segundo plano que HTMX recoge al terminar.
+"""
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from applications.music.canonical import canonical_songs
+from applications.music.models import Artists, Playlist
+from applications.spotify_api.models import SpotifyApiCache
+
+from . import background
+from .library_cache import bump_library_version
+from .spotify_service import SpotifyService
+
+# sección -> función que la obtiene de Spotify
+SECTIONS = {
+    'profile': lambda service: service.get_user_profile(),
+    'top_tracks': lambda service: service.get_user_top_tracks(limit=6),
+    'recently_played': lambda service: service.get_recently_played(limit=6),
+    'top_artists': lambda service: service.get_user_top_artists(limit=5),
+    'playlists': lambda service: service.get_user_playlists(),
+}
+
+
+def snapshot_key(user_id, section):
+    return f"dashboard:{user_id}:{section}"
+
+
+def _refresh_lock_key(user_id):
+    return f"dashboard:refreshing:{user_id}"
+
+
+class Snapshot:
+    """Datos guardados de cada sección, con su fecha de obtención y si siguen frescos."""
+
+    def __init__(self, rows, sections=SECTIONS):
+        now = timezone.now()
+        self.data = {}
+        self.fetched_at = {}
+        self.expires_at = {}
+        self.stale_sections = set(sections)
+        for row in rows:
+            section = row.cache_key.rsplit(':', 1)[1]
+            self.data[section] = row.response_data.get('data')
+            self.expires_at[section] = row.expires_at
+            self.fetched_at[section] = parse_datetime(row.response_data.get('fetched_at', ''))
+            if row.expires_at > now:
+                self.stale_sections.discard(section)
+
+    @property
+    def is_fresh(self):
+        return not self.stale_sections
+
+    @property
+    def updated_at(self):
+        """Fecha de la sección más antigua: lo que el usuario está viendo tiene al menos esta edad."""
+        dates = [date for date in self.fetched_at.values() if date]
+        return min(dates) if dates else None
+
+    def get(self, section, default=None):
+        value = self.data.get(section)
+        return default if value is None else value
+
+
+    def has(self, section):
+        return section in self.data
+
+    def seconds_fresh(self, section):
+        """Segundos que le quedan a la sección antes de caducar (0 si ya caducó)."""
+        expires_at = self.expires_at.get(section)
+        if expires_at is None:
+            return 0
+        return max(int((expires_at - timezone.now()).total_seconds()), 0)
+
+
+def load_snapshot(user_id, sections=SECTIONS):
+    rows = SpotifyApiCache.objects.filter(cache_key__in=[snapshot_key(user_id, s) for s in sections])
+    return Snapshot(rows, sections)
+
+
+def save_section(user_id, section, data):
+    now = timezone.now()
+    SpotifyApiCache.objects.update_or_create(
+        cache_key=snapshot_key(user_id, section),
+        defaults={
+            'response_data': {'fetched_at': now.isoformat(), 'data': data},
+            'expires_at': now + timedelta(seconds=settings.DASHBOARD_FRESHNESS),
+        },
+    )
+
+
+def get_db_stats(user):
+    """Conteos de la base de datos local del panel de estadísticas, cacheados unos segundos."""
+    def compute():
+        return {
+            'playlists_count': Playlist.objects.filter(user=user).count(),
+            # Una por grabación: las ediciones con el mismo ISRC cuentan una vez.
+            'songs_count': canonical_songs().count(),
+            'artists_count': Artists.objects.count(),
+        }
+    return cache.get_or_set(f"dashboard:stats:{user.pk}", compute, settings.DASHBOARD_STATS_TIMEOUT)
+
+
+def forget_db_stats(user_id):
+    cache.delete(f"dashboard:stats:{user_id}")
+
+
+def clear_snapshot(user_id):
+    """Borra el snapshot del usuario (p. ej. al desvincular su cuenta de Spotify)."""
+    SpotifyApiCache.objects.filter(cache_key__startswith=f"dashboard:{user_id}:").delete()
+    forget_db_stats(user_id)
+
+
+def refresh_snapshot(user_id, sections=SECTIONS):
+    """Consulta Spotify y actualiza las secciones indicadas. Retorna las que se guardaron."""
+    user = get_user_model().objects.get(pk=user_id)
+    service = SpotifyService(user)
+    if not service.sp:
+        return []
+
+    previous = load_snapshot(user_id, sections)
+    saved = []
+    for section in sections:
+        service.sp.stale = False
+        data = SECTIONS[section](service)
+        # Datos servidos por el circuit breaker o una lista vacía donde antes había
+        # contenido suelen indicar un fallo de Spotify: se conserva lo anterior.
+        if service.is_stale or data is None or (not data and previous.get(section)):
+            continue
+        save_section(user_id, section, data)
+        saved.append(section)
+        if section == 'playlists' and data != previous.get('playlists'):
+            bump_library_version(user_id)
+    return saved
+
+
+def _refresh_in_background(user_id, sections):
+    try:
+        refresh_snapshot(user_id, sections)
+    finally:
+        cache.delete(_refresh_lock_key(user_id))
+
+
+def schedule_refresh(user_id, sections=SECTIONS):
+    """Encola un refresco si no hay otro en curso para el usuario. Retorna True si lo encoló."""
+    if not cache.add(_refresh_lock_key(user_id), True, timeout=settings.DASHBOARD_REFRESH_TIMEOUT):
+        return False
+    background.submit(_refresh_in_background, user_id, list(sections))
+    return True
+
+
+def is_refreshing(user_id):
+    return cache.get(_refresh_lock_key(user_id)) is not None
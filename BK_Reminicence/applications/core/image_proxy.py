@@ -0,0 +1,154 @@
+# applications/core/image_proxy.py
+
+import hashlib
+import io
+import logging
+import os
+import tempfile
+import time
+from urllib.parse import urlparse
+
+from django.conf import settings
+
+from . import instrumentation
+
+logger = logging.getLogger(__name__)
+
+# Tamaños que la aplicación realmente pinta (sidebar/filas, avatar, tarjetas).
+THUMBNAIL_SIZES = (48, 64, 300)
+
+# Solo se sirven imágenes del CDN de Spotify; evita que el proxy se use contra hosts arbitrarios.
+ALLOWED_HOST_SUFFIXES = ('.scdn.co', '.spotifycdn.com')
+
+MAX_SOURCE_BYTES = 10 * 1024 * 1024
+
+
+def is_proxyable(url):
+    """Indica si la URL pertenece al CDN de Spotify y puede pasar por el proxy."""
+    if not url:
+        return False
+    parsed = urlparse(url)
+    host = parsed.hostname or ''
+    return parsed.scheme == 'https' and host.endswith(ALLOWED_HOST_SUFFIXES)
+
+
+def image_key(url):
+    """
+    Clave de caché derivada de la URL de origen (no de los bytes descargados).
+    Las URLs del CDN de Spotify (``i.scdn.co/image/<id>``) ya identifican la
+    imagen: una portada nueva llega con otra URL, así que no hace falta
+    descargar para calcular la clave ni para validar el ETag.
+    """
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+
+def _cache_path(key, suffix):
+    return settings.IMAGE_CACHE_DIR / key[:2] / f"{key}{suffix}"
+
+
+def _atomic_write(path, data):
+    """Escribe en un temporal y lo renombra, para que lectores concurrentes nunca vean archivos a medias."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except Exception:
+        os.unlink(tmp_path)
+        raise
+
+
+def _cached(path):
+    """
+    True si ``path`` está en caché. Renueva su fecha de modificación (como
+    mucho una vez por ``IMAGE_CACHE_TOUCH_INTERVAL``) para que
+    ``prune_image_cache`` borre primero lo que lleva más tiempo sin usarse.
+    """
+    try:
+        mtime = path.stat().st_mtime
+    except FileNotFoundError:
+        return False
+    if time.time() - mtime > settings.IMAGE_CACHE_TOUCH_INTERVAL:
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return False
+    return True
+
+
+def _source_bytes(url, key):
+    """Descarga la imagen original una sola vez; las miniaturas posteriores salen del disco."""
+    original = _cache_path(key, '.orig')
+    if _cached(original):
+        return original.read_bytes()
+
+    import requests
+
+    # Sin seguir redirecciones: podrían llevar fuera del CDN de Spotify.
+    response = requests.get(url, timeout=10, stream=True, allow_redirects=False)
+    response.raise_for_status()
+    if response.status_code != 200:
+        raise ValueError(f"La imagen {url} respondió {response.status_code}")
+    data = response.raw.read(MAX_SOURCE_BYTES + 1, decode_content=True)
+    if len(data) > MAX_SOURCE_BYTES:
+        raise ValueError(f"La imagen {url} supera el tamaño máximo permitido")
+
+    _atomic_write(original, data)
+    return data
+
+
+def get_thumbnail(url, size):
+    """
+    Retorna la ruta de la miniatura WebP de ``size`` px para ``url``,
+    generándola (y descargando el original) solo si no está en caché.
+    """
+    key = image_key(url)
+    thumbnail = _cache_path(key, f"_{size}.webp")
+    hit = _cached(thumbnail)
+    instrumentation.record_cache('image', hit)
+    if hit:
+        return thumbnail
+
+    # Pillow y requests solo se cargan en el worker que genera la primera miniatura.
+    from PIL import Image
+
+    with Image.open(io.BytesIO(_source_bytes(url, key))) as img:
+        img = img.convert('RGBA' if img.mode in ('RGBA', 'LA', 'P') else 'RGB')
+        img.thumbnail((size, size), Image.LANCZOS)
+        buffer = io.BytesIO()
+        img.save(buffer, format='WEBP', quality=80, method=4)
+
+    _atomic_write(thumbnail, buffer.getvalue())
+    return thumbnail
+
+
+def prune(max_bytes, tmp_age=3600):
+    """
+    Borra de ``IMAGE_CACHE_DIR`` los archivos usados hace más tiempo hasta que
+    la caché ocupe como mucho ``max_bytes`` (y los temporales huérfanos de más
+    de ``tmp_age`` segundos). Retorna ``(archivos borrados, bytes liberados)``.
+    """
+    files = []
+    deleted = freed = 0
+    now = time.time()
+    for path in settings.IMAGE_CACHE_DIR.glob('*/*'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        if path.suffix == '.tmp':
+            if now - stat.st_mtime > tmp_age:
+                path.unlink(missing_ok=True)
+                deleted, freed = deleted + 1, freed + stat.st_size
+            continue
+        files.append((stat.st_mtime, stat.st_size, path))
+
+    total = sum(size for _, size, _ in files)
+    for _, size, path in sorted(files):
+        if total <= max_bytes:
+            break
+        path.unlink(missing_ok=True)
+        total -= size
+        deleted, freed = deleted + 1, freed + size
+    return deleted, freed
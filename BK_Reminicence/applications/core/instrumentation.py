@@ -0,0 +1,152 @@
+# applications/core/instrumentation.py
+
+import contextvars
+import re
+import time
+from collections import defaultdict
+
+from django.template.backends.django import DjangoTemplates, Template as BackendTemplate, reraise
+from django.template.exceptions import TemplateDoesNotExist
+
+from . import metrics as app_metrics
+
+_current = contextvars.ContextVar('request_metrics', default=None)
+
+# Colecciones de la API de Spotify cuyo siguiente segmento es un identificador
+_ID_COLLECTIONS = {'albums', 'artists', 'audiobooks', 'chapters', 'episodes', 'playlists', 'shows', 'tracks', 'users'}
+_ME_SEGMENTS = {'me'}
+
+
+class RequestMetrics:
+    """Tiempos y contadores acumulados durante un único request."""
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.spotify = defaultdict(lambda: [0, 0.0])
+        self.cache = defaultdict(lambda: [0, 0])
+        self.template_time = 0.0
+        self._template_depth = 0
+
+    def db_wrapper(self, execute, sql, params, many, context):
+        """``connection.execute_wrapper`` que cuenta y cronometra cada consulta."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_time += time.perf_counter() - start
+
+    @property
+    def spotify_calls(self):
+        return sum(count for count, _ in self.spotify.values())
+
+    @property
+    def spotify_time(self):
+        return sum(elapsed for _, elapsed in self.spotify.values())
+
+    def as_dict(self):
+        return {
+            'db_queries': self.db_queries,
+            'db_ms': round(self.db_time * 1000, 2),
+            'spotify_calls': self.spotify_calls,
+            'spotify_ms': round(self.spotify_time * 1000, 2),
+            'spotify_endpoints': {
+                endpoint: {'calls': count, 'ms': round(elapsed * 1000, 2)}
+                for endpoint, (count, elapsed) in self.spotify.items()
+            },
+            'cache': {name: {'hits': hits, 'misses': misses} for name, (hits, misses) in self.cache.items()},
+            'template_ms': round(self.template_time * 1000, 2),
+        }
+
+    def server_timing(self, total):
+        """Valor de la cabecera ``Server-Timing`` (milisegundos, un métrico por componente)."""
+        entries = [
+            f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} queries"',
+            f'spotify;dur={self.spotify_time * 1000:.1f};desc="{self.spotify_calls} calls"',
+        ]
+        for endpoint, (count, elapsed) in sorted(self.spotify.items()):
+            name = re.sub(r'[^A-Za-z0-9_-]+', '-', endpoint).strip('-')
+            entries.append(f'sp-{name};dur={elapsed * 1000:.1f};desc="{count}x {endpoint}"')
+        for name, (hits, misses) in sorted(self.cache.items()):
+            entries.append(f'cache-{name};desc="hit={hits} miss={misses}"')
+        entries.append(f'tpl;dur={self.template_time * 1000:.1f}')
+        entries.append(f'total;dur={total * 1000:.1f}')
+        return ', '.join(entries)
+
+
+def start_request():
+    """Activa la recolección para el request actual; retorna el token para ``end_request``."""
+    metrics = RequestMetrics()
+    return metrics, _current.set(metrics)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current():
+    """Métricas del request en curso, o None fuera de un request (comandos, hilos en segundo plano)."""
+    return _current.get()
+
+
+def spotify_endpoint(url):
+    """Normaliza una URL de la API de Spotify a una etiqueta estable: 'playlists/{id}/tracks'."""
+    path = url.split('?', 1)[0]
+    if '://' in path:
+        path = path.split('/v1/', 1)[-1]
+    segments = [segment for segment in path.strip('/').split('/') if segment]
+    normalized = []
+    for i, segment in enumerate(segments):
+        previous = segments[i - 1] if i else None
+        if previous in _ID_COLLECTIONS and (i < 2 or segments[i - 2] not in _ME_SEGMENTS):
+            normalized.append('{id}')
+        else:
+            normalized.append(segment)
+    return '/'.join(normalized)
+
+
+def record_spotify_call(endpoint, duration):
+    metrics = current()
+    if metrics is not None:
+        entry = metrics.spotify[endpoint]
+        entry[0] += 1
+        entry[1] += duration
+
+
+def record_cache(name, hit):
+    app_metrics.inc('cache_requests_total', cache=name, result='hit' if hit else 'miss')
+    metrics = current()
+    if metrics is not None:
+        metrics.cache[name][0 if hit else 1] += 1
+
+
+class InstrumentedTemplate(BackendTemplate):
+    """Plantilla que suma su tiempo de renderizado al request (solo el nivel más externo)."""
+
+    def render(self, context=None, request=None):
+        metrics = current()
+        if metrics is None:
+            return super().render(context, request)
+
+        metrics._template_depth += 1
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            metrics._template_depth -= 1
+            if metrics._template_depth == 0:
+                metrics.template_time += time.perf_counter() - start
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """Backend de plantillas de Django que devuelve ``InstrumentedTemplate``."""
+
+    def from_string(self, template_code):
+        return InstrumentedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        try:
+            return InstrumentedTemplate(self.engine.get_template(template_name), self)
+        except TemplateDoesNotExist as exc:
+            reraise(exc, self)
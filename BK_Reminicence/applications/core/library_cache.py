@@ -0,0 +1,51 @@
+# applications/core/library_cache.py
+
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def _version_key(user_id):
+    return f"library_version:{user_id}"
+
+
+def get_library_version(user_id):
+    """
+    Versión de la biblioteca del usuario. Si la clave no existe (primer uso o
+    expulsión de la caché) se inicializa con un valor basado en el reloj, para
+    no reutilizar nunca una versión antigua.
+    """
+    key = _version_key(user_id)
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+def bump_library_version(user_id):
+    """Invalida todo lo cacheado a partir de la biblioteca del usuario (sidebar, índices...)."""
+    key = _version_key(user_id)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = time.time_ns()
+        cache.set(key, version, timeout=None)
+        return version
+
+
+def sidebar_fragment_key(user_id, version):
+    return f"sidebar_library:{user_id}:{version}"
+
+
+def get_sidebar_fragment(user_id):
+    return cache.get(sidebar_fragment_key(user_id, get_library_version(user_id)))
+
+
+def set_sidebar_fragment(user_id, html):
+    cache.set(
+        sidebar_fragment_key(user_id, get_library_version(user_id)),
+        html,
+        timeout=settings.SIDEBAR_CACHE_TIMEOUT,
+    )
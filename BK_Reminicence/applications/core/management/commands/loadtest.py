@@ -0,0 +1,358 @@
+import json
+import os
+import random
+import shlex
+import subprocess
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+import requests
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from applications.core.views import DASHBOARD_SECTIONS
+from applications.music.models import Playlist, PlaylistSong
+from applications.music.sync_service import SpotifySyncService
+from applications.spotify_api.models import SpotifyUserToken
+from applications.spotify_api.stub import SpotifyStub, generate_library
+
+USERNAME_PREFIX = 'loadtest_'
+PASSWORD = 'loadtest-password'
+SEARCH_TERMS = ('canción 1', 'canción 2', 'canción 42', 'canción', 'artista', 'zzz')
+
+# ruta -> (método, peso por defecto)
+ROUTES = {
+    'index': ('GET', 3),
+    'search': ('GET', 2),
+    'playlist_detail': ('GET', 3),
+    'player_current': ('GET', 4),
+    'player_pause': ('POST', 1),
+}
+# index solo pinta el esqueleto: lo que consulta a Spotify son las secciones que
+# el navegador pide después por HTMX, una por cada carga del dashboard.
+ROUTES.update({f"dashboard_{section}": ('GET', ROUTES['index'][1]) for section in DASHBOARD_SECTIONS})
+
+
+def percentile(sorted_values, pct):
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not sorted_values:
+        return None
+    index = max(int(round(pct / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+class VirtualUser:
+    """Usuario sintético con su sesión iniciada y las playlists que puede abrir."""
+
+    def __init__(self, username, playlist_ids):
+        self.username = username
+        self.playlist_ids = playlist_ids
+        self.cookies = {}
+
+    def login(self, base_url):
+        session = requests.Session()
+        login_url = base_url + reverse('users:login')
+        session.get(login_url, timeout=30).raise_for_status()
+        response = session.post(login_url, data={
+            'username': self.username,
+            'password': PASSWORD,
+            'csrfmiddlewaretoken': session.cookies.get('csrftoken'),
+        }, headers={'Referer': login_url}, allow_redirects=False, timeout=30)
+        if response.status_code != 302 or 'sessionid' not in session.cookies:
+            raise CommandError(f"No se pudo iniciar sesión como {self.username} (HTTP {response.status_code})")
+        self.cookies = session.cookies.get_dict()
+
+
+class Command(BaseCommand):
+    help = (
+        'Prueba de carga HTTP de la aplicación real: inicia sesión con usuarios sintéticos '
+        'conectados a una API de Spotify local y reporta throughput y latencias p50/p95/p99 por ruta.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--base-url', default='http://127.0.0.1:8765',
+                            help='URL de la aplicación bajo prueba.')
+        parser.add_argument('--server-cmd',
+                            help='Comando que arranca la aplicación (p. ej. "gunicorn BK_Reminicence.wsgi -w 4 '
+                                 '-b 127.0.0.1:8765"). Se lanza con SPOTIFY_API_PREFIX apuntando al stub. '
+                                 'Sin esta opción la aplicación ya debe estar corriendo contra --stub-port.')
+        parser.add_argument('--users', type=int, default=20, help='Usuarios sintéticos.')
+        parser.add_argument('--rate', type=float, default=20.0, help='Peticiones por segundo objetivo.')
+        parser.add_argument('--duration', type=float, default=30.0, help='Duración de la prueba en segundos.')
+        parser.add_argument('--concurrency', type=int, default=64, help='Máximo de peticiones en vuelo.')
+        parser.add_argument('--latency', type=float, default=50.0,
+                            help='Latencia simulada de la API de Spotify, en milisegundos.')
+        parser.add_argument('--stub-port', type=int, default=8766, help='Puerto del stub de Spotify.')
+        parser.add_argument('--playlist-sizes', type=int, nargs='+', default=[50, 300],
+                            help='Tamaño de las playlists sembradas por usuario.')
+        parser.add_argument('--mix', default='',
+                            help='Pesos por ruta, p. ej. "index=1,search=5". Rutas: ' + ', '.join(ROUTES))
+        parser.add_argument('--seed', type=int, default=1)
+        parser.add_argument('--output', help='Guarda el reporte en JSON en esta ruta.')
+        parser.add_argument('--seed-users', action='store_true',
+                            help=f'Crea en la base de datos de la aplicación los usuarios {USERNAME_PREFIX}N que '
+                                 'falten, con token y playlists. Sin esta opción deben existir de antes.')
+        parser.add_argument('--cleanup', action='store_true',
+                            help='Elimina los usuarios sintéticos (y sus datos) al terminar.')
+
+    def handle(self, *args, **options):
+        base_url = options['base_url'].rstrip('/')
+        weights = self._parse_mix(options['mix'])
+        rng = random.Random(options['seed'])
+
+        library = generate_library(options['playlist_sizes'], seed=options['seed'])
+        server = None
+        with SpotifyStub(library, port=options['stub_port'], latency=options['latency'] / 1000) as stub:
+            try:
+                self.stdout.write(f"Stub de Spotify en {stub.api_prefix} (latencia {options['latency']} ms)")
+                users = self._load_users(options['users'], options['playlist_sizes'], options['seed'],
+                                         options['seed_users'])
+
+                if options['server_cmd']:
+                    server = self._start_server(options['server_cmd'], stub.api_prefix, base_url)
+
+                self.stdout.write(f"Iniciando sesión con {len(users)} usuarios...")
+                for user in users:
+                    user.login(base_url)
+
+                stub.reset_counts()
+                results, elapsed = self._run(base_url, users, weights, rng, options)
+                report = self._report(results, elapsed, stub, options)
+            finally:
+                if server is not None:
+                    server.terminate()
+                    server.wait(timeout=30)
+                if options['cleanup']:
+                    get_user_model().objects.filter(username__startswith=USERNAME_PREFIX).delete()
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Reporte guardado en {options['output']}"))
+
+    def _parse_mix(self, mix):
+        weights = {route: weight for route, (_, weight) in ROUTES.items()}
+        for part in filter(None, (p.strip() for p in mix.split(','))):
+            route, _, weight = part.partition('=')
+            if route not in ROUTES:
+                raise CommandError(f"Ruta desconocida en --mix: {route}")
+            try:
+                weights[route] = float(weight)
+            except ValueError:
+                raise CommandError(f"Peso inválido para {route}: {weight!r}")
+        weights = {route: weight for route, weight in weights.items() if weight > 0}
+        if not weights:
+            raise CommandError('--mix no deja ninguna ruta con peso positivo.')
+        return weights
+
+    def _load_users(self, count, playlist_sizes, seed, create):
+        """
+        Usuarios ``loadtest_N`` con un token vigente y sus propias playlists ya
+        sincronizadas, para que la prueba no incluya la sincronización inicial.
+        La prueba corre contra la base de datos de la aplicación, así que solo
+        se crean (o se les renueva el token) con ``--seed-users``.
+        """
+        User = get_user_model()
+        usernames = [f"{USERNAME_PREFIX}{i}" for i in range(count)]
+        if not create:
+            existing = User.objects.filter(username__in=usernames).values_list('username', flat=True)
+            playlist_ids = {username: [] for username in existing}
+            playlists = Playlist.objects.filter(user__username__in=usernames).values_list('user__username', 'spotify_id')
+            for username, spotify_id in playlists:
+                playlist_ids[username].append(spotify_id)
+            if len(playlist_ids) < count or not all(playlist_ids.values()):
+                raise CommandError(
+                    f"Faltan usuarios {USERNAME_PREFIX}N o sus playlists; usa --seed-users para crearlos."
+                )
+            return [VirtualUser(username, playlist_ids[username]) for username in usernames]
+
+        users = []
+        for i, username in enumerate(usernames):
+            user, created = User.objects.get_or_create(username=username, defaults={'email': f"{username}@example.com"})
+            if created:
+                user.set_password(PASSWORD)
+                user.save(update_fields=['password'])
+            SpotifyUserToken.objects.update_or_create(user=user, defaults={
+                'access_token': f"loadtest-token-{i}",
+                'refresh_token': 'loadtest-refresh',
+                'expires_at': timezone.now() + timedelta(days=30),
+                'scope': 'streaming user-read-playback-state user-modify-playback-state',
+            })
+
+            playlist_ids = list(Playlist.objects.filter(user=user).values_list('spotify_id', flat=True))
+            if not playlist_ids:
+                playlist_ids = self._seed_playlists(user, playlist_sizes, seed + i + 1)
+            users.append(VirtualUser(username, playlist_ids))
+        return users
+
+    def _seed_playlists(self, user, playlist_sizes, seed):
+        # Cada usuario recibe playlists propias: Playlist.spotify_id es único.
+        library = generate_library(playlist_sizes, seed=seed)
+        with transaction.atomic():
+            sync = SpotifySyncService(user)
+            for pl_data in library['playlists']:
+                playlist = Playlist.objects.create(
+                    user=user,
+                    name=pl_data['name'],
+                    spotify_id=pl_data['id'],
+                    spotify_snapshot_id=pl_data['snapshot_id'],
+                    cover_image_url=pl_data['images'][0]['url'],
+                    is_synced_with_spotify=True,
+                    last_sync_date=timezone.now(),
+                )
+                songs = filter(None, (sync.sync_song(item['track']) for item in pl_data['items']))
+                PlaylistSong.objects.bulk_create([
+                    PlaylistSong(playlist=playlist, song=song, position=position, date_added=timezone.now())
+                    for position, song in enumerate(songs, start=1)
+                ])
+        return [pl_data['id'] for pl_data in library['playlists']]
+
+    def _start_server(self, command, api_prefix, base_url):
+        env = dict(os.environ, SPOTIFY_API_PREFIX=api_prefix,
+                   DJANGO_SETTINGS_MODULE=os.environ.get('DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE))
+        self.stdout.write(f"Arrancando la aplicación: {command}")
+        process = subprocess.Popen(shlex.split(command), cwd=settings.BASE_DIR, env=env)
+        login_url = base_url + reverse('users:login')
+        deadline = time.monotonic() + 60
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise CommandError(f"El servidor terminó al arrancar (código {process.returncode})")
+            try:
+                if requests.get(login_url, timeout=2).status_code == 200:
+                    return process
+            except requests.RequestException:
+                pass
+            time.sleep(0.5)
+        process.terminate()
+        raise CommandError(f"El servidor no respondió en {login_url} tras 60 segundos")
+
+    def _build_request(self, route, user, rng, base_url):
+        headers = {}
+        if route == 'index':
+            url = base_url + reverse('core:index')
+        elif route.startswith('dashboard_'):
+            section = route.removeprefix('dashboard_')
+            url = base_url + reverse('core:dashboard_section', args=[section]) + '?poll=1'
+            headers['HX-Request'] = 'true'
+        elif route == 'search':
+            url = base_url + reverse('music:search') + '?' + requests.compat.urlencode({'q': rng.choice(SEARCH_TERMS)})
+            headers['HX-Request'] = 'true'
+        elif route == 'playlist_detail':
+            url = base_url + reverse('music:playlist_detail', args=[rng.choice(user.playlist_ids)])
+        elif route == 'player_current':
+            url = base_url + reverse('spotify_api:player_current')
+        else:
+            url = base_url + reverse('spotify_api:pause_playback')
+            headers['X-CSRFToken'] = user.cookies.get('csrftoken', '')
+            headers['Referer'] = base_url + '/'
+        return url, headers
+
+    def _run(self, base_url, users, weights, rng, options):
+        """
+        Carga de lazo abierto: las peticiones se programan a ritmo fijo sin esperar
+        a las anteriores, y la latencia se mide desde el instante programado para
+        que un servidor saturado no reduzca artificialmente la carga (coordinated omission).
+        """
+        results = defaultdict(list)
+        lock = threading.Lock()
+        local = threading.local()
+        routes, route_weights = zip(*weights.items())
+        total = int(options['rate'] * options['duration'])
+        interval = 1 / options['rate']
+
+        def fire(route, user, url, headers, scheduled):
+            session = getattr(local, 'session', None)
+            if session is None:
+                session = local.session = requests.Session()
+            session.cookies.clear()
+            error = None
+            try:
+                response = session.request(ROUTES[route][0], url, headers=headers, cookies=user.cookies,
+                                            json={} if ROUTES[route][0] == 'POST' else None,
+                                            allow_redirects=False, timeout=60)
+                status = response.status_code
+                if status >= 400 or (300 <= status < 400 and route != 'player_pause'):
+                    error = f"HTTP {status}"
+            except requests.RequestException as e:
+                status = None
+                error = type(e).__name__
+            latency = time.perf_counter() - scheduled
+            with lock:
+                results[route].append((latency, status, error))
+
+        self.stdout.write(
+            f"Enviando {total} peticiones a {options['rate']} req/s durante {options['duration']} s "
+            f"(máx. {options['concurrency']} en vuelo)..."
+        )
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            start = time.perf_counter()
+            for i in range(total):
+                scheduled = start + i * interval
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                route = rng.choices(routes, weights=route_weights)[0]
+                user = users[i % len(users)]
+                url, headers = self._build_request(route, user, rng, base_url)
+                executor.submit(fire, route, user, url, headers, scheduled)
+        elapsed = time.perf_counter() - start
+        return results, elapsed
+
+    def _report(self, results, elapsed, stub, options):
+        routes = {}
+        for route in ROUTES:
+            samples = results.get(route)
+            if not samples:
+                continue
+            latencies = sorted(latency for latency, _, _ in samples)
+            errors = defaultdict(int)
+            for _, _, error in samples:
+                if error:
+                    errors[error] += 1
+            routes[route] = {
+                'requests': len(samples),
+                'errors': dict(errors),
+                'throughput_rps': round(len(samples) / elapsed, 2),
+                'p50_ms': round(percentile(latencies, 50) * 1000, 1),
+                'p95_ms': round(percentile(latencies, 95) * 1000, 1),
+                'p99_ms': round(percentile(latencies, 99) * 1000, 1),
+                'max_ms': round(latencies[-1] * 1000, 1),
+            }
+
+        completed = sum(len(samples) for samples in results.values())
+        self.stdout.write(f"\n{'ruta':<26} {'reqs':>6} {'err':>5} {'req/s':>7} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+        for route, data in routes.items():
+            line = (f"{route:<26} {data['requests']:>6} {sum(data['errors'].values()):>5} {data['throughput_rps']:>7} "
+                    f"{data['p50_ms']:>7}ms {data['p95_ms']:>7}ms {data['p99_ms']:>7}ms {data['max_ms']:>7}ms")
+            self.stdout.write(self.style.ERROR(line) if data['errors'] else line)
+        self.stdout.write(
+            f"\nTotal: {completed} peticiones en {elapsed:.1f} s ({completed / elapsed:.1f} req/s, "
+            f"objetivo {options['rate']}); {stub.request_count} llamadas a la API de Spotify"
+        )
+        for route, data in routes.items():
+            for error, count in data['errors'].items():
+                self.stdout.write(self.style.WARNING(f"  {route}: {count}x {error}"))
+
+        return {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'base_url': options['base_url'],
+                'server_cmd': options['server_cmd'],
+                'users': options['users'],
+                'target_rate': options['rate'],
+                'duration_s': options['duration'],
+                'concurrency': options['concurrency'],
+                'spotify_latency_ms': options['latency'],
+            },
+            'elapsed_s': round(elapsed, 2),
+            'throughput_rps': round(completed / elapsed, 2),
+            'spotify_requests': dict(stub.requests.most_common()),
+            'routes': routes,
+        }
@@ -0,0 +1,20 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from applications.core import image_proxy
+
+
+class Command(BaseCommand):
+    help = (
+        'Borra las miniaturas y originales del proxy de imágenes usados hace más tiempo '
+        'hasta que la caché quepa en IMAGE_CACHE_MAX_BYTES. Pensado para correr desde cron.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--max-mb', type=int,
+                            help='Tamaño máximo de la caché en MB (por defecto IMAGE_CACHE_MAX_BYTES).')
+
+    def handle(self, *args, **options):
+        max_bytes = options['max_mb'] * 1024 * 1024 if options['max_mb'] is not None else settings.IMAGE_CACHE_MAX_BYTES
+        deleted, freed = image_proxy.prune(max_bytes)
+        self.stdout.write(self.style.SUCCESS(f"{deleted} archivos borrados ({freed / 1024 / 1024:.1f} MB liberados)."))
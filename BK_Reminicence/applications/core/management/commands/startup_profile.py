@@ -0,0 +1,133 @@
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# Lo que hace un worker al arrancar, por fases; se ejecuta en un proceso nuevo
+# con -X importtime para que no cuente nada de lo que este ya tiene importado.
+_CHILD = """
+import json, sys, time
+t0 = time.perf_counter()
+from django.conf import settings
+settings.INSTALLED_APPS
+t1 = time.perf_counter()
+import django
+django.setup()
+t2 = time.perf_counter()
+from django.urls import get_resolver
+get_resolver().url_patterns
+t3 = time.perf_counter()
+print(json.dumps({'settings': t1 - t0, 'setup': t2 - t1, 'urls': t3 - t2, 'total': t3 - t0}))
+"""
+
+PHASES = ('settings', 'setup', 'urls', 'total')
+
+
+def parse_importtime(stderr):
+    """``{módulo: (self_us, cumulative_us)}`` a partir de la salida de ``-X importtime``."""
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        if not self_us.strip().isdigit():
+            continue  # encabezado
+        modules[name.strip()] = (int(self_us), int(cumulative_us))
+    return modules
+
+
+def by_package(modules):
+    """Tiempo propio (sin hijos) sumado por paquete de primer nivel, en microsegundos."""
+    totals = defaultdict(int)
+    for name, (self_us, _) in modules.items():
+        package = name.split('.')[0]
+        if package == 'applications':
+            package = '.'.join(name.split('.')[:2])
+        totals[package] += self_us
+    return dict(totals)
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide el arranque de un worker (settings, django.setup() y carga de URLs) en un proceso nuevo, '
+        'con el desglose de -X importtime por módulo y por paquete, y lo compara con una línea base.'
+    )
+    requires_system_checks = []
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=3, help='Arranques a medir; se reporta el más rápido.')
+        parser.add_argument('--top', type=int, default=15, help='Módulos y paquetes a listar.')
+        parser.add_argument('--baseline', help='JSON de una medición anterior con la que comparar.')
+        parser.add_argument('--save-baseline', help='Guarda esta medición como línea base en ese archivo.')
+
+    def handle(self, *args, **options):
+        best = None
+        for _ in range(max(options['runs'], 1)):
+            result = self._measure()
+            if best is None or result['phases']['total'] < best['phases']['total']:
+                best = result
+
+        self._report(best, options['top'])
+        if options['baseline']:
+            with open(options['baseline']) as f:
+                self._compare(best, json.load(f), options['top'])
+        if options['save_baseline']:
+            with open(options['save_baseline'], 'w') as f:
+                json.dump(best, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Línea base guardada en {options['save_baseline']}"))
+
+    def _measure(self):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        completed = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', _CHILD],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        if completed.returncode != 0:
+            raise CommandError(f"El proceso de medición falló:\n{completed.stderr[-2000:]}")
+        modules = parse_importtime(completed.stderr)
+        return {
+            'phases': json.loads(completed.stdout.strip().splitlines()[-1]),
+            'modules': {name: cumulative for name, (_, cumulative) in modules.items()},
+            'packages': by_package(modules),
+        }
+
+    def _report(self, result, top):
+        phases = result['phases']
+        self.stdout.write(self.style.MIGRATE_HEADING('Fases del arranque'))
+        for phase in PHASES:
+            self.stdout.write(f"  {phase:<10} {phases[phase] * 1000:8.1f} ms")
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Paquetes con más tiempo de importación propio (top {top})'))
+        for package, us in sorted(result['packages'].items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f"  {us / 1000:8.1f} ms  {package}")
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'Módulos de la aplicación por tiempo acumulado (top {top})'))
+        own = {name: us for name, us in result['modules'].items() if name.startswith(('applications', 'BK_Reminicence'))}
+        for name, us in sorted(own.items(), key=lambda item: -item[1])[:top]:
+            self.stdout.write(f"  {us / 1000:8.1f} ms  {name}")
+
+    def _compare(self, result, baseline, top):
+        self.stdout.write(self.style.MIGRATE_HEADING('Comparación con la línea base'))
+        for phase in PHASES:
+            before, after = baseline['phases'][phase] * 1000, result['phases'][phase] * 1000
+            self.stdout.write(f"  {phase:<10} {before:8.1f} -> {after:8.1f} ms  ({after - before:+.1f})")
+
+        packages = set(baseline['packages']) | set(result['packages'])
+        deltas = {
+            package: result['packages'].get(package, 0) - baseline['packages'].get(package, 0)
+            for package in packages
+        }
+        self.stdout.write(self.style.MIGRATE_HEADING('Paquetes que más cambiaron'))
+        for package, delta in sorted(deltas.items(), key=lambda item: -abs(item[1]))[:top]:
+            if not delta:
+                break
+            status = ''
+            if package not in result['packages']:
+                status = '  (ya no se importa)'
+            elif package not in baseline['packages']:
+                status = '  (nuevo)'
+            self.stdout.write(f"  {delta / 1000:+8.1f} ms  {package}{status}")
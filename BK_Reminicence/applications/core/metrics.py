@@ -0,0 +1,287 @@
+# applications/core/metrics.py
+"""
+Métricas operativas en formato de exposición de Prometheus.
+
+Cada proceso (p. ej. cada worker de gunicorn) acumula sus contadores e
+histogramas en memoria y los vuelca periódicamente a
+``METRICS_DIR/<pid>-<uuid>.json``: un worker nuevo que herede el pid de uno
+muerto escribe otro archivo en lugar de pisar sus totales. El endpoint
+``/metrics`` suma los archivos de todos los procesos, así que cualquier worker
+puede responder al scrape con los totales del servicio; de paso funde los de
+procesos que ya terminaron en ``archived.json`` (solo en POSIX). Conviene
+vaciar ``METRICS_DIR`` al (re)desplegar la aplicación.
+"""
+
+import atexit
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+DURATION_BUCKETS = (0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+THROUGHPUT_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+# nombre -> (tipo, ayuda, buckets)
+METRICS = {
+    'spotify_method_duration_seconds': (
+        'histogram', 'Latencia de los métodos de SpotifyService.', LATENCY_BUCKETS),
+    'spotify_requests_total': (
+        'counter', 'Peticiones HTTP a la API de Spotify por endpoint y resultado.', None),
+    'spotify_rate_limited_total': (
+        'counter', 'Respuestas 429 de la API de Spotify por endpoint.', None),
+    'spotify_errors_total': (
+        'counter', 'Errores de la API de Spotify por endpoint y estado HTTP.', None),
+    'spotify_circuit_transitions_total': (
+        'counter', 'Cambios de estado del circuit breaker por grupo de endpoints.', None),
+    'spotify_short_circuited_total': (
+        'counter', 'Llamadas a Spotify rechazadas sin salir porque el circuito estaba abierto.', None),
+    'spotify_stale_responses_total': (
+        'counter', 'Respuestas servidas desde la última copia buena mientras Spotify fallaba.', None),
+    'spotify_token_refresh_total': (
+        'counter', 'Refrescos del token OAuth de Spotify por resultado.', None),
+    'sync_duration_seconds': (
+        'histogram', 'Duración de SpotifySyncService.full_sync.', DURATION_BUCKETS),
+    'sync_items_total': (
+        'counter', 'Elementos (playlists y canciones) procesados por la sincronización.', None),
+    'sync_items_per_second': (
+        'histogram', 'Canciones sincronizadas por segundo en cada full_sync.', THROUGHPUT_BUCKETS),
+    'audit_events_total': (
+        'counter', 'Eventos de auditoría por resultado (written/dropped/failed).', None),
+    'cache_requests_total': (
+        'counter', 'Consultas a cachés de la aplicación por caché y resultado (hit/miss).', None),
+    'http_request_duration_seconds': (
+        'histogram', 'Duración de los requests por vista.', LATENCY_BUCKETS),
+    'view_db_queries': (
+        'histogram', 'Consultas a la base de datos por request y vista.', COUNT_BUCKETS),
+}
+
+
+ARCHIVE_NAME = 'archived.json'
+
+# Temporales de un volcado interrumpido que se borran al archivar.
+STALE_TMP_SECONDS = 60 * 60
+
+
+def _label_key(labels):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Registry:
+    """Almacén de métricas del proceso actual, seguro entre hilos."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.dirty = False
+        self.last_flush = 0.0
+        self.file_name = f"{os.getpid()}-{uuid.uuid4().hex}.json"
+
+    def after_fork(self):
+        """En el hijo de un fork: lo acumulado es del padre y el archivo es otro."""
+        self.__init__()
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, _label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + amount
+            self.dirty = True
+
+    def observe(self, name, value, **labels):
+        buckets = METRICS[name][2]
+        key = (name, _label_key(labels))
+        with self.lock:
+            series = self.histograms.get(key)
+            if series is None:
+                series = self.histograms[key] = {'buckets': [0] * len(buckets), 'sum': 0.0, 'count': 0}
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    series['buckets'][i] += 1
+            series['sum'] += value
+            series['count'] += 1
+            self.dirty = True
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'histograms': [
+                    [name, list(labels), dict(series, buckets=list(series['buckets']))]
+                    for (name, labels), series in self.histograms.items()
+                ],
+            }
+
+    def reset(self):
+        """Descarta lo acumulado sin volcarlo (p. ej. tras un benchmark)."""
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.dirty = False
+
+    def flush(self, force=False):
+        """Vuelca el estado del proceso a disco como mucho cada ``METRICS_FLUSH_INTERVAL`` segundos."""
+        now = time.monotonic()
+        if not self.dirty or (not force and now - self.last_flush < settings.METRICS_FLUSH_INTERVAL):
+            return
+        directory = Path(settings.METRICS_DIR)
+        directory.mkdir(parents=True, exist_ok=True)
+        data = json.dumps(self.snapshot())
+        self.dirty = False
+        self.last_flush = now
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(fd, 'w') as f:
+            f.write(data)
+        os.replace(tmp_path, directory / self.file_name)
+
+
+registry = Registry()
+atexit.register(lambda: registry.flush(force=True))
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=registry.after_fork)
+
+
+def inc(name, amount=1, **labels):
+    registry.inc(name, amount, **labels)
+
+
+def observe(name, value, **labels):
+    registry.observe(name, value, **labels)
+
+
+def _load(path):
+    try:
+        return json.loads(path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _merge(files):
+    """Suma los volcados ``files``: ``(counters, histograms)``."""
+    counters, histograms = {}, {}
+    for data in files:
+        for name, labels, value in data['counters']:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            counters[key] = counters.get(key, 0) + value
+        for name, labels, series in data['histograms']:
+            key = (name, tuple(tuple(pair) for pair in labels))
+            merged = histograms.setdefault(key, {'buckets': [0] * len(series['buckets']), 'sum': 0.0, 'count': 0})
+            merged['buckets'] = [a + b for a, b in zip(merged['buckets'], series['buckets'])]
+            merged['sum'] += series['sum']
+            merged['count'] += series['count']
+    return counters, histograms
+
+
+def _is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+@contextmanager
+def _directory_lock(directory):
+    """Serializa el archivado y la lectura entre procesos (sin bloqueo fuera de POSIX)."""
+    if os.name != 'posix':
+        yield
+        return
+    import fcntl
+
+    with open(directory / '.lock', 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        yield
+
+
+def _archive_dead(directory, archive):
+    """
+    Funde en ``archived.json`` los archivos de procesos que ya terminaron y los
+    borra. ``merged`` recuerda los ya sumados, por si el proceso muere entre
+    escribir el archivo y borrarlos. Retorna el archivo resultante.
+    """
+    dead = [
+        path for path in directory.glob('*-*.json')
+        if path.name.split('-', 1)[0].isdigit() and not _is_alive(int(path.name.split('-', 1)[0]))
+    ]
+    now = time.time()
+    for path in directory.glob('*.tmp'):
+        try:
+            if now - path.stat().st_mtime > STALE_TMP_SECONDS:
+                path.unlink()
+        except FileNotFoundError:
+            pass
+    if not dead:
+        return archive
+
+    merged = {name for name in archive['merged'] if (directory / name).exists()}
+    new = [(path.name, _load(path)) for path in dead if path.name not in merged]
+    counters, histograms = _merge([archive] + [data for _, data in new if data])
+    archive = {
+        'counters': [[name, list(labels), value] for (name, labels), value in counters.items()],
+        'histograms': [[name, list(labels), series] for (name, labels), series in histograms.items()],
+        'merged': sorted(merged | {name for name, _ in new}),
+    }
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'w') as f:
+        f.write(json.dumps(archive))
+    os.replace(tmp_path, directory / ARCHIVE_NAME)
+    for path in dead:
+        path.unlink(missing_ok=True)
+    return archive
+
+
+def collect():
+    """Suma las métricas de todos los procesos que han escrito en ``METRICS_DIR``."""
+    registry.flush(force=True)
+    directory = Path(settings.METRICS_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    with _directory_lock(directory):
+        archive = _load(directory / ARCHIVE_NAME) or {'counters': [], 'histograms': [], 'merged': []}
+        if os.name == 'posix':
+            archive = _archive_dead(directory, archive)
+        skip = set(archive['merged']) | {ARCHIVE_NAME}
+        files = [_load(path) for path in directory.glob('*.json') if path.name not in skip]
+        return _merge([archive] + [data for data in files if data])
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=()):
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in pairs) + '}'
+
+
+def render():
+    """Texto en formato de exposición de Prometheus (versión 0.0.4)."""
+    counters, histograms = collect()
+    lines = []
+    for name, (kind, help_text, buckets) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        if kind == 'counter':
+            for (metric, labels), value in sorted(counters.items()):
+                if metric == name:
+                    lines.append(f"{name}{_format_labels(labels)} {value}")
+        else:
+            for (metric, labels), series in sorted(histograms.items()):
+                if metric != name:
+                    continue
+                for bound, count in zip(buckets, series['buckets']):
+                    lines.append(f"{name}_bucket{_format_labels(labels, [('le', bound)])} {count}")
+                lines.append(f"{name}_bucket{_format_labels(labels, [('le', '+Inf')])} {series['count']}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {series['sum']}")
+                lines.append(f"{name}_count{_format_labels(labels)} {series['count']}")
+    return '\n'.join(lines) + '\n'
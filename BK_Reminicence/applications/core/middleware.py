@@ -0,0 +1,88 @@
+# applications/core/middleware.py
+
+import json
+import logging
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from applications.music import scheduler
+
+from . import instrumentation, metrics as app_metrics
+
+logger = logging.getLogger('applications.core.performance')
+
+
+class PerformanceMiddleware:
+    """
+    Mide cada request (consultas a la BD, llamadas a Spotify, caché y
+    renderizado de plantillas) y emite una línea de log estructurada en JSON.
+    La cabecera ``Server-Timing`` solo se envía con ``DEBUG``,
+    ``SERVER_TIMING_ENABLED`` o a usuarios staff: revela cuántas consultas y
+    llamadas a Spotify hace cada vista.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics, token = instrumentation.start_request()
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(metrics.db_wrapper))
+                response = self.get_response(request)
+        finally:
+            instrumentation.end_request(token)
+        total = time.perf_counter() - start
+
+        if self._expose_timing(request):
+            response['Server-Timing'] = metrics.server_timing(total)
+
+        match = getattr(request, 'resolver_match', None)
+        view_name = match.view_name if match else 'unresolved'
+        app_metrics.observe('http_request_duration_seconds', total, view=view_name)
+        app_metrics.observe('view_db_queries', metrics.db_queries, view=view_name)
+        app_metrics.registry.flush()
+
+        logger.info(json.dumps({
+            'event': 'request',
+            'request_id': getattr(request, 'request_id', None),
+            'method': request.method,
+            'path': request.path,
+            'view': view_name,
+            'status': response.status_code,
+            'total_ms': round(total * 1000, 2),
+            **metrics.as_dict(),
+        }))
+        return response
+
+    @staticmethod
+    def _expose_timing(request):
+        if settings.DEBUG or settings.SERVER_TIMING_ENABLED:
+            return True
+        user = getattr(request, 'user', None)
+        return bool(user is not None and user.is_authenticated and user.is_staff)
+
+
+class ActivityMiddleware:
+    """
+    Registra la actividad de los usuarios autenticados para el planificador de
+    sincronización (music:scheduler). Va después de ``AuthenticationMiddleware``.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            try:
+                scheduler.record_activity(user.pk)
+            except Exception:
+                logger.exception("No se pudo registrar la actividad del usuario")
+        return response
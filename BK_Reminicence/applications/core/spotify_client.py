@@ -0,0 +1,107 @@
+# applications/core/spotify_client.py
+"""
+Cliente HTTP de Spotify instrumentado. Vive aparte de ``spotify_service``
+para que spotipy (y requests, redis...) solo se importen la primera vez que
+un proceso habla con Spotify, no al arrancar cada worker o comando.
+"""
+
+import hashlib
+import json
+import time
+
+import requests
+import spotipy
+from django.conf import settings
+from django.core.cache import cache
+
+from . import circuit_breaker, instrumentation, metrics
+
+
+# Lecturas del dashboard que se pueden responder con la última respuesta buena
+# si Spotify falla. Las páginas siguientes y el tráfico de sincronización e
+# importación (cientos de páginas por usuario) no se guardan: llenarían la
+# caché y desplazarían las versiones, tokens y bloqueos.
+STALE_ENDPOINTS = frozenset({
+    'me', 'me/playlists', 'me/top/artists', 'me/top/tracks', 'me/player/recently-played',
+})
+
+
+class SpotifyUnavailable(spotipy.SpotifyException):
+    """El circuito del grupo de endpoints está abierto y no hay una respuesta previa que servir."""
+
+
+class InstrumentedSpotify(spotipy.Spotify):
+    """
+    Cliente de spotipy que registra tiempo, resultado y errores de cada llamada HTTP por endpoint,
+    y la pasa por el circuit breaker de su grupo. Mientras Spotify falla, las lecturas de
+    ``STALE_ENDPOINTS`` se responden con la última respuesta buena del usuario (``stale``
+    queda en True) en vez de fallar.
+    """
+
+    def __init__(self, *args, cache_namespace=None, **kwargs):
+        kwargs.setdefault('requests_timeout', settings.SPOTIFY_REQUESTS_TIMEOUT)
+        kwargs.setdefault('retries', settings.SPOTIFY_RETRIES)
+        kwargs.setdefault('status_retries', settings.SPOTIFY_RETRIES)
+        super().__init__(*args, **kwargs)
+        self.prefix = settings.SPOTIFY_API_PREFIX
+        self.cache_namespace = cache_namespace
+        self.stale = False
+
+    def _last_good_key(self, method, endpoint, url, params):
+        if method != 'GET' or self.cache_namespace is None or endpoint not in STALE_ENDPOINTS:
+            return None
+        # Solo la primera página: spotipy pide las siguientes con la URL completa de ``next``.
+        if '?' in url or (params or {}).get('offset') or (params or {}).get('after'):
+            return None
+        raw = json.dumps([url, params], sort_keys=True, default=str)
+        return f"spotify:last_good:{self.cache_namespace}:{hashlib.md5(raw.encode()).hexdigest()}"
+
+    def _serve_stale(self, endpoint, key, error):
+        payload = cache.get(key) if key else None
+        if payload is None:
+            raise error
+        self.stale = True
+        metrics.inc('spotify_stale_responses_total', endpoint=endpoint)
+        return payload
+
+    def _internal_call(self, method, url, payload, params):
+        endpoint = instrumentation.spotify_endpoint(url)
+        group = circuit_breaker.endpoint_group(endpoint)
+        breaker = circuit_breaker.get_breaker(group)
+        key = self._last_good_key(method, endpoint, url, params)
+
+        if not breaker.allow():
+            metrics.inc('spotify_short_circuited_total', group=group)
+            return self._serve_stale(endpoint, key, SpotifyUnavailable(
+                503, -1, f"{url}: la API de Spotify no está disponible (circuito '{group}' abierto)"))
+
+        start = time.perf_counter()
+        status = 'ok'
+        failed = True
+        try:
+            result = super()._internal_call(method, url, payload, params)
+            failed = False
+        except spotipy.SpotifyException as e:
+            status = str(e.http_status)
+            if e.http_status == 429:
+                metrics.inc('spotify_rate_limited_total', endpoint=endpoint)
+            else:
+                metrics.inc('spotify_errors_total', endpoint=endpoint, status=status)
+            # Los 4xx son problemas de la petición, no de la salud de Spotify.
+            failed = e.http_status == 429 or e.http_status >= 500
+            if not failed:
+                raise
+            return self._serve_stale(endpoint, key, e)
+        except requests.RequestException as e:
+            status = 'network'
+            metrics.inc('spotify_errors_total', endpoint=endpoint, status=status)
+            return self._serve_stale(endpoint, key, e)
+        finally:
+            duration = time.perf_counter() - start
+            breaker.record(not failed, duration)
+            instrumentation.record_spotify_call(endpoint, duration)
+            metrics.inc('spotify_requests_total', endpoint=endpoint, result=status)
+
+        if key and result is not None:
+            cache.set(key, result, settings.SPOTIFY_STALE_TTL)
+        return result
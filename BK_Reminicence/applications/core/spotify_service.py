@@ -1,8 +1,102 @@
-import spotipy
-from spotipy.oauth2 import SpotifyOAuth
+import functools
+import time
 from django.conf import settings
+from django.core.cache import cache
 from django.utils import timezone
 from datetime import datetime
+from . import instrumentation, metrics
+
+# spotipy (y con él requests y redis) se importa al crear el primer cliente:
+# ver ``spotify_client``.
+
+
+def _token_key(user_id):
+    return f"spotify:access_token:{user_id}"
+
+
+def forget_access_token(user_id):
+    """Descarta el token cacheado (tokens nuevos guardados o cuenta desvinculada)."""
+    cache.delete(_token_key(user_id))
+
+
+def _load_access_token(user_id):
+    """Token de ``SpotifyUserToken``, refrescándolo (y guardándolo) si está por caducar."""
+    from applications.spotify_api.models import SpotifyUserToken
+    spotify_token_obj = SpotifyUserToken.objects.filter(user_id=user_id).first()
+
+    if not spotify_token_obj:
+        return None
+
+    token_info = {
+        'access_token': spotify_token_obj.access_token,
+        'refresh_token': spotify_token_obj.refresh_token,
+        'expires_at': int(spotify_token_obj.expires_at.timestamp()),
+        'scope': spotify_token_obj.scope
+    }
+
+    if _is_token_expired(token_info):
+        auth_manager = SpotifyService.get_auth_manager()
+        start = time.perf_counter()
+        try:
+            new_token_info = auth_manager.refresh_access_token(token_info['refresh_token'])
+        except Exception:
+            metrics.inc('spotify_token_refresh_total', result='error')
+            raise
+        finally:
+            instrumentation.record_spotify_call('token/refresh', time.perf_counter() - start)
+        metrics.inc('spotify_token_refresh_total', result='ok')
+        
+        spotify_token_obj.access_token = new_token_info['access_token']
+        spotify_token_obj.refresh_token = new_token_info.get('refresh_token', spotify_token_obj.refresh_token)
+        spotify_token_obj.expires_at = timezone.make_aware(datetime.fromtimestamp(new_token_info['expires_at']))
+        spotify_token_obj.scope = new_token_info['scope']
+        spotify_token_obj.save()
+        
+        token_info = new_token_info
+    return token_info
+
+
+def _is_token_expired(token_info):
+    # Mismo criterio que spotipy: caducado si le queda menos de un minuto.
+    return token_info['expires_at'] - int(time.time()) < 60
+
+
+def get_access_token(user_id):
+    """
+    Token de acceso de Spotify del usuario (``access_token``, ``expires_at``,
+    ``scope``), o None si no vinculó su cuenta. Se cachea hasta poco antes de
+    caducar, así que la mayoría de las llamadas no consultan la base de datos;
+    el refresh token no sale de ``SpotifyUserToken``.
+    """
+    key = _token_key(user_id)
+    token_info = cache.get(key)
+    if token_info is not None and not _is_token_expired(token_info):
+        return token_info
+
+    token_info = _load_access_token(user_id)
+    if token_info is None:
+        return None
+    token_info = {name: token_info[name] for name in ('access_token', 'expires_at', 'scope')}
+    # is_token_expired da por caducado un token al que le queda menos de un minuto.
+    timeout = token_info['expires_at'] - int(time.time()) - 60
+    if timeout > 0:
+        cache.set(key, token_info, timeout)
+    return token_info
+
+
+def observed(method):
+    """Registra la latencia de un método de ``SpotifyService`` en el histograma de métricas."""
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        if not self.sp:
+            return method(self, *args, **kwargs)
+        start = time.perf_counter()
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            metrics.observe('spotify_method_duration_seconds', time.perf_counter() - start, method=method.__name__)
+    return wrapper
+
 
 class SpotifyService:
     """
@@ -14,49 +108,33 @@ class SpotifyService:
         self.sp = None
         
         try:
-            from applications.spotify_api.models import SpotifyUserToken
-            spotify_token_obj = SpotifyUserToken.objects.filter(user=user).first()
-            
-            if not spotify_token_obj:
-                return
-
-            auth_manager = self.get_auth_manager()
-            
-            token_info = {
-                'access_token': spotify_token_obj.access_token,
-                'refresh_token': spotify_token_obj.refresh_token,
-                'expires_at': int(spotify_token_obj.expires_at.timestamp()),
-                'scope': spotify_token_obj.scope
-            }
-
-            if auth_manager.is_token_expired(token_info):
-                new_token_info = auth_manager.refresh_access_token(token_info['refresh_token'])
-                
-                spotify_token_obj.access_token = new_token_info['access_token']
-                spotify_token_obj.refresh_token = new_token_info.get('refresh_token', spotify_token_obj.refresh_token)
-                spotify_token_obj.expires_at = timezone.make_aware(datetime.fromtimestamp(new_token_info['expires_at']))
-                spotify_token_obj.scope = new_token_info['scope']
-                spotify_token_obj.save()
-                
-                token_info = new_token_info
-
-            self.sp = spotipy.Spotify(auth=token_info['access_token'])
+            token_info = get_access_token(user.pk)
+            if token_info:
+                from .spotify_client import InstrumentedSpotify
+                self.sp = InstrumentedSpotify(auth=token_info['access_token'], cache_namespace=user.pk)
 
         except Exception:
             # En caso de error, self.sp seguirá siendo None, y los métodos
             # que lo usan devolverán listas vacías o None de forma segura.
             pass
     
+    @property
+    def is_stale(self):
+        """True si alguna respuesta se sirvió desde la caché porque Spotify no estaba disponible."""
+        return bool(self.sp and self.sp.stale)
+
     @staticmethod
     def get_auth_manager():
         """Retorna el manager de autenticación de Spotify."""
+        from spotipy.oauth2 import SpotifyOAuth
         return SpotifyOAuth(
             client_id=settings.SPOTIFY_CLIENT_ID,
             client_secret=settings.SPOTIFY_CLIENT_SECRET,
             redirect_uri=settings.SPOTIFY_REDIRECT_URI,
-            scope="streaming user-library-read user-top-read playlist-read-private user-read-recently-played user-read-email user-read-private"
+            scope="streaming user-library-read user-follow-read user-top-read playlist-read-private user-read-recently-played user-read-email user-read-private"
         )
-    
+
+    @observed
     def get_user_playlists(self):
         """Obtiene las playlists del usuario."""
         if not self.sp:
@@ -67,6 +145,8 @@ class SpotifyService:
             return [{
                 'id': pl['id'],
                 'name': pl['name'],
+                'description': pl.get('description'),
+                'snapshot_id': pl.get('snapshot_id'),
                 'uri': pl['uri'],
                 'image': pl['images'][0]['url'] if pl['images'] else None,
                 'owner': pl['owner']['display_name'],
@@ -75,7 +155,8 @@ class SpotifyService:
             } for pl in playlists['items']]
         except Exception:
             return []
-    
+
+    @observed
     def get_user_top_artists(self, limit=10):
         """Obtiene los artistas más escuchados del usuario."""
         if not self.sp:
@@ -93,7 +174,8 @@ class SpotifyService:
             } for artist in artists['items']]
         except Exception:
             return []
-    
+
+    @observed
     def get_user_top_tracks(self, limit=10):
         """Obtiene las canciones más escuchadas del usuario."""
         if not self.sp:
@@ -112,7 +194,8 @@ class SpotifyService:
             } for track in tracks['items']]
         except Exception:
             return []
-    
+
+    @observed
     def get_recently_played(self, limit=20):
         """Obtiene las canciones reproducidas recientemente."""
         if not self.sp:
@@ -131,7 +214,8 @@ class SpotifyService:
             } for item in recent['items']]
         except Exception:
             return []
-        
+
+    @observed
     def get_user_profile(self):
         """Obtiene el perfil completo del usuario de Spotify."""
         if not self.sp:
@@ -154,6 +238,7 @@ class SpotifyService:
         
     # Pega estos tres nuevos métodos dentro de la clase SpotifyService
 
+    @observed
     def get_artist_details(self, artist_id):
         """Obtiene los detalles principales de un solo artista."""
         if not self.sp:
@@ -171,6 +256,7 @@ class SpotifyService:
             print(f"Error obteniendo detalles del artista {artist_id}: {e}")
             return None
 
+    @observed
     def get_artist_top_tracks(self, artist_id, limit=10):
             """Obtiene las canciones más populares de un artista."""
             if not self.sp:
@@ -204,6 +290,7 @@ class SpotifyService:
                 print(f"Error obteniendo top tracks del artista {artist_id}: {e}")
                 return []
 
+    @observed
     def get_artist_albums(self, artist_id, limit=20):
         """Obtiene los álbumes y sencillos de un artista."""
         if not self.sp:
@@ -229,7 +316,8 @@ class SpotifyService:
         except Exception as e:
             print(f"Error obteniendo álbumes del artista {artist_id}: {e}")
             return []
-    
+
+    @observed
     def get_album_details(self, album_id):
         """
         Obtiene los detalles de un álbum y su lista completa de canciones.
@@ -273,7 +361,8 @@ class SpotifyService:
         except Exception as e:
             print(f"Error obteniendo detalles del álbum {album_id}: {e}")
             return None
-        
+
+    @observed
     def search_spotify(self, query, limit=5):
         """
         Busca en Spotify por canciones, artistas, álbumes y playlists.
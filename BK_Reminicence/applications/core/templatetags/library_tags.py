@@ -0,0 +1,48 @@
+from django import template
+from django.template.loader import render_to_string
+
+from applications.core import dashboard, instrumentation, library_cache
+from applications.core.spotify_service import SpotifyService
+from applications.spotify_api.models import SpotifyUserToken
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def sidebar_library(context):
+    """
+    Renderiza la lista de playlists del sidebar desde la caché por usuario.
+    Solo consulta Spotify y vuelve a renderizar cuando cambia la versión de la
+    biblioteca (ver ``library_cache.bump_library_version``).
+    """
+    request = context.get('request')
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        return ''
+
+    html = library_cache.get_sidebar_fragment(user.pk)
+    instrumentation.record_cache('sidebar', html is not None)
+    if html is not None:
+        return html
+
+    spotify_connected = SpotifyUserToken.objects.filter(user=user).exists()
+    user_playlists = []
+    stale = False
+    if spotify_connected:
+        # El snapshot del dashboard ya trae las playlists; solo sin él se consulta Spotify.
+        user_playlists = dashboard.load_snapshot(user.pk, ['playlists']).get('playlists')
+        if user_playlists is None:
+            spotify_service = SpotifyService(user)
+            user_playlists = spotify_service.get_user_playlists()
+            stale = spotify_service.is_stale
+
+    html = render_to_string('core/partials/_sidebar_library.html', {
+        'spotify_connected': spotify_connected,
+        'user_playlists': user_playlists,
+    }, request=request)
+
+    # Una lista vacía con Spotify conectado suele ser un fallo de la API, y una copia
+    # caducada debe reemplazarse en cuanto Spotify vuelva: ninguna de las dos se cachea.
+    if not spotify_connected or (user_playlists and not stale):
+        library_cache.set_sidebar_fragment(user.pk, html)
+    return html
@@ -0,0 +1,24 @@
+# applications/core/test_runner.py
+"""
+Runner de pruebas que crea también las tablas de los modelos ``managed =
+False`` (``Songs``, ``Playlist``, ``PlaybackHistory``...). En producción esas
+tablas vienen del esquema existente; en la base de datos de pruebas no hay
+nadie más que las cree.
+"""
+
+from django.apps import apps
+from django.test.runner import DiscoverRunner
+
+
+class ManagedModelTestRunner(DiscoverRunner):
+
+    def setup_databases(self, **kwargs):
+        self.unmanaged_models = [model for model in apps.get_models() if not model._meta.managed]
+        for model in self.unmanaged_models:
+            model._meta.managed = True
+        return super().setup_databases(**kwargs)
+
+    def teardown_databases(self, old_config, **kwargs):
+        super().teardown_databases(old_config, **kwargs)
+        for model in self.unmanaged_models:
+            model._meta.managed = False
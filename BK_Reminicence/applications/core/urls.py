@@ -5,6 +5,9 @@ app_name = 'core'
 
 urlpatterns = [
     path('', views.index, name='index'),
+    path('dashboard/<str:section>/', views.dashboard_section, name='dashboard_section'),
     path('spotify/disconnect/', views.disconnect_spotify, name='disconnect_spotify'),
     path('spotify/sync/', views.sync_spotify_data, name='sync_spotify'),
+    path('img/<int:size>/', views.image_proxy_view, name='image_proxy'),
+    path('metrics', views.metrics_view, name='metrics'),
 ]
\ No newline at end of file
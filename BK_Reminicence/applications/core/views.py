@@ -2,52 +2,51 @@
 
 from django.shortcuts import render, redirect
 from django.contrib.auth.decorators import login_required
-from .spotify_service import SpotifyService
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition, require_GET
+from . import background, dashboard, image_proxy, metrics
+from .library_cache import bump_library_version
+from .spotify_service import forget_access_token
 from applications.spotify_api.models import SpotifyUserToken
-from applications.music.models import Playlist, PlaybackHistory
-from applications.music.sync_service import SpotifySyncService
-from django.utils import timezone
-from datetime import timedelta
-from applications.music.models import Playlist, Songs, Artists
+from applications.music import sync_lease
+import hmac
+import logging
+
+logger = logging.getLogger(__name__)
+
+# sección del dashboard -> (título, plantilla)
+DASHBOARD_SECTIONS = {
+    'top_tracks': ('Tus canciones favoritas', 'core/partials/sections/_top_tracks.html'),
+    'recently_played': ('Escuchado recientemente', 'core/partials/sections/_recently_played.html'),
+    'top_artists': ('Tus artistas favoritos', 'core/partials/sections/_top_artists.html'),
+    'playlists': ('Tus playlists', 'core/partials/sections/_playlists.html'),
+}
+
 
 @login_required
 def index(request):
-    """Vista principal que muestra el dashboard de Spotify"""
+    """
+    Vista principal que muestra el dashboard de Spotify.
+    Solo pinta el esqueleto; cada sección se carga con HTMX desde dashboard_section.
+    """
     context = {
         'user_profile': None,
-        'user_playlists': [],
-        'top_tracks': [],
-        'recently_played': [],
-        'top_artists': [],
         'spotify_connected': False,
-        'db_stats': {
-            'playlists_count': 0,
-            'songs_count': 0,
-            'artists_count': 0, 
-        }
+        'dashboard_sections': [(section, title) for section, (title, _) in DASHBOARD_SECTIONS.items()],
     }
     
     try:
         spotify_token = SpotifyUserToken.objects.get(user=request.user)
         if spotify_token.access_token:
             context['spotify_connected'] = True
-            context['db_stats']['playlists_count'] = Playlist.objects.filter(user=request.user).count()
-            context['db_stats']['songs_count'] = Songs.objects.count()
-            context['db_stats']['artists_count'] = Artists.objects.count()
-            
-            spotify_service = SpotifyService(request.user)
-            
-            if spotify_service.sp:
-                context['user_profile'] = spotify_service.get_user_profile()
-                context['user_playlists'] = spotify_service.get_user_playlists()
-                context['top_tracks'] = spotify_service.get_user_top_tracks(limit=6)
-                context['recently_played'] = spotify_service.get_recently_played(limit=6)
-                context['top_artists'] = spotify_service.get_user_top_artists(limit=5)
+            context['user_profile'] = dashboard.load_snapshot(request.user.pk, ['profile']).get('profile')
                 
     except SpotifyUserToken.DoesNotExist:
         pass
-    except Exception as e:
-        print(f"Error en la vista index: {e}")
+    except Exception:
+        logger.exception("Error en la vista index")
     
     # CORRECCIÓN: Si es una petición de HTMX, devuelve el parcial que incluye la top_bar.
     if request.headers.get('HX-Request'):
@@ -56,11 +55,63 @@ def index(request):
     return render(request, 'core/index.html', context)
 
 
+@login_required
+@require_GET
+def dashboard_section(request, section):
+    """
+    Fragmento HTMX de una sección del dashboard, servido desde el snapshot.
+
+    - Sin datos previos, consulta Spotify solo para esta sección.
+    - Con datos caducados, los devuelve y refresca en segundo plano; el fragmento
+      se consulta a sí mismo con ``?poll=1`` (204 mientras el refresco sigue en curso).
+    - Con datos frescos, la respuesta es cacheable hasta que caduquen.
+    """
+    if section == 'stats':
+        sync = sync_lease.current_sync(request.user.pk)
+        if request.GET.get('sync') and not sync:
+            # El panel seguía una sincronización que ya terminó: los conteos cacheados están viejos.
+            dashboard.forget_db_stats(request.user.pk)
+        return _stats_response(request, sync)
+    if section not in DASHBOARD_SECTIONS:
+        raise Http404("Sección desconocida")
+
+    user_id = request.user.pk
+    polling = 'poll' in request.GET
+    if polling and dashboard.is_refreshing(user_id):
+        return HttpResponse(status=204)
+
+    snapshot = dashboard.load_snapshot(user_id)
+    if not snapshot.has(section):
+        dashboard.refresh_snapshot(user_id, [section])
+        snapshot = dashboard.load_snapshot(user_id)
+    elif snapshot.stale_sections and not polling:
+        dashboard.schedule_refresh(user_id, snapshot.stale_sections)
+
+    stale = section in snapshot.stale_sections
+    refreshing = stale and not polling and dashboard.is_refreshing(user_id)
+    response = render(request, DASHBOARD_SECTIONS[section][1], {
+        'section': section,
+        section: snapshot.get(section, []),
+        'updated_at': snapshot.fetched_at.get(section),
+        'refreshing': refreshing,
+        # Si el refresco terminó y la sección sigue caducada, Spotify no respondió.
+        'spotify_stale': stale and snapshot.has(section) and not refreshing,
+    })
+    if stale:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, private=True, max_age=snapshot.seconds_fresh(section))
+    return response
+
+
 @login_required
 def disconnect_spotify(request):
     try:
         spotify_token = SpotifyUserToken.objects.get(user=request.user)
         spotify_token.delete()
+        forget_access_token(request.user.pk)
+        dashboard.clear_snapshot(request.user.pk)
+        bump_library_version(request.user.pk)
     except SpotifyUserToken.DoesNotExist:
         pass
     return redirect('core:index')
@@ -68,9 +119,81 @@ def disconnect_spotify(request):
 
 @login_required
 def sync_spotify_data(request):
+    """
+    Inicia la sincronización completa en segundo plano. Si ya hay una en curso
+    (doble clic, otra pestaña, el planificador) no empieza otra: se muestra el
+    avance de esa. Con HTMX responde el panel de estadísticas con el avance.
+    """
+    from applications.music.sync_service import run_full_sync
+
     try:
-        sync_service = SpotifySyncService(request.user)
-        results = sync_service.full_sync()
-    except Exception as e:
-        print(f"Error durante sincronización: {e}")
-    return redirect('core:index')
\ No newline at end of file
+        lease = sync_lease.acquire(request.user)
+    except sync_lease.SyncInProgress as busy:
+        lease = busy.log
+    except Exception:
+        logger.exception("Error durante sincronización")
+        lease = None
+    else:
+        try:
+            background.submit(run_full_sync, request.user, lease)
+        except Exception as e:
+            logger.exception("No se pudo iniciar la sincronización en segundo plano")
+            sync_lease.release(lease, error=str(e))
+            lease = None
+
+    if request.headers.get('HX-Request'):
+        return _stats_response(request, lease)
+    return redirect('core:index')
+
+
+def _stats_response(request, sync=None):
+    """Panel de estadísticas; mientras hay una sincronización en curso muestra su avance y se consulta solo."""
+    response = render(request, 'core/partials/sections/_stats.html', {
+        'db_stats': dashboard.get_db_stats(request.user),
+        'sync': sync if sync and sync.status == 'running' else None,
+    })
+    if sync:
+        patch_cache_control(response, private=True, no_cache=True)
+    else:
+        patch_cache_control(response, private=True, max_age=settings.DASHBOARD_STATS_TIMEOUT)
+    return response
+
+
+def _image_etag(request, size):
+    url = request.GET.get('url', '')
+    return f"{image_proxy.image_key(url)}-{size}" if url else None
+
+
+@require_GET
+@condition(etag_func=_image_etag)
+def image_proxy_view(request, size):
+    """
+    Sirve una miniatura WebP cacheada en disco de una portada de Spotify.
+    Si la imagen no puede procesarse, redirige al original.
+    """
+    url = request.GET.get('url', '')
+    if size not in image_proxy.THUMBNAIL_SIZES or not image_proxy.is_proxyable(url):
+        raise Http404("Imagen no disponible")
+
+    try:
+        # prune_image_cache puede borrar la miniatura entre que se genera y se abre.
+        thumbnail = open(image_proxy.get_thumbnail(url, size), 'rb')
+    except Exception:
+        logger.exception(f"Error generando miniatura de {url}")
+        return redirect(url)
+
+    response = FileResponse(thumbnail, content_type='image/webp')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
+
+@require_GET
+def metrics_view(request):
+    """Métricas de todos los workers en formato de Prometheus, solo para staff, IPs permitidas o con el token."""
+    token = request.META.get('HTTP_AUTHORIZATION', '').removeprefix('Bearer ')
+    allowed = request.META.get('REMOTE_ADDR') in settings.METRICS_ALLOWED_IPS or bool(
+        settings.METRICS_TOKEN and hmac.compare_digest(token.encode(), settings.METRICS_TOKEN.encode())
+    )
+    if not allowed and not (request.user.is_authenticated and request.user.is_staff):
+        return HttpResponseForbidden()
+    return HttpResponse(metrics.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
\ No newline at end of file
@@ -0,0 +1,84 @@
+# applications/music/artist_lookup.py
+"""
+Búsqueda de artistas locales por nombre normalizado (``Artists.normalized_name``).
+
+- ``find_artist``: coincidencia exacta con una sola consulta sobre el índice.
+- ``similar_artists``: candidatos ordenados por parecido. En PostgreSQL usa
+  ``pg_trgm`` (el operador ``%`` aprovecha el índice GIN de trigramas); en
+  otros motores se acotan los candidatos por prefijo y se ordenan con difflib.
+- ``duplicate_groups``: artistas distintos con el mismo nombre normalizado.
+"""
+
+from difflib import SequenceMatcher
+
+from django.db import connection
+from django.db.models import Count, F, Q
+
+from .models import Artists
+from .normalization import normalize_name
+
+SIMILARITY_THRESHOLD = 0.3
+
+# Máximo de candidatos que se comparan en Python cuando no hay pg_trgm.
+_FALLBACK_CANDIDATES = 2000
+
+
+def find_artist(name):
+    """El artista con ese nombre (sin distinguir mayúsculas, tildes ni puntuación), o None."""
+    normalized = normalize_name(name)
+    if not normalized:
+        return None
+    return Artists.objects.filter(normalized_name=normalized).order_by(F('followers').desc(nulls_last=True)).first()
+
+
+def similar_artists(name, limit=10, threshold=SIMILARITY_THRESHOLD):
+    """
+    Artistas parecidos a ``name``, del más al menos parecido; cada uno con el
+    atributo ``similarity`` entre 0 y 1.
+    """
+    normalized = normalize_name(name)
+    if not normalized:
+        return []
+    if connection.vendor == 'postgresql':
+        return _similar_trigram(normalized, limit, threshold)
+    return _similar_difflib(normalized, limit, threshold)
+
+
+def _similar_trigram(normalized, limit, threshold):
+    from django.contrib.postgres.lookups import TrigramSimilar
+    from django.contrib.postgres.search import TrigramSimilarity
+
+    return list(
+        Artists.objects.filter(TrigramSimilar(F('normalized_name'), normalized))
+        .annotate(similarity=TrigramSimilarity('normalized_name', normalized))
+        .filter(similarity__gte=threshold)
+        .order_by('-similarity', 'artist_id')[:limit]
+    )
+
+
+def _similar_difflib(normalized, limit, threshold):
+    tokens = sorted(normalized.split(), key=len, reverse=True)
+    condition = Q(normalized_name__startswith=normalized[:3])
+    if len(tokens[0]) >= 3:
+        condition |= Q(normalized_name__contains=tokens[0])
+    candidates = Artists.objects.filter(condition)[:_FALLBACK_CANDIDATES]
+
+    ranked = []
+    for artist in candidates:
+        artist.similarity = SequenceMatcher(None, normalized, artist.normalized_name or '').ratio()
+        if artist.similarity >= threshold:
+            ranked.append(artist)
+    ranked.sort(key=lambda artist: (-artist.similarity, artist.artist_id))
+    return ranked[:limit]
+
+
+def duplicate_groups(limit=None):
+    """Nombres normalizados compartidos por más de un artista, con cuántos son."""
+    groups = (
+        Artists.objects.exclude(normalized_name__isnull=True)
+        .values('normalized_name')
+        .annotate(count=Count('artist_id'))
+        .filter(count__gt=1)
+        .order_by('-count', 'normalized_name')
+    )
+    return groups[:limit] if limit else groups
@@ -0,0 +1,227 @@
+# applications/music/canonical.py
+"""
+Deduplicación del catálogo por ISRC.
+
+``sync_song`` crea una fila de ``Songs`` por cada ``spotify_id``, así que la
+misma grabación aparece varias veces (single, álbum, recopilatorios,
+ediciones regionales). ``CanonicalSong`` asigna a cada canción con ISRC la
+canción canónica de su grupo; la sincronización la mantiene al día para los
+ISRC que toca y ``merge_duplicate_songs`` puede fusionar después las filas
+duplicadas por lotes. El ``spotify_id`` de cada duplicado fusionado queda en
+``SongAlias``, y ``song_ids`` lo resuelve a la canónica.
+
+Mientras no se fusionen, las agregaciones por canción deben agrupar por
+``canonical_id()`` en lugar de ``song_id``.
+"""
+
+from django.db import transaction
+
+from applications.core.library_cache import bump_library_version
+from django.db.models import Case, F, Q, Value, When
+from django.db.models.functions import Coalesce
+
+from .models import (
+    CanonicalSong, PlaybackHistory, PlaylistSong, SongAlias, SongGenre, SongNeighbour, Songs, UserFavoriteSong,
+)
+
+BATCH_SIZE = 1000
+
+# Preferencia de tipo de álbum para la canción canónica (menor es mejor).
+_ALBUM_TYPE_ORDER = {'album': 0, 'single': 1, 'compilation': 2}
+
+
+def canonical_id(song_field=None):
+    """
+    Expresión con el id canónico de una canción: ``canonical_id()`` sobre
+    ``Songs`` o ``canonical_id('song')`` sobre un modelo con FK ``song``.
+    """
+    if song_field:
+        return Coalesce(F(f'{song_field}__canonical_mapping__canonical_id'), F(f'{song_field}_id'))
+    return Coalesce(F('canonical_mapping__canonical_id'), F('song_id'))
+
+
+def _batches(values, batch_size=BATCH_SIZE):
+    values = list(values)
+    for start in range(0, len(values), batch_size):
+        yield values[start:start + batch_size]
+
+
+def aliases(spotify_ids):
+    """spotify_id -> song_id de los ``spotify_ids`` que son duplicados ya fusionados."""
+    found = {}
+    for batch in _batches(spotify_ids):
+        found.update(SongAlias.objects.filter(spotify_id__in=batch).values_list('spotify_id', 'song_id'))
+    return found
+
+
+def song_ids(spotify_ids):
+    """spotify_id -> song_id en el catálogo, resolviendo los duplicados fusionados a su canónica."""
+    found = {}
+    for batch in _batches(spotify_ids):
+        found.update(Songs.objects.filter(spotify_id__in=batch).values_list('spotify_id', 'song_id'))
+    found.update(aliases(spotify_ids))
+    return found
+
+
+def canonical_map(song_ids):
+    """song_id -> id canónico de las canciones indicadas (ellas mismas si no son duplicado)."""
+    song_ids = set(song_ids)
+    mapped = {}
+    for batch in _batches(song_ids):
+        mapped.update(CanonicalSong.objects.filter(song_id__in=batch).values_list('song_id', 'canonical_id'))
+    return {song_id: mapped.get(song_id, song_id) for song_id in song_ids}
+
+
+def canonical_ids(song_ids):
+    """Ids canónicos de las canciones indicadas (una por grabación)."""
+    return set(canonical_map(song_ids).values())
+
+
+def canonical_songs():
+    """Canciones que no son duplicado de otra (una por grabación)."""
+    return Songs.objects.filter(Q(canonical_mapping__isnull=True) | Q(canonical_mapping__canonical=F('song_id')))
+
+
+def _preference(song):
+    song_id, _, album_type, popularity = song
+    return (_ALBUM_TYPE_ORDER.get(album_type, 3), -(popularity or 0), song_id)
+
+
+def _update_batch(isrcs):
+    songs = list(Songs.objects.filter(isrc__in=isrcs).values_list('song_id', 'isrc', 'album__album_type', 'popularity'))
+    current = dict(CanonicalSong.objects.filter(isrc__in=isrcs).values_list('song_id', 'canonical_id'))
+
+    groups = {}
+    for song in songs:
+        groups.setdefault(song[1], []).append(song)
+
+    rows = []
+    duplicates = 0
+    for isrc, group in groups.items():
+        ids = {song[0] for song in group}
+        # Se conserva la canónica anterior mientras siga en el grupo, para no mover las agregaciones.
+        previous = {current.get(song_id) for song_id in ids} & ids
+        canonical = min(previous) if previous else min(group, key=_preference)[0]
+        rows.extend(CanonicalSong(song_id=song_id, canonical_id=canonical, isrc=isrc) for song_id in ids)
+        duplicates += len(ids) - 1
+
+    with transaction.atomic():
+        # Canciones que cambiaron de ISRC o se borraron desde la última vez.
+        CanonicalSong.objects.filter(isrc__in=isrcs).exclude(song_id__in=[row.song_id for row in rows]).delete()
+        CanonicalSong.objects.bulk_create(
+            rows, batch_size=BATCH_SIZE,
+            update_conflicts=True, unique_fields=['song'], update_fields=['canonical', 'isrc'],
+        )
+    return duplicates
+
+
+def update_mapping(isrcs=None, batch_size=BATCH_SIZE):
+    """
+    Recalcula el mapeo de los ISRC indicados (o de todo el catálogo si es
+    None), con unas pocas consultas por lote. Retorna cuántas canciones
+    quedaron marcadas como duplicado.
+    """
+    if isrcs is None:
+        isrcs = (
+            Songs.objects.exclude(isrc__isnull=True).exclude(isrc='')
+            .order_by('isrc').values_list('isrc', flat=True).distinct().iterator()
+        )
+    duplicates = 0
+    batch = []
+    for isrc in isrcs:
+        if not isrc:
+            continue
+        batch.append(isrc)
+        if len(batch) >= batch_size:
+            duplicates += _update_batch(batch)
+            batch = []
+    if batch:
+        duplicates += _update_batch(batch)
+    return duplicates
+
+
+def _repoint(queryset, mapping):
+    """Cambia ``song_id`` de duplicado a canónico en una sola sentencia UPDATE."""
+    return queryset.filter(song_id__in=mapping).update(
+        song_id=Case(*[When(song_id=dup, then=Value(canon)) for dup, canon in mapping.items()])
+    )
+
+
+def _drop_conflicts(model, owner, mapping):
+    """
+    Borra las filas del duplicado cuando el mismo dueño (playlist, usuario) ya
+    tiene la canónica: la tabla no admite la canción dos veces.
+    """
+    rows = list(model.objects.filter(song_id__in=mapping).values_list('pk', owner, 'song_id'))
+    owners = {row[1] for row in rows}
+    taken = set(model.objects.filter(**{f'{owner}__in': owners}, song_id__in=set(mapping.values()))
+                .values_list(owner, 'song_id'))
+    conflicting = []
+    seen = set(taken)
+    for pk, owner_id, song_id in rows:
+        key = (owner_id, mapping[song_id])
+        if key in seen:
+            conflicting.append(pk)
+        else:
+            seen.add(key)
+    model.objects.filter(pk__in=conflicting).delete()
+
+
+def _bump_libraries(user_ids):
+    for user_id in user_ids:
+        bump_library_version(user_id)
+
+
+def _merge_batch(mapping):
+    with transaction.atomic():
+        # Usuarios cuya biblioteca cambia: sus cachés (índice, sidebar, ETags) apuntan a los duplicados.
+        user_ids = set(PlaylistSong.objects.filter(song_id__in=mapping).values_list('playlist__user_id', flat=True))
+        user_ids.update(UserFavoriteSong.objects.filter(song_id__in=mapping).values_list('user_id', flat=True))
+        transaction.on_commit(lambda: _bump_libraries(user_ids))
+
+        _drop_conflicts(PlaylistSong, 'playlist_id', mapping)
+        _drop_conflicts(UserFavoriteSong, 'user_id', mapping)
+        _repoint(PlaylistSong.objects.all(), mapping)
+        _repoint(UserFavoriteSong.objects.all(), mapping)
+        _repoint(PlaybackHistory.objects.all(), mapping)
+
+        has_genre = set(SongGenre.objects.filter(song_id__in=set(mapping.values())).values_list('song_id', flat=True))
+        SongGenre.objects.filter(song_id__in=[dup for dup, canon in mapping.items() if canon in has_genre]).delete()
+        _repoint(SongGenre.objects.all(), mapping)
+
+        # Los vecinos de los duplicados se recalculan en la próxima reconstrucción.
+        SongNeighbour.objects.filter(Q(song_id__in=mapping) | Q(neighbour_id__in=mapping)).delete()
+
+        # Spotify seguirá mandando el spotify_id del duplicado: queda como alias de la canónica.
+        _repoint(SongAlias.objects.all(), mapping)
+        SongAlias.objects.bulk_create(
+            [SongAlias(spotify_id=spotify_id, song_id=mapping[song_id])
+             for song_id, spotify_id in Songs.objects.filter(song_id__in=mapping).values_list('song_id', 'spotify_id')
+             if spotify_id],
+            batch_size=BATCH_SIZE,
+            update_conflicts=True, unique_fields=['spotify_id'], update_fields=['song'],
+        )
+        CanonicalSong.objects.filter(song_id__in=mapping).delete()
+        Songs.objects.filter(song_id__in=mapping).delete()
+
+
+def pending_merges():
+    return CanonicalSong.objects.exclude(canonical_id=F('song_id'))
+
+
+def merge_duplicates(batch_size=500, progress=None):
+    """
+    Fusiona los duplicados en su canción canónica por lotes (una transacción
+    por lote): reapunta playlists, favoritos, historial y géneros, guarda el
+    ``spotify_id`` de cada duplicado como alias y borra sus filas de
+    ``Songs``. Retorna cuántas canciones fusionó.
+    """
+    merged = 0
+    while True:
+        mapping = dict(pending_merges().order_by('song_id').values_list('song_id', 'canonical_id')[:batch_size])
+        if not mapping:
+            return merged
+        _merge_batch(mapping)
+        merged += len(mapping)
+        if progress:
+            progress(merged)
@@ -0,0 +1,159 @@
+# applications/music/export.py
+"""
+Exportación en streaming de la biblioteca sincronizada de un usuario.
+
+El grafo Playlist → PlaylistSong → Songs → Albums → Artists se recorre por
+entidad, en bloques de ``CHUNK_SIZE`` filas con paginación keyset y ``values()``:
+cada bloque es una sola consulta, así que el número de consultas depende del
+tamaño de la biblioteca entre ``CHUNK_SIZE`` y nunca se arma el documento
+completo en memoria.
+
+Formatos:
+- ``jsonl``: una línea por registro con un campo ``type``.
+- ``zip``: un CSV por entidad dentro de un ZIP escrito sobre un flujo sin
+  ``seek`` (zipfile usa descriptores de datos), comprimido al vuelo.
+"""
+
+import csv
+import io
+import json
+import zipfile
+from functools import reduce
+from operator import or_
+
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Albums, Artists, Playlist, PlaylistSong, Songs
+
+CHUNK_SIZE = 2000
+
+FORMATS = {
+    'jsonl': 'application/x-ndjson',
+    'zip': 'application/zip',
+}
+
+# entidad -> columnas exportadas
+COLUMNS = {
+    'playlists': ['playlist_id', 'name', 'description', 'status', 'spotify_id', 'spotify_snapshot_id',
+                  'cover_image_url', 'is_synced_with_spotify', 'last_sync_date', 'created_at'],
+    'playlist_songs': ['playlist_id', 'position', 'song_id', 'date_added'],
+    'songs': ['song_id', 'album_id', 'title', 'duration', 'track_number', 'disc_number', 'explicit_content',
+              'isrc', 'popularity', 'spotify_id', 'spotify_url', 'preview_url'],
+    'albums': ['album_id', 'artist_id', 'title', 'release_date', 'release_year', 'album_type', 'total_tracks',
+               'record_label', 'spotify_id', 'spotify_url', 'cover_image_url'],
+    'artists': ['artist_id', 'name', 'country', 'popularity', 'followers', 'artist_type', 'spotify_id',
+                'spotify_url', 'image_url'],
+}
+
+
+def _keyset(queryset, order, chunk_size):
+    """
+    Recorre ``queryset`` (ya con ``values()``) ordenado por ``order`` en bloques,
+    continuando cada bloque después de la última fila del anterior.
+    """
+    queryset = queryset.order_by(*order)
+    last = None
+    while True:
+        page = queryset
+        if last is not None:
+            # (a, b, c) > (x, y, z) expresado como OR de prefijos iguales + siguiente mayor
+            conditions = []
+            for i, field in enumerate(order):
+                equal = {prev: last[prev] for prev in order[:i]}
+                conditions.append(Q(**equal, **{f"{field}__gt": last[field]}))
+            page = page.filter(reduce(or_, conditions))
+        rows = list(page[:chunk_size])
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1]
+
+
+def iter_library(user, chunk_size=CHUNK_SIZE):
+    """Pares ``(entidad, fila)`` de la biblioteca del usuario, entidad por entidad."""
+    entities = [
+        ('playlists', Playlist.objects.filter(user=user), ['playlist_id']),
+        ('playlist_songs', PlaylistSong.objects.filter(playlist__user=user), ['playlist_id', 'position', 'song_id']),
+        ('songs', Songs.objects.filter(playlists__user=user).distinct(), ['song_id']),
+        ('albums', Albums.objects.filter(songs__playlists__user=user).distinct(), ['album_id']),
+        ('artists', Artists.objects.filter(albums__songs__playlists__user=user).distinct(), ['artist_id']),
+    ]
+    for entity, queryset, order in entities:
+        for row in _keyset(queryset.values(*COLUMNS[entity]), order, chunk_size):
+            yield entity, row
+
+
+def _jsonl(user, chunk_size):
+    buffer = []
+    for entity, row in iter_library(user, chunk_size):
+        buffer.append(json.dumps({'type': entity[:-1], **row}, default=str, ensure_ascii=False))
+        if len(buffer) >= chunk_size:
+            yield ('\n'.join(buffer) + '\n').encode('utf-8')
+            buffer = []
+    if buffer:
+        yield ('\n'.join(buffer) + '\n').encode('utf-8')
+
+
+class _StreamSink(io.RawIOBase):
+    """Destino de escritura sin ``seek``: acumula lo escrito hasta que se recoge con ``pop``."""
+
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def _zip(user, chunk_size):
+    sink = _StreamSink()
+    archive = zipfile.ZipFile(sink, mode='w', compression=zipfile.ZIP_DEFLATED)
+    current, entry, writer = None, None, None
+    rows_in_chunk = 0
+    for entity, row in iter_library(user, chunk_size):
+        if entity != current:
+            if entry is not None:
+                entry.close()
+            current = entity
+            entry = io.TextIOWrapper(archive.open(f"{entity}.csv", mode='w', force_zip64=True),
+                                     encoding='utf-8', newline='')
+            writer = csv.writer(entry)
+            writer.writerow(COLUMNS[entity])
+        writer.writerow([row[column] for column in COLUMNS[entity]])
+        rows_in_chunk += 1
+        if rows_in_chunk >= chunk_size:
+            entry.flush()
+            rows_in_chunk = 0
+            data = sink.pop()
+            if data:
+                yield data
+    if entry is not None:
+        entry.close()
+    archive.close()
+    yield sink.pop()
+
+
+def export_stream(user, fmt='jsonl', chunk_size=CHUNK_SIZE):
+    """Iterador de bytes con la biblioteca completa, apto para ``StreamingHttpResponse``."""
+    if fmt not in FORMATS:
+        raise ValueError(f"Formato no soportado: {fmt}")
+    return _jsonl(user, chunk_size) if fmt == 'jsonl' else _zip(user, chunk_size)
+
+
+def export_filename(user, fmt):
+    stamp = timezone.now().strftime('%Y%m%d_%H%M%S')
+    return f"biblioteca_{user.username}_{stamp}.{fmt}"
@@ -0,0 +1,347 @@
+# applications/music/history_import.py
+"""
+Importación del historial extendido de reproducción de Spotify
+(``Streaming_History_Audio_*.json`` o el ZIP ``my_spotify_data.zip``) a
+``PlaybackHistory``.
+
+Los archivos son arreglos JSON de varios cientos de MB, así que se leen por
+bloques y cada objeto se decodifica con ``raw_decode`` sin cargar el arreglo
+completo. Las reproducciones se procesan en lotes de ``BATCH_SIZE``:
+
+- Los URIs de pista se resuelven a ``Songs`` con una consulta por lote
+  (y, opcionalmente, las que faltan se piden al catálogo de Spotify de 50 en 50).
+- Se descartan las reproducciones ya importadas, comparando con lo que hay en
+  la base de datos en el rango de fechas del lote y con lo visto en el archivo.
+- Las filas se insertan con ``COPY`` en PostgreSQL (``core.bulk.insert_rows``).
+"""
+
+import io
+import json
+import logging
+import os
+import re
+import tempfile
+import zipfile
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.dateparse import parse_datetime
+
+from applications.core import background
+from applications.core.bulk import insert_rows
+from applications.spotify_api.models import SpotifySyncLog
+
+from . import canonical, sync_lease
+from .models import Devices, PlaybackHistory
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 5000
+
+_READ_SIZE = 256 * 1024
+
+# Archivos de audio del paquete de datos de Spotify (los de video y podcasts se ignoran).
+_HISTORY_FILE_RE = re.compile(r'(^|/)(Streaming_History_Audio_[^/]*|endsong_\d+)\.json$', re.IGNORECASE)
+
+_TRACK_URI_PREFIX = 'spotify:track:'
+
+# fragmento del campo ``platform`` -> (device_type, operating_system)
+_PLATFORMS = [
+    ('android', ('smartphone', 'Android')),
+    ('ios', ('smartphone', 'iOS')),
+    ('iphone', ('smartphone', 'iOS')),
+    ('ipad', ('tablet', 'iOS')),
+    ('windows', ('desktop', 'Windows')),
+    ('os x', ('desktop', 'macOS')),
+    ('osx', ('desktop', 'macOS')),
+    ('linux', ('desktop', 'Linux')),
+    ('web_player', ('web', None)),
+    ('webplayer', ('web', None)),
+    ('cast', ('speaker', None)),
+    ('sonos', ('speaker', None)),
+    ('tv', ('tv', None)),
+]
+
+_COPY_COLUMNS = ['user_id', 'song_id', 'device_id', 'playback_date', 'completed', 'playback_duration', 'skipped']
+
+
+class HistoryImportError(Exception):
+    """El archivo no tiene el formato del historial extendido de Spotify."""
+
+
+def iter_json_array(stream, read_size=_READ_SIZE):
+    """
+    Objetos de un arreglo JSON leído de ``stream`` (texto), uno a uno y sin
+    cargar el arreglo completo en memoria.
+    """
+    decoder = json.JSONDecoder()
+    buffer = stream.read(read_size).lstrip()
+    if not buffer.startswith('['):
+        raise HistoryImportError("Se esperaba un arreglo JSON")
+    buffer = buffer[1:]
+    eof = False
+    while True:
+        buffer = buffer.lstrip().lstrip(',').lstrip()
+        if buffer.startswith(']'):
+            return
+        try:
+            item, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError as e:
+            # Un objeto cortado al final del bloque: se lee más y se vuelve a intentar.
+            if eof:
+                raise HistoryImportError(f"JSON inválido: {e}")
+            chunk = stream.read(read_size)
+            eof = not chunk
+            buffer += chunk
+            continue
+        yield item
+        buffer = buffer[end:]
+
+
+def iter_records(fileobj, name=''):
+    """
+    Reproducciones de un archivo del historial: un ``.json`` o el ZIP con todos
+    los ``Streaming_History_Audio_*.json``. ``fileobj`` debe abrirse en binario.
+    """
+    if name.lower().endswith('.zip') or zipfile.is_zipfile(fileobj):
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as archive:
+            members = sorted(n for n in archive.namelist() if _HISTORY_FILE_RE.search(n))
+            if not members:
+                raise HistoryImportError("El ZIP no contiene archivos Streaming_History_Audio_*.json")
+            for member in members:
+                with archive.open(member) as raw:
+                    yield from iter_json_array(io.TextIOWrapper(raw, encoding='utf-8'))
+        return
+    fileobj.seek(0)
+    yield from iter_json_array(io.TextIOWrapper(fileobj, encoding='utf-8'))
+
+
+def device_profile(platform):
+    """(device_type, operating_system) a partir del campo ``platform`` de Spotify."""
+    lowered = (platform or '').lower()
+    for fragment, profile in _PLATFORMS:
+        if fragment in lowered:
+            return profile
+    return ('other', None)
+
+
+class HistoryImporter:
+    """
+    Importa reproducciones para un usuario. ``progress(stats)`` se llama tras
+    cada lote; ``stats`` cuenta leídas, importadas, duplicadas, sin canción
+    en el catálogo y que no son pistas (podcasts, audiolibros).
+    """
+
+    def __init__(self, user, batch_size=BATCH_SIZE, fetch_missing=False, progress=None):
+        self.user = user
+        self.batch_size = batch_size
+        self.fetch_missing = fetch_missing
+        self.progress = progress
+        self.devices = {}
+        self.seen = set()
+        self.unknown_uris = set()
+        self.stats = {'read': 0, 'imported': 0, 'duplicates': 0, 'unresolved': 0, 'not_tracks': 0}
+
+    def run(self, records):
+        batch = []
+        for record in records:
+            self.stats['read'] += 1
+            play = self._parse(record)
+            if play is None:
+                continue
+            batch.append(play)
+            if len(batch) >= self.batch_size:
+                self._import_batch(batch)
+                batch = []
+        if batch:
+            self._import_batch(batch)
+        return self.stats
+
+    def _parse(self, record):
+        uri = record.get('spotify_track_uri') if isinstance(record, dict) else None
+        if not uri or not uri.startswith(_TRACK_URI_PREFIX):
+            self.stats['not_tracks'] += 1
+            return None
+        played_at = parse_datetime(record.get('ts') or '')
+        if played_at is None:
+            self.stats['not_tracks'] += 1
+            return None
+        reason_end = record.get('reason_end')
+        skipped = record.get('skipped')
+        return {
+            'spotify_id': uri[len(_TRACK_URI_PREFIX):],
+            'played_at': played_at,
+            'platform': (record.get('platform') or 'unknown').strip()[:100],
+            'ms_played': record.get('ms_played'),
+            'completed': reason_end == 'trackdone',
+            'skipped': bool(skipped) if skipped is not None else reason_end == 'fwdbtn',
+        }
+
+    def _import_batch(self, batch):
+        songs = self._resolve_songs({play['spotify_id'] for play in batch})
+        existing = self._existing_keys(batch, songs)
+
+        rows = []
+        for play in batch:
+            song_id = songs.get(play['spotify_id'])
+            if song_id is None:
+                self.stats['unresolved'] += 1
+                continue
+            key = (song_id, play['played_at'])
+            if key in existing or key in self.seen:
+                self.stats['duplicates'] += 1
+                continue
+            self.seen.add(key)
+            rows.append((
+                self.user.pk, song_id, self._device_id(play['platform']), play['played_at'],
+                play['completed'], play['ms_played'], play['skipped'],
+            ))
+
+        with transaction.atomic():
+            insert_rows(PlaybackHistory, _COPY_COLUMNS, rows)
+        self.stats['imported'] += len(rows)
+        if self.progress:
+            self.progress(dict(self.stats))
+
+    def _resolve_songs(self, spotify_ids):
+        """spotify_id -> song_id de las canciones del lote que existen en el catálogo."""
+        songs = canonical.song_ids(spotify_ids)
+        missing = spotify_ids - songs.keys() - self.unknown_uris
+        if missing and self.fetch_missing:
+            songs.update(self._fetch_from_spotify(sorted(missing)))
+        # Lo que sigue sin resolverse no se vuelve a buscar en los lotes siguientes.
+        self.unknown_uris.update(spotify_ids - songs.keys())
+        return songs
+
+    def _fetch_from_spotify(self, spotify_ids):
+        from .sync_service import SpotifySyncService
+
+        sync = SpotifySyncService(self.user)
+        sp = sync.spotify_service.sp
+        if not sp:
+            return {}
+        found = {}
+        for start in range(0, len(spotify_ids), 50):
+            try:
+                response = sp.tracks(spotify_ids[start:start + 50])
+            except Exception:
+                logger.exception("Error consultando el catálogo de Spotify")
+                break
+            for track_data in response.get('tracks') or []:
+                if not track_data:
+                    continue
+                song = sync.sync_song(track_data, aliases={})
+                if song:
+                    found[track_data['id']] = song.song_id
+        sync.update_canonical_mapping()
+        return found
+
+    def _existing_keys(self, batch, songs):
+        """(song_id, fecha) ya guardados para el usuario en el rango de fechas del lote."""
+        dates = [play['played_at'] for play in batch]
+        return set(
+            PlaybackHistory.objects.filter(
+                user=self.user,
+                song_id__in=set(songs.values()),
+                playback_date__range=(min(dates), max(dates)),
+            ).values_list('song_id', 'playback_date')
+        )
+
+    def _device_id(self, platform):
+        if platform not in self.devices:
+            device_type, operating_system = device_profile(platform)
+            device, _ = Devices.objects.get_or_create(
+                device_name=platform,
+                device_type=device_type,
+                defaults={'operating_system': operating_system},
+            )
+            self.devices[platform] = device.device_id
+        return self.devices[platform]
+
+
+def import_history(user, fileobj, name='', **kwargs):
+    """Importa un archivo (JSON o ZIP) del historial. Retorna las estadísticas de ``HistoryImporter``."""
+    importer = HistoryImporter(user, **kwargs)
+    return importer.run(iter_records(fileobj, name))
+
+
+SYNC_TYPE = 'history_import'
+
+# SpotifySyncLog.status -> estado que ve el cliente
+_STATUSES = {'running': 'running', 'completed': 'done', 'failed': 'failed'}
+
+
+def _stats_key(log_id):
+    return f"history_import:stats:{log_id}"
+
+
+def import_status(user_id):
+    """
+    Estado de la última importación subida por el usuario (o None si no hay).
+    El estado, el bloqueo y los conteos principales viven en su
+    ``SpotifySyncLog``, visibles desde cualquier worker; el desglose completo
+    de ``HistoryImporter.stats`` se guarda aparte en la caché.
+    """
+    log = SpotifySyncLog.objects.filter(user_id=user_id, sync_type=SYNC_TYPE).order_by('-started_at').first()
+    if log is None:
+        return None
+    status = {
+        'status': _STATUSES.get(log.status, log.status),
+        'stats': cache.get(_stats_key(log.pk)) or {'read': log.items_processed or 0, 'imported': log.items_total or 0},
+    }
+    if log.status == 'running' and not sync_lease.current_sync(user_id, SYNC_TYPE):
+        status.update(status='failed', error='La importación se interrumpió')
+    elif log.error_message:
+        status['error'] = log.error_message
+    return status
+
+
+def _progress(log, stats):
+    # items_processed: reproducciones leídas; items_total: importadas.
+    sync_lease.progress(log, stats['read'], stats['imported'])
+    cache.set(_stats_key(log.pk), dict(stats), settings.HISTORY_IMPORT_TIMEOUT)
+
+
+def _import_in_background(user_id, log, path, name, fetch_missing):
+    error = None
+    try:
+        user = get_user_model().objects.get(pk=user_id)
+        with open(path, 'rb') as f:
+            stats = import_history(user, f, name, fetch_missing=fetch_missing, progress=lambda s: _progress(log, s))
+        _progress(log, stats)
+    except HistoryImportError as e:
+        error = str(e)
+    except Exception:
+        logger.exception("Error importando el historial del usuario %s", user_id)
+        error = 'Error interno durante la importación'
+    finally:
+        os.unlink(path)
+        sync_lease.release(log, error=error)
+
+
+def start_import(user, uploaded_file, fetch_missing=False):
+    """
+    Copia el archivo subido a disco y encola su importación. Retorna False si
+    el usuario ya tiene una importación en curso (en cualquier worker).
+    """
+    try:
+        log = sync_lease.acquire(user, SYNC_TYPE)
+    except sync_lease.SyncInProgress:
+        return False
+    path = None
+    try:
+        suffix = '.zip' if uploaded_file.name.lower().endswith('.zip') else '.json'
+        with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+            path = f.name
+            for chunk in uploaded_file.chunks():
+                f.write(chunk)
+        background.submit(_import_in_background, user.pk, log, path, uploaded_file.name, fetch_missing)
+    except Exception as e:
+        if path:
+            os.unlink(path)
+        sync_lease.release(log, error=str(e))
+        raise
+    return True
@@ -0,0 +1,294 @@
+# applications/music/library_index.py
+"""
+Índice en memoria de la biblioteca de cada usuario (todas las canciones de
+todas sus playlists) para filtrar, ordenar y paginar sin consultar la base de
+datos en cada tecla.
+
+El índice es columnar: un arreglo de NumPy por atributo (una posición por
+canción) y una tabla de cadenas internadas a la que apuntan título, artista,
+álbum, ids de Spotify y portadas. Se construye con una sola consulta tras la
+sincronización, se guarda comprimido en la caché bajo la versión de la
+biblioteca (``core.library_cache``) y cada worker conserva los últimos índices
+ya deserializados. Una consulta es una combinación de máscaras booleanas
+aplicada sobre el orden (precalculado por campo) y un recorte de la página.
+"""
+
+import io
+import threading
+import zlib
+from collections import OrderedDict
+
+import numpy as np
+from django.conf import settings
+from django.core.cache import cache
+
+from applications.core.library_cache import get_library_version
+
+from .canonical import canonical_id
+from .models import PlaylistSong
+from .normalization import normalize_name
+
+PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+
+# columna -> tipo; las de texto son índices en la tabla de cadenas
+_COLUMNS = {
+    'song_id': np.int32,
+    'title': np.int32,
+    'artist': np.int32,
+    'album': np.int32,
+    'spotify_id': np.int32,
+    'album_spotify_id': np.int32,
+    'image': np.int32,
+    'year': np.int16,
+    'duration': np.int32,
+    'popularity': np.int16,
+    'explicit': np.bool_,
+    'added_at': np.int64,
+}
+
+_TEXT_COLUMNS = ('title', 'artist', 'album', 'spotify_id', 'album_spotify_id', 'image')
+_SEARCH_COLUMNS = ('title', 'artist', 'album')
+
+SORT_FIELDS = ('title', 'artist', 'album', 'year', 'duration', 'popularity', 'added_at')
+
+_VALUES = (
+    'canonical_song_id', 'song__title', 'song__album__artist__name', 'song__album__title', 'song__spotify_id',
+    'song__album__spotify_id', 'song__album__cover_image_url', 'song__album__release_year', 'song__duration',
+    'song__popularity', 'song__explicit_content', 'date_added', 'playlist__spotify_id', 'playlist_id',
+)
+
+
+class LibraryIndex:
+    """
+    Columnas de la biblioteca de un usuario. ``strings`` es la tabla de
+    cadenas, ``normalized`` su forma comparable (para buscar) y ``rank`` la
+    posición de cada cadena en orden alfabético, para ordenar columnas de
+    texto como enteros. ``member_rows``/``member_playlists`` dicen en qué
+    playlists (índices en ``playlists``) está cada canción.
+    """
+
+    def __init__(self, columns, strings, normalized, rank, playlists, member_rows, member_playlists):
+        self.columns = columns
+        self.strings = strings
+        self.normalized = normalized
+        self.rank = rank
+        self.playlists = {playlist: i for i, playlist in enumerate(playlists)}
+        self.member_rows = member_rows
+        self.member_playlists = member_playlists
+        # Derivados perezosos, propios de cada worker (no se serializan).
+        self._searchable = None
+        self._orders = {}
+
+    @classmethod
+    def create(cls, columns, strings, playlists, member_rows, member_playlists):
+        normalized = [normalize_name(value) for value in strings]
+        rank = np.empty(len(strings), dtype=np.int32)
+        rank[np.argsort(np.array(normalized, dtype=object), kind='stable')] = np.arange(len(strings))
+        return cls(columns, strings, normalized, rank, playlists, member_rows, member_playlists)
+
+    def __len__(self):
+        return len(self.columns['song_id'])
+
+    def _matching(self, text):
+        """Tabla booleana por cadena: True si contiene ``text`` (normalizado)."""
+        if self._searchable is None:
+            # Solo se busca en títulos, artistas y álbumes, no en ids ni URLs.
+            positions = np.unique(np.concatenate([self.columns[name] for name in _SEARCH_COLUMNS]))
+            self._searchable = positions, np.array([self.normalized[i] for i in positions], dtype=str)
+        positions, values = self._searchable
+        hits = np.zeros(len(self.strings), dtype=bool)
+        hits[positions[np.char.find(values, normalize_name(text)) >= 0]] = True
+        return hits
+
+    def _order(self, sort):
+        """Filas ordenadas por ``sort`` de forma ascendente; se calcula una vez por índice."""
+        order = self._orders.get(sort)
+        if order is None:
+            keys = self.columns[sort]
+            if sort in _TEXT_COLUMNS:
+                keys = self.rank[keys]
+            order = self._orders[sort] = np.argsort(keys, kind='stable').astype(np.int32)
+        return order
+
+    def query(self, q='', artist='', album='', playlist=None, year_min=None, year_max=None,
+              duration_min=None, duration_max=None, popularity_min=None, explicit=None,
+              sort='added_at', descending=False, page=1, page_size=PAGE_SIZE):
+        """
+        Filtra, ordena y pagina. Las duraciones van en segundos; ``q`` busca en
+        título, artista y álbum. Retorna ``(total, filas de la página)``.
+        """
+        c = self.columns
+        mask = np.ones(len(self), dtype=bool)
+        if q:
+            hits = self._matching(q)
+            mask &= hits[c['title']] | hits[c['artist']] | hits[c['album']]
+        if artist:
+            mask &= self._matching(artist)[c['artist']]
+        if album:
+            mask &= self._matching(album)[c['album']]
+        if playlist:
+            in_playlist = np.zeros(len(self), dtype=bool)
+            position = self.playlists.get(playlist, -1)
+            in_playlist[self.member_rows[self.member_playlists == position]] = True
+            mask &= in_playlist
+        if year_min is not None:
+            mask &= c['year'] >= year_min
+        if year_max is not None:
+            mask &= (c['year'] <= year_max) & (c['year'] > 0)
+        if duration_min is not None:
+            mask &= c['duration'] >= duration_min * 1000
+        if duration_max is not None:
+            mask &= c['duration'] <= duration_max * 1000
+        if popularity_min is not None:
+            mask &= c['popularity'] >= popularity_min
+        if explicit is not None:
+            mask &= c['explicit'] == explicit
+
+        order = self._order(sort)
+        if descending:
+            order = order[::-1]
+        rows = order[mask[order]]
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+        start = (max(page, 1) - 1) * page_size
+        return len(rows), [self._row(i) for i in rows[start:start + page_size]]
+
+    def _row(self, i):
+        c = self.columns
+        row = {name: self.strings[c[name][i]] or None for name in _TEXT_COLUMNS}
+        year = int(c['year'][i])
+        popularity = int(c['popularity'][i])
+        row.update(
+            song_id=int(c['song_id'][i]),
+            year=year or None,
+            duration=int(c['duration'][i]),
+            popularity=popularity if popularity >= 0 else None,
+            explicit=bool(c['explicit'][i]),
+            added_at=int(c['added_at'][i]) or None,
+        )
+        return row
+
+    def to_bytes(self):
+        """Forma serializada compacta: arreglos de NumPy sin pickle y las tablas de cadenas, con zlib."""
+        buffer = io.BytesIO()
+        np.savez(
+            buffer,
+            strings=_pack(self.strings),
+            normalized=_pack(self.normalized),
+            playlists=_pack(self.playlists),
+            rank=self.rank,
+            member_rows=self.member_rows,
+            member_playlists=self.member_playlists,
+            **self.columns,
+        )
+        return zlib.compress(buffer.getvalue(), 1)
+
+    @classmethod
+    def from_bytes(cls, data):
+        with np.load(io.BytesIO(zlib.decompress(data)), allow_pickle=False) as arrays:
+            return cls(
+                {name: arrays[name] for name in _COLUMNS},
+                _unpack(arrays['strings']),
+                _unpack(arrays['normalized']),
+                arrays['rank'],
+                _unpack(arrays['playlists']),
+                arrays['member_rows'],
+                arrays['member_playlists'],
+            )
+
+
+def _pack(strings):
+    return np.frombuffer('\0'.join(strings).encode('utf-8'), dtype=np.uint8)
+
+
+def _unpack(array):
+    return array.tobytes().decode('utf-8').split('\0')
+
+
+def build_index(user):
+    """Construye el índice con una consulta sobre las canciones de las playlists del usuario."""
+    strings = {'': 0}
+
+    def intern(value):
+        return strings.setdefault(value or '', len(strings))
+
+    rows = {}
+    playlists = {}
+    member_rows, member_playlists = [], []
+    entries = (
+        PlaylistSong.objects.filter(playlist__user=user)
+        .annotate(canonical_song_id=canonical_id('song'))
+        .values_list(*_VALUES)
+        .iterator(chunk_size=5000)
+    )
+    values = {name: [] for name in _COLUMNS}
+    for (song_id, title, artist, album, spotify_id, album_spotify_id, image, year, duration,
+         popularity, explicit, date_added, playlist_spotify_id, playlist_id) in entries:
+        # Las ediciones de una misma grabación (mismo ISRC) son una sola canción de la biblioteca.
+        row = rows.get(song_id)
+        added = int(date_added.timestamp()) if date_added else 0
+        if row is None:
+            row = rows[song_id] = len(rows)
+            for name, value in (
+                ('song_id', song_id), ('title', intern(title)), ('artist', intern(artist)),
+                ('album', intern(album)), ('spotify_id', intern(spotify_id)),
+                ('album_spotify_id', intern(album_spotify_id)), ('image', intern(image)),
+                ('year', year or 0), ('duration', duration or 0),
+                ('popularity', popularity if popularity is not None else -1),
+                ('explicit', bool(explicit)), ('added_at', added),
+            ):
+                values[name].append(value)
+        elif added and (not values['added_at'][row] or added < values['added_at'][row]):
+            # La fecha de la biblioteca es la primera vez que se añadió a alguna playlist.
+            values['added_at'][row] = added
+        member_rows.append(row)
+        member_playlists.append(playlists.setdefault(playlist_spotify_id or str(playlist_id), len(playlists)))
+
+    columns = {name: np.array(values[name], dtype=dtype) for name, dtype in _COLUMNS.items()}
+    return LibraryIndex.create(
+        columns, list(strings), list(playlists),
+        np.array(member_rows, dtype=np.int32), np.array(member_playlists, dtype=np.int32),
+    )
+
+
+def _cache_key(user_id, version):
+    return f"library_index:{user_id}:{version}"
+
+
+# Índices ya deserializados en este worker: (user_id, versión) -> LibraryIndex
+_local = OrderedDict()
+_local_lock = threading.Lock()
+
+
+def _remember(key, index):
+    with _local_lock:
+        _local[key] = index
+        _local.move_to_end(key)
+        while len(_local) > settings.LIBRARY_INDEX_LOCAL_ENTRIES:
+            _local.popitem(last=False)
+
+
+def rebuild_index(user):
+    """Construye el índice de la versión actual de la biblioteca y lo guarda en la caché."""
+    version = get_library_version(user.pk)
+    index = build_index(user)
+    cache.set(_cache_key(user.pk, version), index.to_bytes(), settings.LIBRARY_INDEX_TIMEOUT)
+    _remember((user.pk, version), index)
+    return index
+
+
+def get_index(user):
+    """Índice de la versión actual de la biblioteca: del worker, de la caché o recién construido."""
+    version = get_library_version(user.pk)
+    key = (user.pk, version)
+    with _local_lock:
+        index = _local.get(key)
+        if index is not None:
+            _local.move_to_end(key)
+            return index
+    data = cache.get(_cache_key(user.pk, version))
+    if data is None:
+        return rebuild_index(user)
+    index = LibraryIndex.from_bytes(data)
+    _remember(key, index)
+    return index
@@ -0,0 +1,222 @@
+import json
+import logging
+import platform
+import time
+import tracemalloc
+from datetime import timedelta
+
+import django
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from applications.core import metrics
+from applications.music.models import Albums, Artists, Playlist, PlaylistSong, Songs
+from applications.music.sync_service import SpotifySyncService
+from applications.spotify_api.models import SpotifyUserToken
+from applications.spotify_api.stub import SpotifyStub, generate_library
+
+# Métricas donde un valor mayor es peor; son las que se comparan contra el baseline.
+COMPARED_METRICS = ('wall_s', 'queries_per_track', 'upstream_requests', 'peak_memory_mb')
+
+
+class QueryCounter:
+    """``connection.execute_wrapper`` que solo cuenta consultas."""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        'Mide SpotifySyncService.full_sync contra una API de Spotify local con playlists '
+        'generadas: tiempo, consultas por canción, memoria pico y peticiones a la API. '
+        'Usa una base de datos de prueba y no necesita red.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 1000, 10000],
+                            help='Tamaños de playlist a medir.')
+        parser.add_argument('--seed', type=int, default=42, help='Semilla del catálogo generado.')
+        parser.add_argument('--latency', type=float, default=0.0,
+                            help='Latencia simulada por petición a la API, en milisegundos.')
+        parser.add_argument('--output', help='Guarda los resultados como baseline JSON en esta ruta.')
+        parser.add_argument('--compare', help='Baseline JSON contra el que comparar los resultados.')
+        parser.add_argument('--threshold', type=float, default=10.0,
+                            help='Porcentaje de empeoramiento a partir del cual se reporta una regresión.')
+        parser.add_argument('--fail-on-regression', action='store_true',
+                            help='Termina con error si alguna métrica supera el umbral.')
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['compare']:
+            try:
+                with open(options['compare'], encoding='utf-8') as f:
+                    baseline = json.load(f)
+            except (OSError, ValueError) as e:
+                raise CommandError(f"No se pudo leer el baseline {options['compare']}: {e}")
+
+        if options['verbosity'] < 2:
+            # Los INFO de cada sincronización ensucian la salida; los errores se siguen mostrando.
+            logging.getLogger('applications').setLevel(logging.WARNING)
+
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            self._create_unmanaged_tables()
+            results = {}
+            for size in options['sizes']:
+                self.stdout.write(f"Playlist de {size} canciones...")
+                results[str(size)] = self._bench_size(size, options)
+                self._print_result(size, results[str(size)])
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            # Lo registrado durante el benchmark no debe mezclarse con las métricas del servicio.
+            metrics.registry.reset()
+
+        report = {
+            'meta': {
+                'created_at': timezone.now().isoformat(),
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'database': connection.vendor,
+                'seed': options['seed'],
+                'latency_ms': options['latency'],
+            },
+            'results': results,
+        }
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Baseline guardado en {options['output']}"))
+
+        if baseline is not None:
+            regressions = self._compare(baseline, report, options['threshold'])
+            if regressions and options['fail_on_regression']:
+                raise CommandError(f"{regressions} métrica(s) empeoraron más de {options['threshold']}%")
+
+    def _create_unmanaged_tables(self):
+        """Los modelos con ``managed = False`` no los crea ``migrate``; aquí sí hacen falta."""
+        existing = set(connection.introspection.table_names())
+        with connection.schema_editor() as editor:
+            for model in apps.get_models():
+                if model._meta.db_table not in existing and not model._meta.proxy:
+                    editor.create_model(model)
+                    existing.add(model._meta.db_table)
+
+    def _reset_library(self):
+        PlaylistSong.objects.all().delete()
+        Playlist.objects.all().delete()
+        Songs.objects.all().delete()
+        Albums.objects.all().delete()
+        Artists.objects.all().delete()
+
+    def _bench_size(self, size, options):
+        library = generate_library([size], seed=options['seed'])
+        user = get_user_model().objects.create_user(username=f"bench_{size}", password='bench')
+        SpotifyUserToken.objects.create(
+            user=user,
+            access_token='bench-token',
+            refresh_token='bench-refresh',
+            expires_at=timezone.now() + timedelta(days=1),
+            scope='playlist-read-private',
+        )
+
+        with SpotifyStub(library, latency=options['latency'] / 1000) as stub, \
+                override_settings(SPOTIFY_API_PREFIX=stub.api_prefix):
+            self._reset_library()
+            cold = self._run_sync(user, stub)
+            warm = self._run_sync(user, stub)
+
+            # La memoria se mide en una pasada aparte: tracemalloc distorsiona el tiempo.
+            self._reset_library()
+            tracemalloc.start()
+            try:
+                self._run_sync(user, stub)
+                _, peak = tracemalloc.get_traced_memory()
+            finally:
+                tracemalloc.stop()
+
+        return {
+            'tracks': size,
+            'tracks_synced': PlaylistSong.objects.filter(playlist__user=user).count(),
+            'artists': Artists.objects.count(),
+            'albums': Albums.objects.count(),
+            'peak_memory_mb': round(peak / 1024 / 1024, 2),
+            'cold': cold,
+            'warm': warm,
+        }
+
+    def _run_sync(self, user, stub):
+        stub.reset_counts()
+        counter = QueryCounter()
+        service = SpotifySyncService(user)
+        if service.spotify_service.sp is None:
+            raise CommandError('No se pudo inicializar el cliente de Spotify para el benchmark.')
+
+        start = time.perf_counter()
+        with connection.execute_wrapper(counter):
+            service.full_sync()
+        elapsed = time.perf_counter() - start
+
+        tracks = max(service.tracks_synced, 1)
+        return {
+            'wall_s': round(elapsed, 3),
+            'queries': counter.count,
+            'queries_per_track': round(counter.count / tracks, 2),
+            'tracks_per_s': round(service.tracks_synced / elapsed, 1) if elapsed else None,
+            'upstream_requests': stub.request_count,
+        }
+
+    def _print_result(self, size, result):
+        for phase in ('cold', 'warm'):
+            data = result[phase]
+            self.stdout.write(
+                f"  {phase:<4}  {data['wall_s']:>8.3f}s  {data['queries']:>7} queries "
+                f"({data['queries_per_track']}/canción)  {data['upstream_requests']:>4} peticiones API  "
+                f"{data['tracks_per_s']} canciones/s"
+            )
+        self.stdout.write(
+            f"  {result['tracks_synced']}/{size} canciones, {result['artists']} artistas, "
+            f"{result['albums']} álbumes, memoria pico {result['peak_memory_mb']} MB"
+        )
+
+    def _flatten(self, result):
+        values = {'peak_memory_mb': result.get('peak_memory_mb')}
+        for phase in ('cold', 'warm'):
+            for name in COMPARED_METRICS:
+                if name in result.get(phase, {}):
+                    values[f"{phase}.{name}"] = result[phase][name]
+        return values
+
+    def _compare(self, baseline, report, threshold):
+        """Imprime la variación de cada métrica respecto al baseline y retorna cuántas empeoraron."""
+        self.stdout.write(f"\nComparación con el baseline del {baseline.get('meta', {}).get('created_at', '?')}:")
+        regressions = 0
+        for size, result in report['results'].items():
+            previous = baseline.get('results', {}).get(size)
+            if previous is None:
+                self.stdout.write(f"  {size}: sin datos en el baseline")
+                continue
+            old_values = self._flatten(previous)
+            for name, value in self._flatten(result).items():
+                old = old_values.get(name)
+                if not old or value is None:
+                    continue
+                change = (value - old) / old * 100
+                line = f"  {size:>6} {name:<24} {old:>10} -> {value:<10} {change:+.1f}%"
+                if change > threshold:
+                    regressions += 1
+                    self.stdout.write(self.style.ERROR(line))
+                elif change < -threshold:
+                    self.stdout.write(self.style.SUCCESS(line))
+                else:
+                    self.stdout.write(line)
+        return regressions
@@ -0,0 +1,89 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from applications.music import similarity
+
+
+class Command(BaseCommand):
+    help = (
+        'Reconstruye la tabla de canciones similares (song_neighbours) a partir de la co-ocurrencia '
+        'en playlists. Con --benchmark mide el cálculo sobre datos sintéticos sin tocar la base de datos.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--k', type=int, default=similarity.NEIGHBOURS, help='Vecinos guardados por canción.')
+        parser.add_argument('--chunk-size', type=int, default=similarity.CHUNK_SIZE,
+                            help='Canciones por bloque del producto de matrices.')
+        parser.add_argument('--max-playlist-size', type=int, default=similarity.MAX_PLAYLIST_SIZE,
+                            help='Se ignoran las playlists con más canciones que esto.')
+        parser.add_argument('--min-cooccurrence', type=int, default=similarity.MIN_COOCCURRENCE,
+                            help='Playlists en común mínimas entre dos canciones vecinas.')
+        parser.add_argument('--benchmark', type=int, metavar='ENTRADAS', default=None,
+                            help='Genera ENTRADAS filas sintéticas de playlist_songs y mide el cálculo.')
+        parser.add_argument('--songs', type=int, default=None,
+                            help='Canciones distintas del benchmark (por defecto ENTRADAS / 20).')
+        parser.add_argument('--seed', type=int, default=42)
+
+    def handle(self, *args, **options):
+        try:
+            import numpy  # noqa: F401
+            import scipy  # noqa: F401
+        except ImportError:
+            raise CommandError("Este comando necesita numpy y scipy (pip install numpy scipy).")
+
+        params = {
+            'k': options['k'],
+            'chunk_size': options['chunk_size'],
+            'min_cooccurrence': options['min_cooccurrence'],
+        }
+        if options['benchmark']:
+            self._benchmark(options, params)
+            return
+
+        stats = similarity.rebuild_neighbours(max_playlist_size=options['max_playlist_size'], **params)
+        self._report(stats)
+        self.stdout.write(self.style.SUCCESS(
+            f"{stats['neighbours']} vecinos guardados para {stats['songs']} canciones."
+        ))
+
+    def _benchmark(self, options, params):
+        import numpy as np
+
+        entries = options['benchmark']
+        n_songs = options['songs'] or max(entries // 20, 100)
+        playlist_ids, song_ids = self._synthetic_entries(entries, n_songs, np.random.default_rng(options['seed']))
+        stats = {'entries': entries}
+
+        started = time.perf_counter()
+        matrix, song_keys = similarity.build_matrix(playlist_ids, song_ids, options['max_playlist_size'])
+        stats['songs'], stats['playlists'] = matrix.shape
+        stats['matrix_seconds'] = time.perf_counter() - started
+
+        started = time.perf_counter()
+        stats['neighbours'] = sum(len(chunk[0]) for chunk in similarity.iter_neighbours(matrix, song_keys, **params))
+        stats['compute_seconds'] = time.perf_counter() - started
+        self._report(stats)
+
+    def _synthetic_entries(self, entries, n_songs, rng):
+        """
+        Playlists con tamaños de distribución geométrica (media ~30) y canciones
+        elegidas con popularidad de tipo Zipf, como en una biblioteca real.
+        """
+        import numpy as np
+
+        sizes = rng.geometric(1 / 30, size=entries // 10 + 1)
+        sizes = sizes[np.cumsum(sizes) <= entries]
+        playlist_ids = np.repeat(np.arange(len(sizes)), sizes)
+        weights = 1.0 / np.arange(1, n_songs + 1) ** 0.8
+        song_ids = rng.choice(n_songs, size=len(playlist_ids), p=weights / weights.sum())
+        return playlist_ids, song_ids
+
+    def _report(self, stats):
+        self.stdout.write(
+            f"{stats['entries']} entradas, {stats['songs']} canciones, {stats['playlists']} playlists, "
+            f"{stats['neighbours']} vecinos"
+        )
+        for phase in ('load', 'matrix', 'compute', 'write'):
+            if f'{phase}_seconds' in stats:
+                self.stdout.write(f"  {phase:<8} {stats[f'{phase}_seconds']:8.2f}s")
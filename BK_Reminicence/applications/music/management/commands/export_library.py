@@ -0,0 +1,38 @@
+import sys
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from applications.music import export
+
+
+class Command(BaseCommand):
+    help = 'Exporta en streaming la biblioteca sincronizada de un usuario como JSONL o ZIP de CSVs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Usuario cuya biblioteca se exporta.')
+        parser.add_argument('--format', choices=sorted(export.FORMATS), default='jsonl')
+        parser.add_argument('--output', '-o', default='-', help="Archivo de salida ('-' para stdout).")
+        parser.add_argument('--chunk-size', type=int, default=export.CHUNK_SIZE,
+                            help='Filas por consulta.')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['username'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No existe el usuario '{options['username']}'")
+
+        stream = export.export_stream(user, options['format'], chunk_size=options['chunk_size'])
+        if options['output'] == '-':
+            out = sys.stdout.buffer
+            for block in stream:
+                out.write(block)
+            out.flush()
+            return
+
+        written = 0
+        with open(options['output'], 'wb') as f:
+            for block in stream:
+                f.write(block)
+                written += len(block)
+        self.stderr.write(self.style.SUCCESS(f"Exportados {written} bytes a {options['output']}"))
@@ -0,0 +1,204 @@
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from applications.music.models import Artists
+from applications.music.normalization import normalize_name
+from applications.spotify_api.services import (
+    SpotifyRateLimitError, build_artist, get_spotify_token, search_spotify_artist,
+)
+
+
+# Resultado de _search cuando no hubo respuesta válida (reintentos agotados u
+# otro error): a diferencia de "sin resultados", el nombre no va al checkpoint.
+FAILED = object()
+
+
+class RateLimiter:
+    """Token bucket compartido entre hilos: como máximo ``rate`` peticiones por segundo."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate
+        self.lock = threading.Lock()
+        self.next_slot = time.monotonic()
+
+    def wait(self):
+        with self.lock:
+            now = time.monotonic()
+            slot = max(self.next_slot, now)
+            self.next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+    def pause(self, seconds):
+        """Retrasa a todos los hilos (por ejemplo tras un 429 con Retry-After)."""
+        with self.lock:
+            self.next_slot = max(self.next_slot, time.monotonic() + seconds)
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa artistas de Spotify en bloque a partir de un archivo (un nombre por línea) '
+        'o de stdin, con búsquedas concurrentes y reanudación mediante checkpoint.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', nargs='?', default='-', help="Archivo con nombres de artistas, o '-' para stdin.")
+        parser.add_argument('--workers', type=int, default=8, help='Búsquedas concurrentes contra Spotify.')
+        parser.add_argument('--rate', type=float, default=20.0, help='Máximo de peticiones por segundo.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Nombres procesados por lote (bulk insert + checkpoint).')
+        parser.add_argument('--checkpoint', type=str, default=None,
+                            help='Archivo de progreso; si existe, se omiten los nombres ya procesados.')
+        parser.add_argument('--max-retries', type=int, default=5, help='Reintentos por nombre ante 429 o errores de red.')
+
+    def handle(self, *args, **options):
+        names = self._read_names(options['source'])
+        checkpoint = Path(options['checkpoint']) if options['checkpoint'] else None
+        done = self._load_checkpoint(checkpoint)
+
+        pending = [name for name in names if normalize_name(name) not in done]
+        self.stdout.write(f"{len(names)} nombres únicos, {len(names) - len(pending)} ya procesados según el checkpoint.")
+
+        existing = self._existing_names(pending)
+        if existing:
+            self._write_checkpoint(checkpoint, existing)
+        pending = [name for name in pending if normalize_name(name) not in existing]
+        self.stdout.write(f"{len(existing)} ya existen en la base de datos; {len(pending)} por buscar en Spotify.")
+
+        if not pending:
+            return
+
+        try:
+            self.token = get_spotify_token()
+        except Exception as e:
+            raise CommandError(f"No se pudo obtener el token de Spotify: {e}")
+        self.token_lock = threading.Lock()
+        self.limiter = RateLimiter(options['rate'])
+        self.max_retries = options['max_retries']
+        self.local = threading.local()
+
+        created_total = not_found_total = failed_total = 0
+        started = time.monotonic()
+        batch_size = options['batch_size']
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as executor:
+            for start in range(0, len(pending), batch_size):
+                batch = pending[start:start + batch_size]
+                results = list(executor.map(self._search, batch))
+
+                artists = {}
+                for artist_data in results:
+                    if artist_data is not FAILED and artist_data and artist_data.get('id'):
+                        artists.setdefault(artist_data['id'], build_artist(artist_data))
+                not_found_total += sum(1 for artist_data in results if artist_data is None)
+                failed_total += sum(1 for artist_data in results if artist_data is FAILED)
+
+                known = set(Artists.objects.filter(spotify_id__in=artists.keys()).values_list('spotify_id', flat=True))
+                new_artists = [artist for spotify_id, artist in artists.items() if spotify_id not in known]
+                Artists.objects.bulk_create(new_artists, batch_size=batch_size, ignore_conflicts=True)
+                # ignore_conflicts descarta en silencio las filas que otro proceso insertó entretanto.
+                created_total += Artists.objects.filter(spotify_id__in=artists.keys()).count() - len(known)
+                # Los que fallaron no se marcan: se reintentan al reanudar con el mismo checkpoint.
+                self._write_checkpoint(checkpoint, [
+                    normalize_name(name) for name, artist_data in zip(batch, results) if artist_data is not FAILED
+                ])
+
+                processed = start + len(batch)
+                rate = processed / max(time.monotonic() - started, 1e-6)
+                self.stdout.write(
+                    f"  {processed}/{len(pending)} procesados ({rate:.1f} nombres/s), "
+                    f"{created_total} insertados, {not_found_total} sin resultados, {failed_total} fallidos"
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Importación completada: {created_total} artistas insertados, {not_found_total} sin resultados, "
+            f"{failed_total} fallidos."
+        ))
+        if failed_total and checkpoint:
+            self.stdout.write(f"Vuelve a ejecutar con --checkpoint {checkpoint} para reintentar los fallidos.")
+
+    def _read_names(self, source):
+        """Lee los nombres y elimina duplicados por nombre normalizado, conservando el orden."""
+        if source == '-':
+            return self._unique_names(sys.stdin)
+        try:
+            with open(source, encoding='utf-8') as lines:
+                return self._unique_names(lines)
+        except OSError as e:
+            raise CommandError(f"No se pudo abrir '{source}': {e}")
+
+    def _unique_names(self, lines):
+        seen = set()
+        names = []
+        for line in lines:
+            name = line.strip()
+            if not name or name.startswith('#') or normalize_name(name) in seen:
+                continue
+            seen.add(normalize_name(name))
+            names.append(name)
+        return names
+
+    def _load_checkpoint(self, checkpoint):
+        if not checkpoint or not checkpoint.exists():
+            return set()
+        with checkpoint.open(encoding='utf-8') as f:
+            return {line.rstrip('\n') for line in f if line.strip()}
+
+    def _write_checkpoint(self, checkpoint, keys):
+        if not checkpoint:
+            return
+        with checkpoint.open('a', encoding='utf-8') as f:
+            f.writelines(f"{key}\n" for key in keys)
+
+    def _existing_names(self, names, chunk_size=1000):
+        """Nombres normalizados que ya existen en ``artists``, con una consulta indexada por bloque."""
+        existing = set()
+        normalized = [normalize_name(name) for name in names]
+        for start in range(0, len(normalized), chunk_size):
+            chunk = normalized[start:start + chunk_size]
+            existing.update(
+                Artists.objects.filter(normalized_name__in=chunk).values_list('normalized_name', flat=True)
+            )
+        return existing
+
+    def _session(self):
+        if not hasattr(self.local, 'session'):
+            self.local.session = requests.Session()
+        return self.local.session
+
+    def _refresh_token(self, stale_token):
+        with self.token_lock:
+            if self.token == stale_token:
+                self.token = get_spotify_token()
+
+    def _search(self, name):
+        """
+        Busca un nombre respetando el límite de peticiones; reintenta ante 429 y
+        errores de red. Retorna el artista, None si Spotify no encontró nada o
+        ``FAILED`` si no hubo una respuesta válida.
+        """
+        for attempt in range(self.max_retries + 1):
+            self.limiter.wait()
+            token = self.token
+            try:
+                return search_spotify_artist(name, token, session=self._session())
+            except SpotifyRateLimitError as e:
+                self.limiter.pause(e.retry_after)
+            except requests.HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                if status == 401:
+                    self._refresh_token(token)
+                elif status and status < 500:
+                    self.stderr.write(self.style.WARNING(f"Spotify respondió {status} para '{name}'."))
+                    return FAILED
+                else:
+                    time.sleep(min(2 ** attempt, 30))
+            except requests.RequestException:
+                time.sleep(min(2 ** attempt, 30))
+        self.stderr.write(self.style.WARNING(f"Se agotaron los reintentos para '{name}'."))
+        return FAILED
@@ -0,0 +1,58 @@
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from applications.music import history_import
+
+
+class Command(BaseCommand):
+    help = (
+        'Importa el historial extendido de reproducción de Spotify (Streaming_History_Audio_*.json '
+        'o el ZIP del paquete de datos) a PlaybackHistory.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Usuario al que pertenece el historial.')
+        parser.add_argument('files', nargs='+', help='Archivos .json o .zip del historial.')
+        parser.add_argument('--batch-size', type=int, default=history_import.BATCH_SIZE,
+                            help='Reproducciones por lote (una consulta de canciones y un COPY por lote).')
+        parser.add_argument('--fetch-missing', action='store_true',
+                            help='Busca en el catálogo de Spotify las canciones que no están en la base de datos.')
+
+    def handle(self, *args, **options):
+        try:
+            user = get_user_model().objects.get(username=options['username'])
+        except get_user_model().DoesNotExist:
+            raise CommandError(f"No existe el usuario '{options['username']}'")
+
+        self.started = time.monotonic()
+        importer = history_import.HistoryImporter(
+            user,
+            batch_size=options['batch_size'],
+            fetch_missing=options['fetch_missing'],
+            progress=self._report,
+        )
+        for path in options['files']:
+            self.stdout.write(f"Importando {path}...")
+            try:
+                with open(path, 'rb') as f:
+                    importer.run(history_import.iter_records(f, path))
+            except OSError as e:
+                raise CommandError(f"No se pudo abrir '{path}': {e}")
+            except history_import.HistoryImportError as e:
+                raise CommandError(f"'{path}': {e}")
+
+        stats = importer.stats
+        self.stdout.write(self.style.SUCCESS(
+            f"Importación completada en {time.monotonic() - self.started:.1f}s: {stats['imported']} reproducciones "
+            f"importadas, {stats['duplicates']} duplicadas, {stats['unresolved']} sin canción en el catálogo, "
+            f"{stats['not_tracks']} omitidas (no son pistas)."
+        ))
+
+    def _report(self, stats):
+        rate = stats['read'] / max(time.monotonic() - self.started, 1e-6)
+        self.stdout.write(
+            f"  {stats['read']} leídas ({rate:.0f}/s), {stats['imported']} importadas, "
+            f"{stats['duplicates']} duplicadas, {stats['unresolved']} sin canción"
+        )
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from applications.music import canonical
+
+
+class Command(BaseCommand):
+    help = (
+        'Fusiona las canciones duplicadas (mismo ISRC) en su canción canónica, por lotes. '
+        'Con --rebuild-mapping recalcula antes el mapeo ISRC → canónica de todo el catálogo.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rebuild-mapping', action='store_true',
+                            help='Recalcula el mapeo de todo el catálogo antes de fusionar.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Duplicados fusionados por transacción.')
+        parser.add_argument('--dry-run', action='store_true', help='Solo informa cuántos duplicados hay.')
+
+    def handle(self, *args, **options):
+        if options['rebuild_mapping']:
+            duplicates = canonical.update_mapping()
+            self.stdout.write(f"Mapeo recalculado: {duplicates} canciones duplicadas.")
+
+        pending = canonical.pending_merges().count()
+        if options['dry_run'] or not pending:
+            self.stdout.write(f"{pending} canciones duplicadas pendientes de fusionar.")
+            return
+
+        merged = canonical.merge_duplicates(
+            batch_size=options['batch_size'],
+            progress=lambda merged: self.stdout.write(f"  {merged}/{pending} fusionadas"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"{merged} canciones duplicadas fusionadas."))
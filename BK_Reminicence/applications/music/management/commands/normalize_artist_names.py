@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand
+
+from applications.music.artist_lookup import duplicate_groups
+from applications.music.models import Artists
+from applications.music.normalization import normalize_name
+
+
+class Command(BaseCommand):
+    help = (
+        'Rellena artists.normalized_name (índice de búsqueda de artistas) por lotes y, con '
+        '--duplicates, lista los artistas que comparten nombre normalizado.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help='Recalcula todos los artistas, no solo los que no tienen nombre normalizado.')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--duplicates', action='store_true', help='Lista los posibles artistas duplicados.')
+
+    def handle(self, *args, **options):
+        queryset = Artists.objects.all() if options['all'] else Artists.objects.filter(normalized_name__isnull=True)
+        batch_size = options['batch_size']
+        updated = 0
+        last_id = 0
+        while True:
+            batch = list(queryset.filter(artist_id__gt=last_id).order_by('artist_id').only('artist_id', 'name')[:batch_size])
+            if not batch:
+                break
+            for artist in batch:
+                artist.normalized_name = normalize_name(artist.name)
+            Artists.objects.bulk_update(batch, ['normalized_name'], batch_size=batch_size)
+            updated += len(batch)
+            last_id = batch[-1].artist_id
+            self.stdout.write(f"  {updated} artistas normalizados")
+        self.stdout.write(self.style.SUCCESS(f"{updated} artistas actualizados."))
+
+        if options['duplicates']:
+            groups = list(duplicate_groups())
+            self.stdout.write(f"{len(groups)} nombres compartidos por varios artistas:")
+            for group in groups:
+                self.stdout.write(f"  {group['count']:>4}  {group['normalized_name']}")
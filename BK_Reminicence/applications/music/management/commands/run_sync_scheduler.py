@@ -0,0 +1,28 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from applications.music import scheduler
+
+
+class Command(BaseCommand):
+    help = (
+        'Sincroniza con Spotify a los usuarios cuya próxima sincronización automática venció, '
+        'por lotes y con un máximo de hilos (music:scheduler). Sin --once queda en bucle.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help='Despacha un solo lote y termina.')
+        parser.add_argument('--batch-size', type=int, help='Usuarios por lote (por defecto SYNC_SCHEDULER).')
+        parser.add_argument('--workers', type=int, help='Sincronizaciones simultáneas (por defecto SYNC_SCHEDULER).')
+        parser.add_argument('--interval', type=int, default=60, help='Segundos de espera cuando no hay nada vencido.')
+
+    def handle(self, *args, **options):
+        while True:
+            synced, failed = scheduler.dispatch_due(options['batch_size'], options['workers'])
+            if synced or failed:
+                self.stdout.write(f"{synced} usuarios sincronizados, {failed} fallidos")
+            if options['once']:
+                break
+            if not (synced or failed):
+                time.sleep(options['interval'])
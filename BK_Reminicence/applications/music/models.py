@@ -3,10 +3,20 @@
 from django.db import models
 from django.conf import settings
 
+from .normalization import normalize_name
+
 
 class Artists(models.Model):
     artist_id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=100)
+    # NOTA: columna añadida para la búsqueda de artistas (music:artist_lookup):
+    #   ALTER TABLE artists ADD COLUMN normalized_name varchar(100);
+    #   CREATE INDEX artists_normalized_name_idx ON artists (normalized_name);
+    #   CREATE EXTENSION IF NOT EXISTS pg_trgm;
+    #   CREATE INDEX artists_normalized_name_trgm ON artists USING gin (normalized_name gin_trgm_ops);
+    # No es única: hay artistas distintos con el mismo nombre. Se rellena con
+    # el comando normalize_artist_names.
+    normalized_name = models.CharField(max_length=100, blank=True, null=True, db_index=True)
     country = models.CharField(max_length=50, blank=True, null=True)
     biography = models.TextField(blank=True, null=True)
     spotify_id = models.CharField(unique=True, max_length=50, blank=True, null=True)
@@ -28,6 +38,13 @@ class Artists(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        self.normalized_name = normalize_name(self.name)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'name' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'normalized_name'}
+        super().save(*args, **kwargs)
+
 class Albums(models.Model):
     album_id = models.AutoField(primary_key=True)
     artist = models.ForeignKey(Artists, on_delete=models.CASCADE, db_column='artist_id')
@@ -72,7 +89,8 @@ class Songs(models.Model):
     spotify_id = models.CharField(unique=True, max_length=50, blank=True, null=True)
     spotify_url = models.CharField(max_length=255, blank=True, null=True)
     preview_url = models.URLField(max_length=500, blank=True, null=True) # Corregido a un solo campo
-    isrc = models.CharField(max_length=20, blank=True, null=True)
+    # NOTA: requiere el índice CREATE INDEX songs_isrc_idx ON songs (isrc); (music:canonical)
+    isrc = models.CharField(max_length=20, blank=True, null=True, db_index=True)
     popularity = models.IntegerField(blank=True, null=True)
     data_source = models.CharField(max_length=20)
     genres = models.ManyToManyField(Genres, through='SongGenre', related_name='songs')
@@ -185,4 +203,89 @@ class PlaybackHistory(models.Model):
 
     class Meta:
         managed = False
-        db_table = 'playback_history'
\ No newline at end of file
+        db_table = 'playback_history'
+
+class SongNeighbour(models.Model):
+    """
+    Canciones similares a ``song`` por co-ocurrencia en playlists, de mayor a
+    menor ``score`` (similitud coseno). La tabla la reconstruye por completo
+    el comando ``build_song_neighbours`` (music:similarity); a diferencia de las
+    tablas anteriores, la gestiona Django (``makemigrations music``).
+    """
+    song = models.ForeignKey(Songs, on_delete=models.CASCADE, related_name='neighbours')
+    neighbour = models.ForeignKey(Songs, on_delete=models.CASCADE, related_name='neighbour_of')
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        db_table = 'song_neighbours'
+        unique_together = (('song', 'rank'),)
+
+
+class CanonicalSong(models.Model):
+    """
+    Canción canónica de cada grabación: todas las ``Songs`` con el mismo ISRC
+    (single, álbum, recopilatorio, ediciones regionales) apuntan a una sola.
+    Las canciones sin ISRC no tienen fila y son canónicas de sí mismas.
+    La mantiene music:canonical; tabla gestionada por Django.
+    """
+    song = models.OneToOneField(Songs, on_delete=models.CASCADE, primary_key=True, related_name='canonical_mapping')
+    canonical = models.ForeignKey(Songs, on_delete=models.CASCADE, related_name='duplicates')
+    isrc = models.CharField(max_length=20, db_index=True)
+
+    class Meta:
+        db_table = 'song_canonical'
+
+
+class SyncSchedule(models.Model):
+    """
+    Próxima sincronización automática de cada usuario y lo observado en las
+    anteriores: ``change_rate`` es la media móvil de cambios por
+    sincronización e ``interval`` el intervalo actual en segundos. La mantiene
+    music:scheduler; tabla gestionada por Django.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name='sync_schedule'
+    )
+    next_sync_at = models.DateTimeField(db_index=True)
+    interval = models.PositiveIntegerField()
+    change_rate = models.FloatField(default=1.0)
+    last_changes = models.PositiveIntegerField(default=0)
+    last_sync_at = models.DateTimeField(blank=True, null=True)
+    last_activity_at = models.DateTimeField(blank=True, null=True)
+    failures = models.PositiveSmallIntegerField(default=0)
+
+    class Meta:
+        db_table = 'sync_schedules'
+
+
+class SongAlias(models.Model):
+    """
+    ``spotify_id`` de las canciones ya fusionadas en su canónica
+    (``merge_duplicate_songs``): la sincronización resuelve por aquí para no
+    volver a crear el duplicado. La mantiene music:canonical; tabla
+    gestionada por Django.
+    """
+    spotify_id = models.CharField(max_length=50, primary_key=True)
+    song = models.ForeignKey(Songs, on_delete=models.CASCADE, related_name='aliases')
+
+    class Meta:
+        db_table = 'song_aliases'
+
+
+class SyncLease(models.Model):
+    """
+    Reserva de cada tarea larga en curso de un usuario (sincronización
+    completa, importación del historial; music:sync_lease). La restricción
+    única impide dos del mismo tipo a la vez en cualquier motor;
+    ``heartbeat_at`` se renueva mientras la tarea avanza. Tabla gestionada
+    por Django.
+    """
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='sync_leases')
+    sync_type = models.CharField(max_length=50)
+    log = models.ForeignKey('spotify_api.SpotifySyncLog', on_delete=models.CASCADE, related_name='+')
+    heartbeat_at = models.DateTimeField()
+
+    class Meta:
+        db_table = 'sync_leases'
+        unique_together = (('user', 'sync_type'),)
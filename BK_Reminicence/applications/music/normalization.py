@@ -0,0 +1,22 @@
+# applications/music/normalization.py
+"""Normalización de nombres para comparar artistas sin depender de mayúsculas, tildes ni puntuación."""
+
+import re
+import unicodedata
+
+_NON_WORD_RE = re.compile(r'[\W_]+')
+
+NORMALIZED_MAX_LENGTH = 100
+
+
+def normalize_name(name):
+    """
+    Forma comparable de un nombre: sin tildes ni diacríticos, en minúsculas
+    (``casefold``) y con la puntuación reducida a un espacio.
+    ``'Beyoncé'`` → ``'beyonce'``, ``'AC/DC'`` → ``'ac dc'``, ``'Guns N’ Roses'`` → ``'guns n roses'``.
+    """
+    text = unicodedata.normalize('NFKD', name or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char)).casefold()
+    normalized = ' '.join(_NON_WORD_RE.sub(' ', text).split())
+    # Nombres hechos solo de símbolos ("!!!") se comparan tal cual.
+    return (normalized or ' '.join(text.split()))[:NORMALIZED_MAX_LENGTH]
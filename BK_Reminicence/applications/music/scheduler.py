@@ -0,0 +1,182 @@
+# applications/music/scheduler.py
+"""
+Sincronización automática por usuario (comando ``run_sync_scheduler``).
+
+Cada usuario con Spotify vinculado tiene un ``SyncSchedule`` con la fecha de
+su próxima sincronización. Tras cada una, el intervalo se ajusta según lo que
+cambió en Spotify (playlists con otro snapshot, favoritos nuevos o quitados):
+se reduce a la mitad si hubo cambios y se duplica si no, así que las cuentas
+quietas se consultan cada vez menos (hasta ``max_interval``). La actividad en
+la web acota el intervalo a ``active_interval`` y adelanta la próxima
+sincronización; al despachar, los usuarios activos y los que más cambian van
+primero.
+"""
+
+import logging
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connections, transaction
+from django.db.models import DateTimeField, F, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+from applications.spotify_api.models import SpotifyUserToken
+
+from .models import SyncSchedule
+from .sync_lease import SyncInProgress
+
+logger = logging.getLogger(__name__)
+
+
+def _conf(name):
+    return settings.SYNC_SCHEDULER[name]
+
+
+def _jittered(seconds):
+    """Reparte las sincronizaciones para que no venzan todas a la vez."""
+    spread = seconds * _conf('jitter')
+    return timedelta(seconds=seconds + random.uniform(-spread, spread))
+
+
+def next_interval(interval, changes, active):
+    """Intervalo siguiente: la mitad si hubo cambios, el doble si no; acotado para usuarios activos."""
+    if changes:
+        interval = max(_conf('min_interval'), interval // 2)
+    else:
+        interval = min(_conf('max_interval'), interval * 2)
+    if active:
+        interval = min(interval, _conf('active_interval'))
+    return interval
+
+
+def is_active(schedule, now=None):
+    now = now or timezone.now()
+    return bool(schedule.last_activity_at and now - schedule.last_activity_at <= timedelta(seconds=_conf('active_window')))
+
+
+def record_activity(user_id):
+    """
+    Marca al usuario como activo: su intervalo queda acotado a
+    ``active_interval`` contado desde la última sincronización. Como mucho
+    escribe una vez cada ``activity_resolution`` por usuario; el resto de las
+    llamadas solo consultan la caché.
+    """
+    if not cache.add(f"sync_activity:{user_id}", 1, _conf('activity_resolution')):
+        return
+    now = timezone.now()
+    active_interval = timedelta(seconds=_conf('active_interval'))
+    # No antes de min_interval: la fila puede estar reservada por una sincronización en curso.
+    due = Greatest(
+        Coalesce(F('last_sync_at'), Value(now)) + active_interval,
+        Value(now + timedelta(seconds=_conf('min_interval'))),
+        output_field=DateTimeField(),
+    )
+    SyncSchedule.objects.filter(user_id=user_id).update(
+        last_activity_at=now,
+        interval=Least(F('interval'), Value(_conf('active_interval'))),
+        next_sync_at=Least(F('next_sync_at'), due, output_field=DateTimeField()),
+    )
+
+
+def record_sync(user_id, changes, failed=False):
+    """
+    Registra una sincronización terminada y programa la siguiente. Las
+    fallidas no cambian el intervalo: se reintentan con backoff propio.
+    """
+    now = timezone.now()
+    schedule, _ = SyncSchedule.objects.get_or_create(
+        user_id=user_id, defaults={'next_sync_at': now, 'interval': _conf('min_interval')}
+    )
+    if failed:
+        schedule.failures += 1
+        delay = min(_conf('max_interval'), _conf('min_interval') * 2 ** schedule.failures)
+    else:
+        alpha = _conf('change_rate_alpha')
+        schedule.change_rate = alpha * changes + (1 - alpha) * schedule.change_rate
+        schedule.last_changes = changes
+        schedule.failures = 0
+        schedule.last_sync_at = now
+        schedule.interval = delay = next_interval(schedule.interval, changes, is_active(schedule, now))
+    schedule.next_sync_at = now + _jittered(delay)
+    schedule.save()
+    return schedule
+
+
+def ensure_schedules():
+    """
+    Crea el ``SyncSchedule`` (vencido) de los usuarios con Spotify vinculado
+    que aún no tienen y borra el de los que lo desvincularon.
+    """
+    now = timezone.now()
+    SyncSchedule.objects.filter(user__spotifyusertoken__isnull=True).delete()
+    missing = SpotifyUserToken.objects.filter(user__sync_schedule__isnull=True).values_list('user_id', flat=True)
+    created = SyncSchedule.objects.bulk_create(
+        [SyncSchedule(user_id=user_id, next_sync_at=now, interval=_conf('min_interval')) for user_id in missing],
+        ignore_conflicts=True,
+    )
+    return len(created)
+
+
+def claim_due(batch_size):
+    """
+    Reserva hasta ``batch_size`` usuarios vencidos, primero los activos y los
+    que más cambian, moviendo su próxima sincronización al final de la
+    reserva (``lease``) para que otro planificador no los tome.
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        user_ids = list(
+            SyncSchedule.objects.select_for_update(skip_locked=True)
+            .filter(next_sync_at__lte=now)
+            .order_by(F('last_activity_at').desc(nulls_last=True), '-change_rate', 'next_sync_at')
+            .values_list('user_id', flat=True)[:batch_size]
+        )
+        SyncSchedule.objects.filter(user_id__in=user_ids).update(
+            next_sync_at=now + timedelta(seconds=_conf('lease'))
+        )
+    return user_ids
+
+
+def sync_user(user_id):
+    """Sincroniza a un usuario; ``full_sync`` programa la siguiente (aquí solo los fallos)."""
+    from .sync_service import SpotifySyncService  # spotipy solo se carga al sincronizar
+
+    try:
+        if not SpotifyUserToken.objects.filter(user_id=user_id).exists():
+            # Desvinculó Spotify después de reservarlo: no es un fallo, deja de programarse.
+            SyncSchedule.objects.filter(user_id=user_id).delete()
+            return {}
+        service = SpotifySyncService(get_user_model().objects.get(pk=user_id))
+        if not service.spotify_service.sp:
+            raise RuntimeError("sin token válido de Spotify")
+        return service.full_sync()
+    except SyncInProgress:
+        # La sincronización en curso (manual u otro planificador) programará la siguiente.
+        logger.info(f"El usuario {user_id} ya se está sincronizando; se omite")
+        return {}
+    except Exception as e:
+        logger.error(f"Sincronización automática del usuario {user_id} falló: {e}")
+        record_sync(user_id, 0, failed=True)
+        return None
+    finally:
+        connections.close_all()
+
+
+def dispatch_due(batch_size=None, workers=None):
+    """
+    Sincroniza un lote de usuarios vencidos con un máximo de ``workers`` a la
+    vez. Retorna ``(sincronizados, fallidos)``.
+    """
+    ensure_schedules()
+    user_ids = claim_due(batch_size or _conf('batch_size'))
+    if not user_ids:
+        return 0, 0
+    with ThreadPoolExecutor(max_workers=workers or _conf('workers'), thread_name_prefix='sync') as executor:
+        results = list(executor.map(sync_user, user_ids))
+    failed = sum(result is None for result in results)
+    return len(results) - failed, failed
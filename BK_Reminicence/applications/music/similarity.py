@@ -0,0 +1,164 @@
+# applications/music/similarity.py
+"""
+Canciones similares por co-ocurrencia en las playlists de todos los usuarios.
+
+La reconstrucción (``build_song_neighbours``) arma una matriz dispersa
+canción × playlist con NumPy/SciPy y calcula, por bloques de canciones, la
+similitud coseno contra todas las demás con un solo producto de matrices
+dispersas por bloque; los ``k`` vecinos de cada canción se eligen sin bucles
+de Python ordenando el bloque completo. El resultado se guarda en
+``SongNeighbour``, así que las páginas solo hacen una consulta indexada.
+
+Las canciones se agrupan por su id canónico (music:canonical), así que las
+ediciones de una misma grabación suman su señal y no aparecen como vecinas
+entre sí.
+
+NumPy y SciPy solo se importan al reconstruir: el servidor web no las necesita.
+"""
+
+import itertools
+import time
+
+from django.db import transaction
+from django.db.models import Subquery, Sum
+
+from applications.core.bulk import insert_rows
+
+from .canonical import canonical_id
+from .models import PlaylistSong, SongNeighbour, Songs
+
+NEIGHBOURS = 20
+
+# Canciones por bloque del producto de matrices: acota la memoria de cada paso.
+CHUNK_SIZE = 2000
+
+# Las playlists enormes (archivos, "todas mis canciones") relacionan todo con
+# todo y concentran el costo del producto; no aportan señal útil.
+MAX_PLAYLIST_SIZE = 1000
+
+# Coincidencias mínimas en playlists para considerar dos canciones vecinas.
+MIN_COOCCURRENCE = 2
+
+_COLUMNS = ['song_id', 'neighbour_id', 'rank', 'score']
+
+
+def load_entries(chunk_size=50000):
+    """Pares (playlist_id, id canónico de la canción) de todas las playlists como dos arreglos de NumPy."""
+    import numpy as np
+
+    rows = (
+        PlaylistSong.objects.annotate(canonical_song_id=canonical_id('song'))
+        .values_list('playlist_id', 'canonical_song_id').iterator(chunk_size=chunk_size)
+    )
+    pairs = np.fromiter(itertools.chain.from_iterable(rows), dtype=np.int64).reshape(-1, 2)
+    return pairs[:, 0], pairs[:, 1]
+
+
+def build_matrix(playlist_ids, song_ids, max_playlist_size=MAX_PLAYLIST_SIZE):
+    """
+    Matriz binaria canción × playlist (CSR) y el ``song_id`` de cada fila. Se
+    descartan las playlists de una sola canción y las de más de ``max_playlist_size``.
+    """
+    import numpy as np
+    from scipy import sparse
+
+    playlist_keys, playlist_idx = np.unique(playlist_ids, return_inverse=True)
+    sizes = np.bincount(playlist_idx, minlength=len(playlist_keys))
+    keep = (sizes[playlist_idx] >= 2) & (sizes[playlist_idx] <= max_playlist_size)
+
+    song_keys, song_idx = np.unique(song_ids[keep], return_inverse=True)
+    matrix = sparse.csr_matrix(
+        (np.ones(len(song_idx), dtype=np.int32), (song_idx, playlist_idx[keep])),
+        shape=(len(song_keys), len(playlist_keys)),
+    )
+    # Una canción repetida en la misma playlist cuenta una sola vez.
+    matrix.data[:] = 1
+    return matrix, song_keys
+
+
+def iter_neighbours(matrix, song_keys, k=NEIGHBOURS, chunk_size=CHUNK_SIZE, min_cooccurrence=MIN_COOCCURRENCE):
+    """
+    Por cada bloque de canciones, arreglos ``(song_id, neighbour_id, rank, score)``
+    con los ``k`` vecinos más similares de cada una.
+    """
+    import numpy as np
+
+    transposed = matrix.T.tocsr()
+    norms = np.sqrt(np.diff(matrix.indptr)).astype(np.float64)
+
+    for start in range(0, matrix.shape[0], chunk_size):
+        # counts[i, j] = playlists que comparten la canción start+i y la j.
+        counts = (matrix[start:start + chunk_size] @ transposed).tocsr()
+        rows = np.repeat(np.arange(counts.shape[0]), np.diff(counts.indptr))
+        cols, shared = counts.indices, counts.data
+        keep = (shared >= min_cooccurrence) & (cols != rows + start)
+        rows, cols, shared = rows[keep], cols[keep], shared[keep]
+        if not len(rows):
+            continue
+
+        scores = shared / (norms[rows + start] * norms[cols])
+        # Por canción, de mayor a menor similitud (y por id en empates, para que sea estable).
+        order = np.lexsort((cols, -scores, rows))
+        rows, cols, scores = rows[order], cols[order], scores[order]
+        rank = np.arange(len(rows)) - np.searchsorted(rows, rows)
+        top = rank < k
+        yield song_keys[rows[top] + start], song_keys[cols[top]], rank[top] + 1, scores[top]
+
+
+def rebuild_neighbours(k=NEIGHBOURS, chunk_size=CHUNK_SIZE, max_playlist_size=MAX_PLAYLIST_SIZE,
+                       min_cooccurrence=MIN_COOCCURRENCE):
+    """
+    Recalcula ``SongNeighbour`` completa en una transacción (las páginas siguen
+    viendo los vecinos anteriores hasta el final). Retorna conteos y tiempos por fase.
+    """
+    stats = {}
+    started = time.perf_counter()
+    playlist_ids, song_ids = load_entries()
+    stats['entries'] = len(song_ids)
+    stats['load_seconds'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    matrix, song_keys = build_matrix(playlist_ids, song_ids, max_playlist_size)
+    stats['songs'] = matrix.shape[0]
+    stats['playlists'] = matrix.shape[1]
+    stats['matrix_seconds'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    stats['neighbours'] = 0
+    stats['write_seconds'] = 0.0
+    with transaction.atomic():
+        SongNeighbour.objects.all().delete()
+        for songs, neighbours, ranks, scores in iter_neighbours(matrix, song_keys, k, chunk_size, min_cooccurrence):
+            write_started = time.perf_counter()
+            stats['neighbours'] += insert_rows(
+                SongNeighbour, _COLUMNS,
+                zip(songs.tolist(), neighbours.tolist(), ranks.tolist(), scores.tolist()),
+            )
+            stats['write_seconds'] += time.perf_counter() - write_started
+    stats['compute_seconds'] = time.perf_counter() - started - stats['write_seconds']
+    return stats
+
+
+def similar_songs(spotify_id, limit=10):
+    """Canciones más parecidas a la canción de Spotify ``spotify_id``, en una consulta."""
+    song = Songs.objects.filter(spotify_id=spotify_id).annotate(canonical_song_id=canonical_id())
+    return list(
+        Songs.objects.filter(neighbour_of__song_id=Subquery(song.values('canonical_song_id')[:1]))
+        .select_related('album__artist')
+        .order_by('neighbour_of__rank')[:limit]
+    )
+
+
+def continue_listening(album_spotify_id, limit=10):
+    """
+    Canciones de otros álbumes más cercanas al álbum en conjunto (suma de la
+    similitud con cada una de sus canciones), en una consulta.
+    """
+    album_songs = Songs.objects.filter(album__spotify_id=album_spotify_id).annotate(canonical_song_id=canonical_id())
+    return list(
+        Songs.objects.filter(neighbour_of__song_id__in=album_songs.values('canonical_song_id'))
+        .exclude(album__spotify_id=album_spotify_id)
+        .annotate(affinity=Sum('neighbour_of__score'))
+        .select_related('album__artist')
+        .order_by('-affinity')[:limit]
+    )
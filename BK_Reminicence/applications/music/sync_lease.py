@@ -0,0 +1,122 @@
+# applications/music/sync_lease.py
+"""
+Una sola tarea larga de cada tipo a la vez por usuario: la sincronización
+completa (``full_sync``) y la importación del historial (``history_import``).
+
+La reserva es la fila ``(usuario, tipo)`` de ``SyncLease``, que apunta al
+``SpotifySyncLog`` donde la tarea va anotando su avance. Un segundo intento
+(doble clic, otra pestaña, el planificador) recibe ``SyncInProgress`` con ese
+registro para mostrar su avance en lugar de empezar otra. La restricción única
+de ``SyncLease`` es la que impide dos reservas a la vez, también en SQLite
+(donde ``SELECT ... FOR UPDATE`` no hace nada).
+
+Mientras avanza, la tarea renueva ``heartbeat_at``; una reserva sin
+latido durante ``SYNC_LEASE_TIMEOUT`` se da por perdida (el worker se
+reinició a mitad) y la toma el siguiente intento.
+"""
+
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from applications.spotify_api.models import SpotifySyncLog
+
+from .models import SyncLease
+
+SYNC_TYPE = 'full_sync'
+
+
+class SyncInProgress(Exception):
+    """Ya hay una tarea del mismo tipo en curso; ``log`` es su registro."""
+
+    def __init__(self, log):
+        super().__init__(f"{log.sync_type} {log.pk} en curso desde {log.started_at}")
+        self.log = log
+
+
+def _cutoff():
+    return timezone.now() - timedelta(seconds=settings.SYNC_LEASE_TIMEOUT)
+
+
+def current_sync(user_id, sync_type=SYNC_TYPE):
+    """El registro de la tarea de ese tipo en curso del usuario, o None."""
+    lease = SyncLease.objects.select_related('log').filter(
+        user_id=user_id, sync_type=sync_type, heartbeat_at__gt=_cutoff()
+    ).first()
+    return lease.log if lease else None
+
+
+def _claim(user, log):
+    """True si ``log`` quedó como la reserva del usuario para su tipo."""
+    try:
+        with transaction.atomic():
+            SyncLease.objects.create(user=user, sync_type=log.sync_type, log=log, heartbeat_at=log.started_at)
+        return True
+    except IntegrityError:
+        pass
+    current = SyncLease.objects.select_related('log').filter(user=user, sync_type=log.sync_type).first()
+    if current is None:
+        return False  # se liberó entretanto: se reintenta
+    if current.heartbeat_at > _cutoff():
+        raise SyncInProgress(current.log)
+    # Vencida: se la queda quien cambie primero la fila tal como la leyó.
+    taken = SyncLease.objects.filter(pk=current.pk, log=current.log, heartbeat_at=current.heartbeat_at).update(
+        log=log, heartbeat_at=log.started_at
+    )
+    if taken:
+        SpotifySyncLog.objects.filter(pk=current.log_id, status='running').update(
+            status='failed', error_message='Reserva vencida', completed_at=log.started_at
+        )
+    return bool(taken)
+
+
+def acquire(user, sync_type=SYNC_TYPE):
+    """
+    Toma la reserva del usuario y retorna su ``SpotifySyncLog``; lanza
+    ``SyncInProgress`` si ya la tiene otro. El caso común (reserva vigente)
+    se resuelve con una lectura, sin crear el registro.
+    """
+    current = current_sync(user.pk, sync_type)
+    if current is not None:
+        raise SyncInProgress(current)
+
+    log = SpotifySyncLog.objects.create(
+        user=user, sync_type=sync_type, status='running', items_processed=0, started_at=timezone.now()
+    )
+    try:
+        for _ in range(3):
+            if _claim(user, log):
+                log.heartbeat = time.monotonic()
+                return log
+        raise RuntimeError(f"No se pudo tomar la reserva de {sync_type}: se liberó y tomó varias veces seguidas")
+    except Exception:
+        log.delete()
+        raise
+
+
+def heartbeat(log, force=False):
+    """Renueva la reserva; como mucho una escritura cada ``SYNC_LEASE_HEARTBEAT`` segundos."""
+    now = time.monotonic()
+    if not force and now - getattr(log, 'heartbeat', 0) < settings.SYNC_LEASE_HEARTBEAT:
+        return
+    log.heartbeat = now
+    SyncLease.objects.filter(log=log).update(heartbeat_at=timezone.now())
+
+
+def progress(log, processed, total):
+    """Anota el avance en el registro y renueva la reserva."""
+    log.items_processed, log.items_total = processed, total
+    SpotifySyncLog.objects.filter(pk=log.pk).update(items_processed=processed, items_total=total)
+    heartbeat(log)
+
+
+def release(log, error=None):
+    """Libera la reserva marcándola como completada, o como fallida si hay ``error``."""
+    log.status = 'failed' if error else 'completed'
+    log.error_message = error
+    log.completed_at = timezone.now()
+    log.save(update_fields=['status', 'error_message', 'completed_at'])
+    SyncLease.objects.filter(log=log).delete()
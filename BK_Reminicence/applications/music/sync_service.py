@@ -1,10 +1,18 @@
 # applications/music/sync_service.py
 
+from django.conf import settings
 from django.utils import timezone
-from .models import Artists, Albums, Songs, Playlist, PlaylistSong
+from django.utils.dateparse import parse_datetime
+from .models import Artists, Albums, Songs, Playlist, PlaylistSong, UserFavoriteArtist, UserFavoriteSong
 from applications.core.spotify_service import SpotifyService
-from datetime import datetime
+from applications.spotify_api.models import SpotifySyncLog
+from applications.spotify_api.services import build_artist
+from applications.core.library_cache import bump_library_version
+from applications.core import metrics
+from . import canonical, scheduler, sync_lease
+from datetime import datetime, timedelta
 import logging
+import time
 
 logger = logging.getLogger(__name__)
 
@@ -14,6 +22,12 @@ class SpotifySyncService:
     def __init__(self, user):
         self.user = user
         self.spotify_service = SpotifyService(user)
+        self.tracks_synced = 0
+        self.synced_isrcs = set()
+        self.saved_tracks_total = None
+        self.playlist_changes = 0
+        self.artists_unfollowed = 0
+        self.lease = None
 
     def _sync_artist(self, artist_data):
         """Sincroniza un artista usando la información del track."""
@@ -61,11 +75,19 @@ class SpotifySyncService:
         )
         return album
 
-    def sync_song(self, track_data):
-        """Sincroniza una canción individual."""
+    def sync_song(self, track_data, aliases=None):
+        """
+        Sincroniza una canción individual. Si su ``spotify_id`` es de un
+        duplicado ya fusionado retorna la canónica; ``aliases`` (de
+        ``canonical.aliases``) evita consultarlo canción por canción.
+        """
         spotify_id = track_data.get('id')
         if not spotify_id:
             return None
+        if aliases is None:
+            aliases = canonical.aliases([spotify_id])
+        if spotify_id in aliases:
+            return Songs.objects.filter(song_id=aliases[spotify_id]).first()
 
         artist_data = track_data['artists'][0] if track_data.get('artists') else None
         if not artist_data:
@@ -91,7 +113,17 @@ class SpotifySyncService:
                 'data_source': 'spotify',
             }
         )
+        if song.isrc:
+            self.synced_isrcs.add(song.isrc)
         return song
+
+    def update_canonical_mapping(self):
+        """Actualiza el mapeo ISRC → canción canónica de lo sincronizado, en lotes."""
+        if not self.synced_isrcs:
+            return 0
+        duplicates = canonical.update_mapping(self.synced_isrcs)
+        self.synced_isrcs = set()
+        return duplicates
     
     def sync_playlists(self):
         """Sincroniza la metadata de todas las playlists del usuario."""
@@ -102,14 +134,42 @@ class SpotifySyncService:
             logger.warning(f"No se encontraron playlists para {self.user.username}")
             return 0
         
+        # Estado previo para detectar altas, renombrados y cambios de snapshot
+        known = {
+            spotify_id: (name, snapshot_id, cover)
+            for spotify_id, name, snapshot_id, cover in Playlist.objects.filter(
+                user=self.user, spotify_id__isnull=False
+            ).values_list('spotify_id', 'name', 'spotify_snapshot_id', 'cover_image_url')
+        }
+        # Playlists quitadas; las nuevas, renombradas o con otro snapshot se cuentan abajo
+        self.playlist_changes = len(set(known) - {pl_data['id'] for pl_data in spotify_playlists})
+        # spotify_id es único en toda la tabla: una playlist que sigue otro usuario de
+        # la aplicación ya es suya y no se le quita.
+        taken = set(
+            Playlist.objects.filter(spotify_id__in=[pl_data['id'] for pl_data in spotify_playlists])
+            .exclude(user=self.user).values_list('spotify_id', flat=True)
+        )
+
         synced_count = 0
-        for pl_data in spotify_playlists:
+        for done, pl_data in enumerate(spotify_playlists):
+            if self.lease:
+                sync_lease.progress(self.lease, done, len(spotify_playlists))
+            if pl_data['id'] in taken:
+                logger.warning(
+                    f"Playlist {pl_data.get('name')} ({pl_data['id']}) ya pertenece a otro usuario; "
+                    f"se omite para {self.user.username}"
+                )
+                continue
             try:
+                current = (pl_data['name'], pl_data.get('snapshot_id'), pl_data.get('image'))
+                if known.get(pl_data['id']) != current:
+                    self.playlist_changes += 1
+
                 playlist, created = Playlist.objects.update_or_create(
                     user=self.user,
-                    name=pl_data['name'],
+                    spotify_id=pl_data['id'],
                     defaults={
-                        'spotify_id': pl_data['id'], 
+                        'name': pl_data['name'],
                         'description': pl_data.get('description', ''),
                         'cover_image_url': pl_data.get('image'),
                         'spotify_snapshot_id': pl_data.get('snapshot_id'),
@@ -118,35 +178,45 @@ class SpotifySyncService:
                     }
                 )
 
-                self._sync_playlist_tracks(playlist, pl_data['id'])
+                self.tracks_synced += self._sync_playlist_tracks(playlist, pl_data['id'])
                 synced_count += 1
                 
             except Exception as e:
                 logger.error(f"Error al procesar playlist {pl_data.get('name')}: {e}")
                 continue
         
+        if self.lease:
+            sync_lease.progress(self.lease, len(spotify_playlists), len(spotify_playlists))
+        if self.playlist_changes:
+            bump_library_version(self.user.pk)
+
         logger.info(f"Sincronización completada: {synced_count} playlists para {self.user.username}")
         return synced_count
     
     def _sync_playlist_tracks(self, playlist, spotify_playlist_id):
-        """Sincroniza todas las canciones de una playlist específica."""
+        """Sincroniza todas las canciones de una playlist específica y retorna cuántas se guardaron."""
+        songs_added_count = 0
         try:
             sp = self.spotify_service.sp
             if not sp: 
-                return
+                return 0
             
             results = sp.playlist_tracks(spotify_playlist_id)
             tracks = results['items']
+            while results.get('next'):
+                results = sp.next(results)
+                tracks.extend(results['items'])
             
             PlaylistSong.objects.filter(playlist=playlist).delete()
+            aliases = canonical.aliases({item['track']['id'] for item in tracks if (item.get('track') or {}).get('id')})
             
-            songs_added_count = 0
             for idx, item in enumerate(tracks):
+                self._heartbeat()
                 track = item.get('track')
                 if not track: 
                     continue
                 
-                song_obj = self.sync_song(track)
+                song_obj = self.sync_song(track, aliases)
                 
                 if song_obj:
                     date_added_str = item.get('added_at')
@@ -172,10 +242,266 @@ class SpotifySyncService:
                     
         except Exception as e:
             logger.error(f"Error sincronizando tracks de '{playlist.name}': {e}")
+        return songs_added_count
     
-    def full_sync(self):
-        """Realiza la sincronización completa."""
+    def _heartbeat(self):
+        """Renueva la reserva de la sincronización en curso (no escribe más de una vez cada pocos segundos)."""
+        if self.lease:
+            sync_lease.heartbeat(self.lease)
+
+    def _pages(self, results, key=None):
+        """Páginas de un resultado paginado de spotipy, siguiendo ``next`` (offset o cursor ``after``)."""
+        sp = self.spotify_service.sp
+        while results:
+            page = results[key] if key else results
+            self._heartbeat()
+            yield page
+            results = sp.next(page) if page.get('next') else None
+
+    def _song_ids(self, tracks):
+        """spotify_id -> song_id de las pistas; solo las que no están en el catálogo pasan por ``sync_song``."""
+        spotify_ids = {track['id'] for track in tracks if track.get('id')}
+        songs = canonical.song_ids(spotify_ids)
+        for track in tracks:
+            if track.get('id') and track['id'] not in songs:
+                song = self.sync_song(track, aliases={})
+                if song:
+                    songs[track['id']] = song.song_id
+        return songs
+
+    def sync_saved_tracks(self):
+        """
+        Sincroniza las canciones guardadas del usuario en ``UserFavoriteSong``.
+        Spotify las devuelve de la más reciente a la más antigua, así que se
+        pagina solo hasta la primera ya guardada: una ejecución sin cambios
+        cuesta una petición. Las canciones quitadas, y las que no se pudieron
+        guardar en una pasada anterior, se concilian aparte
+        (``reconcile_saved_tracks``). Sin ``added_at`` el favorito queda sin
+        fecha, para no adelantar el punto de corte de la próxima pasada.
+        """
+        sp = self.spotify_service.sp
+        if not sp:
+            return 0
+        try:
+            latest = UserFavoriteSong.objects.filter(user=self.user, favorited_at__isnull=False).order_by(
+                '-favorited_at').values_list('favorited_at', flat=True).first()
+            new_items = []
+            results = sp.current_user_saved_tracks(limit=50)
+            self.saved_tracks_total = results.get('total')
+            for page in self._pages(results):
+                added = [(item.get('track'), parse_datetime(item.get('added_at') or '')) for item in page['items']]
+                known = [bool(latest and added_at and added_at <= latest) for _, added_at in added]
+                new_items.extend(item for item, is_known in zip(added, known) if item[0] and not is_known)
+                if any(known):
+                    break
+
+            songs = self._song_ids([track for track, _ in new_items])
+            # Las sin fecha nunca quedan detrás del punto de corte: solo cuentan si aún no son favoritas.
+            undated_known = set(UserFavoriteSong.objects.filter(
+                user=self.user, song_id__in=[songs.get(track.get('id')) for track, added_at in new_items if not added_at],
+            ).values_list('song_id', flat=True))
+            favorites = {}
+            for track, added_at in new_items:
+                song_id = songs.get(track.get('id'))
+                if not added_at and song_id in undated_known:
+                    continue
+                if song_id and song_id not in favorites:
+                    favorites[song_id] = UserFavoriteSong(user=self.user, song_id=song_id, favorited_at=added_at)
+            UserFavoriteSong.objects.bulk_create(
+                favorites.values(), batch_size=1000,
+                update_conflicts=True, unique_fields=['user', 'song'], update_fields=['favorited_at'],
+            )
+            return len(favorites)
+        except Exception as e:
+            logger.error(f"Error sincronizando canciones guardadas de {self.user.username}: {e}")
+            return 0
+
+    def sync_followed_artists(self):
+        """
+        Sincroniza los artistas seguidos en ``UserFavoriteArtist`` recorriendo
+        ``me/following`` con el cursor ``after``. Como la lista llega completa,
+        los dejados de seguir se eliminan en la misma pasada.
+        """
+        sp = self.spotify_service.sp
+        if not sp:
+            return 0
+        try:
+            sp.stale = False
+            followed = {}
+            for page in self._pages(sp.current_user_followed_artists(limit=50), key='artists'):
+                followed.update((artist['id'], artist) for artist in page['items'] if artist.get('id'))
+            if self.spotify_service.is_stale:
+                # Una respuesta guardada podría estar desactualizada: no se borra nada con ella.
+                return 0
+
+            known = dict(Artists.objects.filter(spotify_id__in=followed).values_list('spotify_id', 'artist_id'))
+            missing = [build_artist(data) for spotify_id, data in followed.items() if spotify_id not in known]
+            if missing:
+                Artists.objects.bulk_create(missing, batch_size=1000, ignore_conflicts=True)
+                known = dict(Artists.objects.filter(spotify_id__in=followed).values_list('spotify_id', 'artist_id'))
+
+            current = set(UserFavoriteArtist.objects.filter(user=self.user).values_list('artist_id', flat=True))
+            wanted = set(known.values())
+            now = timezone.now()
+            UserFavoriteArtist.objects.bulk_create(
+                [UserFavoriteArtist(user=self.user, artist_id=artist_id, favorited_at=now)
+                 for artist_id in wanted - current],
+                batch_size=1000, ignore_conflicts=True,
+            )
+            UserFavoriteArtist.objects.filter(user=self.user, artist_id__in=current - wanted).delete()
+            self.artists_unfollowed = len(current - wanted)
+            return len(wanted - current)
+        except Exception as e:
+            logger.error(f"Error sincronizando artistas seguidos de {self.user.username}: {e}")
+            return 0
+
+    def _reconcile_due(self):
+        """
+        Conciliar cuesta una petición por cada 50 canciones guardadas, así que
+        solo se hace cada ``FAVORITES_RECONCILE_INTERVAL`` o cuando se quitó
+        alguna. Varias ediciones guardadas de una misma grabación son un solo
+        favorito, así que lo que se compara es la diferencia entre el total de
+        Spotify y lo guardado con la que quedó en la última conciliación.
+        """
+        last = SpotifySyncLog.objects.filter(
+            user=self.user, sync_type='favorites_reconcile', status='completed'
+        ).order_by('-completed_at').values_list('completed_at', 'items_processed', 'items_total').first()
+        if last is None:
+            return True
+        completed_at, saved_count, kept_count = last
+        if self.saved_tracks_total is not None and None not in (saved_count, kept_count):
+            gap = self.saved_tracks_total - UserFavoriteSong.objects.filter(user=self.user).count()
+            if gap != saved_count - kept_count:
+                return True
+        return timezone.now() - completed_at > timedelta(seconds=settings.FAVORITES_RECONCILE_INTERVAL)
+
+    def reconcile_saved_tracks(self, force=False):
+        """
+        Concilia ``UserFavoriteSong`` con la lista completa de Spotify: elimina
+        las canciones que el usuario ya no tiene guardadas y agrega las que
+        faltan (p. ej. las que la pasada incremental no pudo guardar y ya quedaron
+        detrás de su punto de corte). Se compara por grabación (id canónico): un
+        favorito fusionado en su canónica sigue guardado si lo está cualquiera de
+        sus ediciones. Retorna cuántos favoritos cambiaron.
+        """
+        sp = self.spotify_service.sp
+        if not sp or not (force or self._reconcile_due()):
+            return 0
+        log = SpotifySyncLog.objects.create(
+            user=self.user, sync_type='favorites_reconcile', status='running', started_at=timezone.now()
+        )
+        try:
+            sp.stale = False
+            saved = {}  # spotify_id -> (pista, added_at)
+            for page in self._pages(sp.current_user_saved_tracks(limit=50)):
+                for item in page['items']:
+                    track = item.get('track')
+                    if track and track.get('id'):
+                        saved.setdefault(track['id'], (track, parse_datetime(item.get('added_at') or '')))
+            if self.spotify_service.is_stale:
+                raise RuntimeError("Spotify no disponible: se sirvió una respuesta guardada")
+
+            songs = canonical.song_ids(saved)
+            saved_songs = canonical.canonical_map(songs.values())
+            local = list(
+                UserFavoriteSong.objects.filter(user=self.user)
+                .annotate(canonical_song_id=canonical.canonical_id('song'))
+                .values_list('pk', 'canonical_song_id')
+            )
+            kept = set(saved_songs.values())
+            removed = [pk for pk, song_id in local if song_id not in kept]
+            for start in range(0, len(removed), 1000):
+                UserFavoriteSong.objects.filter(pk__in=removed[start:start + 1000]).delete()
+
+            local_songs = {song_id for _, song_id in local}
+            missing = [
+                spotify_id for spotify_id in saved
+                if spotify_id not in songs or saved_songs[songs[spotify_id]] not in local_songs
+            ]
+            songs.update(self._song_ids([saved[spotify_id][0] for spotify_id in missing if spotify_id not in songs]))
+            favorites = {}
+            for spotify_id in missing:
+                song_id = songs.get(spotify_id)
+                if song_id and song_id not in favorites:
+                    favorites[song_id] = UserFavoriteSong(
+                        user=self.user, song_id=song_id, favorited_at=saved[spotify_id][1]
+                    )
+            UserFavoriteSong.objects.bulk_create(favorites.values(), batch_size=1000, ignore_conflicts=True)
+            added = len(favorites)
+
+            # items_processed: guardadas en Spotify; items_total: favoritos que quedan.
+            log.status = 'completed'
+            log.items_processed = len(saved)
+            log.items_total = UserFavoriteSong.objects.filter(user=self.user).count()
+            return len(removed) + added
+        except Exception as e:
+            logger.error(f"Error conciliando canciones guardadas de {self.user.username}: {e}")
+            log.status = 'failed'
+            log.error_message = str(e)
+            return 0
+        finally:
+            log.completed_at = timezone.now()
+            log.save()
+
+    def rebuild_library_index(self):
+        """Deja construido el índice de filtrado de la biblioteca para la versión recién sincronizada."""
+        from . import library_index  # NumPy solo se carga donde se usa el índice
+
+        try:
+            library_index.rebuild_index(self.user)
+        except Exception as e:
+            logger.error(f"Error construyendo el índice de la biblioteca de {self.user.username}: {e}")
+
+    def full_sync(self, lease=None):
+        """
+        Realiza la sincronización completa. Sin ``lease`` toma la reserva del
+        usuario (music:sync_lease), así que lanza ``SyncInProgress`` si ya hay
+        otra en curso; con ``lease`` usa una ya tomada. La libera al terminar.
+        """
+        self.lease = lease or sync_lease.acquire(self.user)
+        try:
+            results = self._full_sync()
+        except Exception as e:
+            sync_lease.release(self.lease, error=str(e))
+            raise
+        sync_lease.release(self.lease)
+        return results
+
+    def _full_sync(self):
         logger.info(f"Sincronización completa iniciada para {self.user.username}")
+        start = time.perf_counter()
         results = {'playlists': self.sync_playlists()}
+        results['favorite_songs'] = self.sync_saved_tracks()
+        results['favorite_artists'] = self.sync_followed_artists()
+        results['favorites_reconciled'] = self.reconcile_saved_tracks()
+        results['duplicate_songs'] = self.update_canonical_mapping()
+        self._heartbeat()
+        self.rebuild_library_index()
+        elapsed = time.perf_counter() - start
+
+        # Lo que cambió en Spotify desde la sincronización anterior: ajusta la próxima automática.
+        results['changes'] = (
+            self.playlist_changes + results['favorite_songs'] + results['favorite_artists']
+            + results['favorites_reconciled'] + self.artists_unfollowed
+        )
+        if self.spotify_service.sp:
+            scheduler.record_sync(self.user.pk, results['changes'])
+
+        metrics.observe('sync_duration_seconds', elapsed)
+        metrics.inc('sync_items_total', results['playlists'], kind='playlist')
+        metrics.inc('sync_items_total', self.tracks_synced, kind='track')
+        if elapsed > 0:
+            metrics.observe('sync_items_per_second', self.tracks_synced / elapsed)
+
         logger.info(f"Sincronización completada para {self.user.username}: {results['playlists']} playlists")
-        return results
\ No newline at end of file
+        return results
+
+
+def run_full_sync(user, lease):
+    """Sincronización de ``core:sync_spotify`` en segundo plano, con la reserva ya tomada en el request."""
+    try:
+        service = SpotifySyncService(user)
+    except Exception as e:
+        sync_lease.release(lease, error=str(e))
+        raise
+    service.full_sync(lease=lease)
@@ -1,4 +1,9 @@
+from urllib.parse import urlencode
+
 from django import template
+from django.urls import reverse
+
+from applications.core.image_proxy import is_proxyable
 
 register = template.Library()
 
@@ -21,4 +26,15 @@ def format_duration(milliseconds):
         else:
             return f"{minutes}:{seconds:02d}"
     except (ValueError, TypeError):
-        return "0:00"
\ No newline at end of file
+        return "0:00"
+
+
+@register.filter
+def thumb(url, size):
+    """
+    Reescribe una URL de portada de Spotify para servirla desde el proxy
+    local como miniatura de ``size`` px. Otras URLs se devuelven sin cambios.
+    """
+    if not is_proxyable(url):
+        return url
+    return f"{reverse('core:image_proxy', args=[int(size)])}?{urlencode({'url': url})}"
\ No newline at end of file
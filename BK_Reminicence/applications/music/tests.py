@@ -1,3 +1,221 @@
-from django.test import TestCase
+import io
+import json
+from datetime import datetime, timedelta, timezone as dt_timezone
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, TestCase
+
+from applications.core.library_cache import get_library_version
+
+from . import canonical
+from .history_import import HistoryImportError, import_history, iter_json_array
+from .library_index import LibraryIndex, build_index
+from .models import (
+    Albums, Artists, PlaybackHistory, Playlist, PlaylistSong, SongAlias, Songs, UserFavoriteSong,
+)
+
+
+class IterJsonArrayTests(SimpleTestCase):
+
+    def test_objects_split_across_reads(self):
+        records = [{'ts': '2020-01-01T00:00:00Z', 'name': 'x' * 40}, {'ts': '2020-01-02T00:00:00Z'}, {}]
+        stream = io.StringIO(json.dumps(records, indent=2))
+        self.assertEqual(list(iter_json_array(stream, read_size=7)), records)
+
+    def test_empty_array(self):
+        self.assertEqual(list(iter_json_array(io.StringIO('  [ ]'))), [])
+
+    def test_truncated_file(self):
+        stream = io.StringIO('[{"ts": "2020-01-01T00:00:00Z"}, {"ts": "2020-01')
+        with self.assertRaises(HistoryImportError):
+            list(iter_json_array(stream, read_size=8))
+
+    def test_not_an_array(self):
+        with self.assertRaises(HistoryImportError):
+            list(iter_json_array(io.StringIO('{"ts": "2020-01-01T00:00:00Z"}')))
+
+
+class HistoryImporterTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('oyente', 'oyente@example.com', 'clave')
+        artist = Artists.objects.create(name='Artista', data_source='test')
+        album = Albums.objects.create(artist=artist, title='Álbum', data_source='test')
+        Songs.objects.bulk_create([
+            Songs(album=album, title=f'Canción {i}', duration=180000, spotify_id=f'track{i}', data_source='test')
+            for i in range(3)
+        ])
+
+    def _file(self, records):
+        return io.BytesIO(json.dumps(records).encode('utf-8'))
+
+    def _play(self, track, minute, **extra):
+        return {
+            'ts': f'2021-03-01T10:{minute:02d}:00Z', 'platform': 'Android OS', 'ms_played': 120000,
+            'spotify_track_uri': f'spotify:track:{track}', 'reason_end': 'trackdone', **extra,
+        }
+
+    def test_import_counts_every_outcome(self):
+        records = [
+            self._play('track0', 0),
+            self._play('track1', 1),
+            self._play('track1', 1),  # repetida dentro del mismo archivo
+            self._play('desconocida', 2),
+            {'ts': '2021-03-01T10:03:00Z', 'spotify_episode_uri': 'spotify:episode:abc'},
+        ]
+        stats = import_history(self.user, self._file(records), batch_size=2)
+        self.assertEqual(stats, {'read': 5, 'imported': 2, 'duplicates': 1, 'unresolved': 1, 'not_tracks': 1})
+        self.assertEqual(PlaybackHistory.objects.filter(user=self.user).count(), 2)
+
+    def test_reimport_counts_every_row_as_duplicate(self):
+        records = [self._play(f'track{i % 3}', i) for i in range(10)]
+        first = import_history(self.user, self._file(records), batch_size=4)
+        second = import_history(self.user, self._file(records), batch_size=3)
+
+        self.assertEqual(first['imported'], 10)
+        self.assertEqual(second['imported'], 0)
+        self.assertEqual(second['duplicates'], 10)
+        self.assertEqual(PlaybackHistory.objects.filter(user=self.user).count(), 10)
+
+
+class LibraryIndexQueryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = get_user_model().objects.create_user('biblioteca', 'biblioteca@example.com', 'clave')
+        rock = Artists.objects.create(name='Los Rockeros', data_source='test')
+        pop = Artists.objects.create(name='Canción Pop', data_source='test')
+        albums = [
+            Albums.objects.create(artist=rock, title='Ruido', release_year=1995, data_source='test'),
+            Albums.objects.create(artist=pop, title='Brillo', release_year=2015, data_source='test'),
+        ]
+        Songs.objects.bulk_create([
+            Songs(album=albums[i % 2], title=f'Tema {i:02d}', duration=(120 + i * 10) * 1000, popularity=i * 10,
+                  explicit_content=i % 3 == 0, spotify_id=f'song{i}', data_source='test')
+            for i in range(8)
+        ])
+        songs = list(Songs.objects.order_by('song_id'))
+        first = Playlist.objects.create(user=cls.user, name='Primera', spotify_id='list1')
+        second = Playlist.objects.create(user=cls.user, name='Segunda', spotify_id='list2')
+        start = datetime(2022, 1, 1, tzinfo=dt_timezone.utc)
+        PlaylistSong.objects.bulk_create(
+            [PlaylistSong(playlist=first, song=song, position=i, date_added=start + timedelta(days=i))
+             for i, song in enumerate(songs)]
+            + [PlaylistSong(playlist=second, song=song, position=i, date_added=start + timedelta(days=30 + i))
+               for i, song in enumerate(songs[:3])]
+        )
+
+    def setUp(self):
+        self.index = build_index(self.user)
+
+    def titles(self, **filters):
+        total, rows = self.index.query(**filters)
+        return total, [row['title'] for row in rows]
+
+    def test_each_song_once_with_first_added_date(self):
+        total, rows = self.index.query(page_size=100)
+        self.assertEqual(total, 8)
+        first = next(row for row in rows if row['title'] == 'Tema 00')
+        self.assertEqual(first['added_at'], int(datetime(2022, 1, 1, tzinfo=dt_timezone.utc).timestamp()))
+
+    def test_filters(self):
+        self.assertEqual(self.titles(q='tema 0', artist='rockeros')[1], ['Tema 00', 'Tema 02', 'Tema 04', 'Tema 06'])
+        self.assertEqual(self.titles(q='cancion')[0], 4)  # sin tilde ni mayúsculas
+        self.assertEqual(self.titles(album='brillo', year_min=2000)[0], 4)
+        self.assertEqual(self.titles(year_max=2000)[0], 4)
+        self.assertEqual(self.titles(playlist='list2')[1], ['Tema 00', 'Tema 01', 'Tema 02'])
+        self.assertEqual(self.titles(playlist='no-existe')[0], 0)
+        self.assertEqual(self.titles(duration_min=150, duration_max=170)[1], ['Tema 03', 'Tema 04', 'Tema 05'])
+        self.assertEqual(self.titles(popularity_min=60, explicit=True)[1], ['Tema 06'])
+
+    def test_sort_and_pagination(self):
+        total, page = self.titles(sort='title', descending=True, page=2, page_size=3)
+        self.assertEqual(total, 8)
+        self.assertEqual(page, ['Tema 04', 'Tema 03', 'Tema 02'])
+        self.assertEqual(self.titles(sort='popularity', page=3, page_size=3)[1], ['Tema 06', 'Tema 07'])
+        self.assertEqual(self.titles(page=5, page_size=3)[1], [])
+        self.assertEqual(self.titles(sort='artist', page_size=1)[1], ['Tema 01'])
+
+    def test_serialized_index_answers_the_same(self):
+        restored = LibraryIndex.from_bytes(self.index.to_bytes())
+        filters = {'q': 'tema', 'playlist': 'list1', 'sort': 'duration', 'descending': True, 'page_size': 5}
+        self.assertEqual(restored.query(**filters), self.index.query(**filters))
+
+
+class MergeDuplicatesTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        User = get_user_model()
+        cls.user = User.objects.create_user('fusion', 'fusion@example.com', 'clave')
+        cls.other = User.objects.create_user('otro', 'otro@example.com', 'clave')
+        artist = Artists.objects.create(name='Artista', data_source='test')
+        album = Albums.objects.create(artist=artist, title='Álbum', album_type='album', data_source='test')
+        single = Albums.objects.create(artist=artist, title='Single', album_type='single', data_source='test')
+        compilation = Albums.objects.create(artist=artist, title='Éxitos', album_type='compilation', data_source='test')
+        # La misma grabación en tres ediciones; la del álbum es la canónica.
+        cls.canonical = Songs.objects.create(album=album, title='Tema', duration=1, isrc='ISRC1',
+                                             spotify_id='original', data_source='test')
+        cls.single = Songs.objects.create(album=single, title='Tema', duration=1, isrc='ISRC1',
+                                          spotify_id='single', data_source='test')
+        cls.compilation = Songs.objects.create(album=compilation, title='Tema', duration=1, isrc='ISRC1',
+                                               spotify_id='recopilatorio', data_source='test')
+        cls.unrelated = Songs.objects.create(album=album, title='Otro', duration=1, isrc='ISRC2',
+                                             spotify_id='otro', data_source='test')
+        cls.mapping = {cls.single.pk: cls.canonical.pk, cls.compilation.pk: cls.canonical.pk}
+
+    def _playlist(self, user, spotify_id, songs):
+        playlist = Playlist.objects.create(user=user, name=spotify_id, spotify_id=spotify_id)
+        for position, song in enumerate(songs):
+            PlaylistSong.objects.create(playlist=playlist, song=song, position=position, date_added='2020-01-01T00:00:00Z')
+        return playlist
+
+    def test_drop_conflicts_keeps_one_row_per_owner(self):
+        both = self._playlist(self.user, 'ambas', [self.canonical, self.single, self.unrelated])
+        duplicates = self._playlist(self.user, 'duplicadas', [self.single, self.compilation])
+        alone = self._playlist(self.other, 'sola', [self.compilation])
+
+        canonical._drop_conflicts(PlaylistSong, 'playlist_id', self.mapping)
+
+        def songs(playlist):
+            return sorted(PlaylistSong.objects.filter(playlist=playlist).values_list('song_id', flat=True))
+        # Ya tenía la canónica: se borra el duplicado.
+        self.assertEqual(songs(both), sorted([self.canonical.pk, self.unrelated.pk]))
+        # Dos duplicados de la misma grabación: queda uno solo para reapuntar.
+        self.assertEqual(len(songs(duplicates)), 1)
+        # Sin conflicto: no se toca.
+        self.assertEqual(songs(alone), [self.compilation.pk])
+
+    def test_drop_conflicts_on_favorites(self):
+        UserFavoriteSong.objects.create(user=self.user, song=self.canonical)
+        UserFavoriteSong.objects.create(user=self.user, song=self.single)
+        UserFavoriteSong.objects.create(user=self.other, song=self.single)
+
+        canonical._drop_conflicts(UserFavoriteSong, 'user_id', self.mapping)
+
+        self.assertEqual(list(UserFavoriteSong.objects.filter(user=self.user).values_list('song_id', flat=True)),
+                         [self.canonical.pk])
+        self.assertEqual(list(UserFavoriteSong.objects.filter(user=self.other).values_list('song_id', flat=True)),
+                         [self.single.pk])
+
+    def test_merge_repoints_aliases_and_invalidates_libraries(self):
+        playlist = self._playlist(self.user, 'lista', [self.single, self.compilation, self.unrelated])
+        UserFavoriteSong.objects.create(user=self.other, song=self.compilation)
+        versions = {user.pk: get_library_version(user.pk) for user in (self.user, self.other)}
+
+        self.assertEqual(canonical.update_mapping(), 2)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(canonical.merge_duplicates(), 2)
+
+        self.assertEqual(sorted(PlaylistSong.objects.filter(playlist=playlist).values_list('song_id', flat=True)),
+                         sorted([self.canonical.pk, self.unrelated.pk]))
+        self.assertEqual(UserFavoriteSong.objects.get(user=self.other).song_id, self.canonical.pk)
+        self.assertFalse(Songs.objects.filter(pk__in=self.mapping).exists())
+        self.assertEqual(canonical.song_ids(['single', 'recopilatorio', 'original']),
+                         {'single': self.canonical.pk, 'recopilatorio': self.canonical.pk,
+                          'original': self.canonical.pk})
+        self.assertEqual(SongAlias.objects.count(), 2)
+        for user_id, version in versions.items():
+            self.assertNotEqual(get_library_version(user_id), version)
+        self.assertFalse(canonical.pending_merges().exists())
@@ -7,5 +7,10 @@ urlpatterns = [
     path('playlist/<str:playlist_id>/', views.playlist_detail_view, name='playlist_detail'),
     path('artist/<str:artist_id>/', views.artist_detail_view, name='artist_detail'),
     path('album/<str:album_id>/', views.album_detail_view, name='album_detail'),
+    path('song/<str:song_id>/similar/', views.similar_songs_view, name='similar_songs'),
     path('search/', views.search_view, name='search'),
+    path('library/', views.library_query_view, name='library_query'),
+    path('export/', views.export_library_view, name='export_library'),
+    path('history/import/', views.import_history_view, name='import_history'),
+    path('history/import/status/', views.import_history_status_view, name='import_history_status'),
 ]
\ No newline at end of file
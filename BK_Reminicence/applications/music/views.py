@@ -1,10 +1,54 @@
+import hashlib
+
+from django.conf import settings
+from django.http import HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, get_object_or_404
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_GET, require_POST
+from django.views.decorators.vary import vary_on_headers
+from . import export, history_import, similarity
 from .models import Playlist
 from applications.core.spotify_service import SpotifyService 
 
 
+def _playlist_stamps(request, playlist_id):
+    """
+    Marcas de versión de la playlist (snapshot de Spotify, última sincronización
+    y última modificación) con una sola consulta por índice, memorizadas en el
+    request para que ETag y Last-Modified no consulten dos veces.
+    """
+    if not hasattr(request, '_playlist_stamps'):
+        request._playlist_stamps = Playlist.objects.filter(
+            spotify_id=playlist_id, user=request.user
+        ).values_list('playlist_id', 'spotify_snapshot_id', 'last_sync_date', 'updated_at').first()
+    return request._playlist_stamps
+
+
+def _playlist_etag(request, playlist_id):
+    # Solo los fragmentos HTMX: la página completa incluye el token del reproductor, que caduca.
+    if not request.headers.get('HX-Request'):
+        return None
+    stamps = _playlist_stamps(request, playlist_id)
+    if not stamps:
+        return None
+    raw = '|'.join(str(value) for value in (request.user.pk, *stamps))
+    return hashlib.md5(raw.encode()).hexdigest()
+
+
+def _playlist_last_modified(request, playlist_id):
+    if not request.headers.get('HX-Request'):
+        return None
+    stamps = _playlist_stamps(request, playlist_id)
+    if not stamps:
+        return None
+    return max((stamp for stamp in stamps[2:] if stamp), default=None)
+
+
 @login_required
+@vary_on_headers('HX-Request')
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=_playlist_etag, last_modified_func=_playlist_last_modified)
 def playlist_detail_view(request, playlist_id):
     """
     Muestra los detalles y las canciones de una playlist específica.
@@ -73,12 +117,22 @@ def album_detail_view(request, album_id):
     except Exception as e:
         print(f"Error en album_detail_view: {e}")
 
+    # Vecinos precalculados por co-ocurrencia en playlists: una consulta, sin llamar a Spotify.
+    context['continue_listening'] = similarity.continue_listening(album_id)
+
     # Lógica para HTMX
     if request.headers.get('HX-Request'):
         return render(request, 'music/partials/_album_detail_content.html', context)
 
     return render(request, 'music/album_detail.html', context)
 
+@login_required
+@require_GET
+def similar_songs_view(request, song_id):
+    """Fragmento HTMX con las canciones más parecidas a una canción de Spotify."""
+    context = {'songs': similarity.similar_songs(song_id), 'title': 'Canciones similares'}
+    return render(request, 'music/partials/_similar_songs.html', context)
+
 @login_required
 def search_view(request):
     """
@@ -99,4 +153,99 @@ def search_view(request):
         return render(request, 'music/partials/_search_results.html', context)
     else:
         # Si es una carga normal, devuelve la página completa que tiene los CSS.
-        return render(request, 'music/search.html', context)
\ No newline at end of file
+        return render(request, 'music/search.html', context)
+
+
+@login_required
+@require_GET
+def export_library_view(request):
+    """
+    Descarga la biblioteca sincronizada del usuario (playlists, canciones en orden,
+    álbumes y artistas) en streaming: ``?format=jsonl`` o ``?format=zip`` (CSV).
+    """
+    fmt = request.GET.get('format', 'jsonl')
+    if fmt not in export.FORMATS:
+        return HttpResponseBadRequest("Formato no soportado; use jsonl o zip.")
+
+    response = StreamingHttpResponse(export.export_stream(request.user, fmt), content_type=export.FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{export.export_filename(request.user, fmt)}"'
+    return response
+
+
+@login_required
+@require_POST
+def import_history_view(request):
+    """
+    Recibe el historial extendido de Spotify (``file``: un JSON o el ZIP completo)
+    y lo importa en segundo plano; el avance se consulta en ``import_history_status``.
+    """
+    uploaded = request.FILES.get('file')
+    if uploaded is None:
+        return JsonResponse({'error': "Falta el archivo 'file'"}, status=400)
+    if uploaded.size > settings.HISTORY_IMPORT_MAX_UPLOAD_SIZE:
+        return JsonResponse({'error': 'El archivo es demasiado grande'}, status=413)
+    if not uploaded.name.lower().endswith(('.json', '.zip')):
+        return JsonResponse({'error': 'Se espera un archivo .json o .zip'}, status=400)
+
+    fetch_missing = request.POST.get('fetch_missing') in ('1', 'true', 'on')
+    if not history_import.start_import(request.user, uploaded, fetch_missing=fetch_missing):
+        return JsonResponse({'error': 'Ya hay una importación en curso'}, status=409)
+    return JsonResponse({'status': 'queued'}, status=202)
+
+
+@login_required
+@require_GET
+def import_history_status_view(request):
+    status = history_import.import_status(request.user.pk)
+    if status is None:
+        return JsonResponse({'status': 'none'})
+    return JsonResponse(status)
+
+
+def _optional_int(params, name):
+    value = params.get(name, '').strip()
+    return int(value) if value else None
+
+
+@login_required
+@require_GET
+def library_query_view(request):
+    """
+    Filtra, ordena y pagina toda la biblioteca del usuario (las canciones de
+    todas sus playlists) sobre el índice en memoria, sin consultar la base de
+    datos. ``?sort=-popularity`` ordena de forma descendente.
+    """
+    # NumPy solo se carga en los workers que atienden esta vista.
+    from . import library_index
+
+    params = request.GET
+    sort = params.get('sort', '-added_at')
+    descending = sort.startswith('-')
+    sort = sort.lstrip('-')
+    if sort not in library_index.SORT_FIELDS:
+        return JsonResponse({'error': f"Orden no soportado; use uno de {', '.join(library_index.SORT_FIELDS)}"},
+                            status=400)
+    explicit = params.get('explicit')
+    try:
+        filters = {
+            name: _optional_int(params, name)
+            for name in ('year_min', 'year_max', 'duration_min', 'duration_max', 'popularity_min')
+        }
+        page = _optional_int(params, 'page') or 1
+        page_size = _optional_int(params, 'page_size') or library_index.PAGE_SIZE
+    except ValueError:
+        return JsonResponse({'error': 'Los filtros numéricos deben ser enteros'}, status=400)
+
+    total, results = library_index.get_index(request.user).query(
+        q=params.get('q', '').strip(),
+        artist=params.get('artist', '').strip(),
+        album=params.get('album', '').strip(),
+        playlist=params.get('playlist') or None,
+        explicit=None if explicit in (None, '') else explicit in ('1', 'true'),
+        sort=sort,
+        descending=descending,
+        page=page,
+        page_size=page_size,
+        **filters,
+    )
+    return JsonResponse({'total': total, 'page': page, 'results': results})
@@ -1,14 +1,18 @@
 import requests
 import base64
+from email.utils import parsedate_to_datetime
+from django.utils import timezone
+from django.conf import settings
 from django.core.management.base import BaseCommand
+from applications.music.artist_lookup import find_artist
 from applications.music.models import Artists
-from BK_Reminicence.settings.base import *
+from applications.music.normalization import normalize_name
 
 # --- Funciones de la API ---
 
 def get_spotify_token():
-    client_id = get_secret("SPOTIFY_CLIENT_ID")
-    client_secret = get_secret("SPOTIFY_CLIENT_SECRET")
+    client_id = settings.SPOTIFY_CLIENT_ID
+    client_secret = settings.SPOTIFY_CLIENT_SECRET
     
     auth_string = f"{client_id}:{client_secret}"
     auth_bytes = auth_string.encode("utf-8")
@@ -25,28 +29,60 @@ def get_spotify_token():
     else:
         raise Exception(f"Error al obtener el token: {response.json()}")
 
-def search_and_save_artist(artist_name, access_token):
-    # Usa el nombre de tu modelo (Artist o Artists)
-    if Artists.objects.filter(name__iexact=artist_name).exists():
-        print(f"INFO: El artista '{artist_name}' ya existe en la base de datos.")
-        return Artists.objects.get(name__iexact=artist_name)
+# Tope de espera tras un 429: un Retry-After de horas dejaría la importación colgada.
+MAX_RETRY_AFTER = 120
 
-    print(f"INFO: Buscando a '{artist_name}' en Spotify...")
+
+def parse_retry_after(value, default=1):
+    """
+    Segundos de espera de un encabezado ``Retry-After`` (segundos o fecha
+    HTTP), acotados a ``[0, MAX_RETRY_AFTER]``; ``default`` si no se entiende.
+    """
+    try:
+        seconds = int(value)
+    except (TypeError, ValueError):
+        try:
+            seconds = int((parsedate_to_datetime(value) - timezone.now()).total_seconds())
+        except (TypeError, ValueError):
+            seconds = default
+    return min(max(seconds, 0), MAX_RETRY_AFTER)
+
+
+class SpotifyRateLimitError(Exception):
+    """Spotify respondió 429; ``retry_after`` indica los segundos a esperar."""
+
+    def __init__(self, retry_after):
+        super().__init__(f"Límite de peticiones de Spotify alcanzado, reintentar en {retry_after}s")
+        self.retry_after = retry_after
+
+
+def search_spotify_artist(artist_name, access_token, session=None):
+    """
+    Busca un artista por nombre y retorna el primer resultado crudo de la API
+    (o None si no hay coincidencias). Acepta una ``requests.Session`` para
+    reutilizar conexiones en importaciones masivas.
+    """
+    http = session or requests
     search_url = "https://api.spotify.com/v1/search"
     headers = {"Authorization": f"Bearer {access_token}"}
     params = {"q": artist_name, "type": "artist", "limit": 1}
-    
-    response = requests.get(search_url, headers=headers, params=params)
-    
-    if response.status_code != 200 or not response.json()['artists']['items']:
-        print(f"ERROR: No se pudo encontrar a '{artist_name}' en Spotify.")
-        return None
 
-    artist_data = response.json()['artists']['items'][0]
-    print(f"INFO: Artista encontrado: {artist_data['name']}")
-    
-    new_artist = Artists( # Usa el nombre de tu modelo
+    response = http.get(search_url, headers=headers, params=params, timeout=10)
+
+    if response.status_code == 429:
+        raise SpotifyRateLimitError(parse_retry_after(response.headers.get('Retry-After')))
+    response.raise_for_status()
+
+    items = response.json()['artists']['items']
+    return items[0] if items else None
+
+
+def build_artist(artist_data):
+    """Construye (sin guardar) un ``Artists`` a partir de la respuesta de Spotify."""
+    return Artists(
         name=artist_data.get('name'),
+        # bulk_create no pasa por save(): el nombre normalizado se asigna aquí.
+        normalized_name=normalize_name(artist_data.get('name')),
         spotify_id=artist_data.get('id'),
         image_url=artist_data['images'][0]['url'] if artist_data.get('images') else None,
         popularity=artist_data.get('popularity'),
@@ -54,6 +90,29 @@ def search_and_save_artist(artist_name, access_token):
         data_source='spotify'
     )
 
+
+def search_and_save_artist(artist_name, access_token):
+    # Una sola consulta sobre el índice de nombres normalizados
+    existing = find_artist(artist_name)
+    if existing:
+        print(f"INFO: El artista '{artist_name}' ya existe en la base de datos.")
+        return existing
+
+    print(f"INFO: Buscando a '{artist_name}' en Spotify...")
+    try:
+        artist_data = search_spotify_artist(artist_name, access_token)
+    except (SpotifyRateLimitError, requests.RequestException) as e:
+        print(f"ERROR: No se pudo buscar a '{artist_name}' en Spotify: {e}")
+        return None
+
+    if not artist_data:
+        print(f"ERROR: No se pudo encontrar a '{artist_name}' en Spotify.")
+        return None
+
+    print(f"INFO: Artista encontrado: {artist_data['name']}")
+    
+    new_artist = build_artist(artist_data)
+
     try:
         new_artist.save()
         print(f"SUCCESS: ¡Artista '{new_artist.name}' guardado en la base de datos con ID: {new_artist.artist_id}!") # O el nombre de tu PK
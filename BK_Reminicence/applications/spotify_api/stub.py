@@ -0,0 +1,276 @@
+# applications/spotify_api/stub.py
+"""
+Servidor local que imita la Web API de Spotify con una biblioteca generada.
+
+Se usa para benchmarks y pruebas de carga sin red: ``SpotifyStub`` levanta un
+``ThreadingHTTPServer`` en un hilo y responde con el mismo formato (y la misma
+paginación con ``next``) que la API real. Basta con apuntar
+``settings.SPOTIFY_API_PREFIX`` a ``stub.api_prefix``.
+"""
+
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta, timezone as dt_timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlparse
+
+_ALPHABET = '0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ'
+
+
+def _spotify_id(rng):
+    return ''.join(rng.choice(_ALPHABET) for _ in range(22))
+
+
+def generate_library(playlist_sizes, seed=42, saved_tracks=0, followed_artists=0):
+    """
+    Genera playlists con los tamaños indicados a partir de un catálogo común,
+    con solapamiento realista: pocos artistas concentran muchas canciones
+    (distribución de Zipf), cada artista tiene varios álbumes y las playlists
+    comparten canciones entre sí. Opcionalmente, canciones guardadas (de la
+    más reciente a la más antigua) y artistas seguidos.
+    """
+    rng = random.Random(seed)
+    total = max(sum(playlist_sizes), 1)
+    n_artists = max(total // 12, 5)
+    artists = []
+    for i in range(n_artists):
+        artist_id = _spotify_id(rng)
+        artists.append({
+            'id': artist_id,
+            'name': f"Artista {i}",
+            'uri': f"spotify:artist:{artist_id}",
+            'external_urls': {'spotify': f"https://open.spotify.com/artist/{artist_id}"},
+        })
+    artist_weights = [1 / (rank + 1) for rank in range(n_artists)]
+
+    albums_by_artist = {}
+    tracks = []
+    catalog_size = int(total * 1.3) + 10
+    for i in range(catalog_size):
+        artist = rng.choices(artists, weights=artist_weights)[0]
+        albums = albums_by_artist.setdefault(artist['id'], [])
+        if not albums or (len(albums) < 12 and rng.random() < 0.15):
+            year = rng.randint(1965, 2024)
+            albums.append({
+                'id': _spotify_id(rng),
+                'name': f"Álbum {len(albums) + 1} de {artist['name']}",
+                'album_type': rng.choice(['album', 'album', 'single', 'compilation']),
+                'release_date': f"{year}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+                'total_tracks': rng.randint(8, 16),
+                'images': [{'url': f"https://i.scdn.co/image/{_spotify_id(rng)}", 'height': 640, 'width': 640}],
+                'external_urls': {'spotify': 'https://open.spotify.com/album/x'},
+                'artists': [artist],
+            })
+        album = rng.choice(albums)
+        track_id = _spotify_id(rng)
+        tracks.append({
+            'id': track_id,
+            'name': f"Canción {i}",
+            'uri': f"spotify:track:{track_id}",
+            'duration_ms': rng.randint(90_000, 420_000),
+            'track_number': rng.randint(1, album['total_tracks']),
+            'disc_number': 1,
+            'explicit': rng.random() < 0.15,
+            'preview_url': None,
+            'popularity': rng.randint(0, 100),
+            'external_ids': {'isrc': f"US{rng.randint(0, 99999):05d}{i:05d}"[:12]},
+            'external_urls': {'spotify': f"https://open.spotify.com/track/{track_id}"},
+            'artists': [artist],
+            'album': album,
+        })
+
+    added = datetime(2020, 1, 1, tzinfo=dt_timezone.utc)
+    playlists = []
+    for n, size in enumerate(playlist_sizes):
+        playlist_id = _spotify_id(rng)
+        items = [{
+            'added_at': (added + timedelta(minutes=j)).isoformat().replace('+00:00', 'Z'),
+            'track': track,
+        } for j, track in enumerate(rng.sample(tracks, min(size, len(tracks))))]
+        playlists.append({
+            'id': playlist_id,
+            'name': f"Playlist {n + 1} ({size})",
+            'description': '',
+            'uri': f"spotify:playlist:{playlist_id}",
+            'snapshot_id': _spotify_id(rng),
+            'images': [{'url': f"https://mosaic.scdn.co/640/{playlist_id}"}],
+            'owner': {'display_name': 'Usuario de prueba'},
+            'tracks': {'total': len(items)},
+            'items': items,
+        })
+
+    saved_at = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+    saved = [{
+        'added_at': (saved_at - timedelta(hours=j)).isoformat().replace('+00:00', 'Z'),
+        'track': track,
+    } for j, track in enumerate(rng.sample(tracks, min(saved_tracks, len(tracks))))]
+    followed = sorted(rng.sample(artists, min(followed_artists, len(artists))), key=lambda artist: artist['id'])
+
+    return {'playlists': playlists, 'tracks': tracks, 'artists': artists,
+            'saved_tracks': saved, 'followed_artists': followed}
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status, body=None):
+        payload = json.dumps(body).encode() if body is not None else b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _route(self, method):
+        stub = self.server.stub
+        parsed = urlparse(self.path)
+        path = parsed.path.removeprefix('/v1/').strip('/')
+        params = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+        stub.record(method, path)
+        if stub.latency:
+            time.sleep(stub.latency)
+        try:
+            status, body = stub.handle(method, path, params)
+        except KeyError:
+            status, body = 404, {'error': {'status': 404, 'message': 'Not found.'}}
+        self._send(status, body)
+
+    def do_GET(self):
+        self._route('GET')
+
+    def do_PUT(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self._route('PUT')
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self._route('POST')
+
+
+class SpotifyStub:
+    """Servidor HTTP local con la biblioteca generada por ``generate_library``."""
+
+    def __init__(self, library, host='127.0.0.1', port=0, latency=0.0):
+        self.library = library
+        self.latency = latency
+        self.playlists = {pl['id']: pl for pl in library['playlists']}
+        self.tracks = {track['id']: track for track in library['tracks']}
+        self.lock = threading.Lock()
+        self.requests = Counter()
+        self.server = ThreadingHTTPServer((host, port), _Handler)
+        self.server.daemon_threads = True
+        self.server.stub = self
+        self.thread = None
+
+    @property
+    def api_prefix(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/v1/"
+
+    @property
+    def request_count(self):
+        with self.lock:
+            return sum(self.requests.values())
+
+    def record(self, method, path):
+        endpoint = re.sub(r'/[0-9A-Za-z]{22}(?=/|$)', '/{id}', '/' + path).lstrip('/')
+        with self.lock:
+            self.requests[f"{method} {endpoint}"] += 1
+
+    def reset_counts(self):
+        with self.lock:
+            self.requests.clear()
+
+    def start(self):
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _page(self, path, items, params, max_limit=50):
+        limit = min(int(params.get('limit', 20)), max_limit)
+        offset = int(params.get('offset', 0))
+        page = items[offset:offset + limit]
+        next_url = None
+        if offset + limit < len(items):
+            next_url = f"{self.api_prefix}{path}?{urlencode({'offset': offset + limit, 'limit': limit})}"
+        return {'items': page, 'total': len(items), 'limit': limit, 'offset': offset, 'next': next_url}
+
+    def _cursor_page(self, path, items, params, max_limit=50):
+        """Paginación por cursor ``after`` (el id del último elemento), como ``me/following``."""
+        limit = min(int(params.get('limit', 20)), max_limit)
+        after = params.get('after')
+        start = next((i + 1 for i, item in enumerate(items) if item['id'] == after), 0) if after else 0
+        page = items[start:start + limit]
+        next_url = None
+        if start + limit < len(items):
+            query = {'type': params.get('type', 'artist'), 'after': page[-1]['id'], 'limit': limit}
+            next_url = f"{self.api_prefix}{path}?{urlencode(query)}"
+        return {'items': page, 'total': len(items), 'limit': limit, 'next': next_url,
+                'cursors': {'after': page[-1]['id'] if page else None}}
+
+    def handle(self, method, path, params):
+        """Resuelve una petición; retorna ``(status, body)``. KeyError produce un 404."""
+        tracks = self.library['tracks']
+        segments = path.split('/')
+
+        if method != 'GET':
+            return 204, None
+        if path == 'me':
+            return 200, {'id': 'stub-user', 'display_name': 'Usuario de prueba', 'email': 'stub@example.com',
+                         'country': 'CO', 'followers': {'total': 0}, 'images': [], 'product': 'premium',
+                         'uri': 'spotify:user:stub-user'}
+        if path == 'me/playlists':
+            summaries = [{key: value for key, value in pl.items() if key != 'items'} for pl in self.library['playlists']]
+            return 200, self._page(path, summaries, params)
+        if segments[0] == 'playlists' and len(segments) == 3 and segments[2] in ('tracks', 'items'):
+            return 200, self._page(path, self.playlists[segments[1]]['items'], params, max_limit=100)
+        if path == 'me/tracks':
+            return 200, self._page(path, self.library.get('saved_tracks', []), params)
+        if path == 'me/following':
+            artists = [dict(artist, images=[], genres=[], popularity=50, followers={'total': 0})
+                       for artist in self.library.get('followed_artists', [])]
+            return 200, {'artists': self._cursor_page(path, artists, params)}
+        if path == 'me/top/tracks':
+            return 200, self._page(path, tracks[:50], params)
+        if path == 'me/top/artists':
+            artists = [dict(artist, images=[], genres=[], popularity=50) for artist in self.library['artists'][:50]]
+            return 200, self._page(path, artists, params)
+        if path == 'me/player':
+            track = tracks[int(time.time() // 180) % len(tracks)]
+            return 200, {'is_playing': True, 'progress_ms': 42_000, 'shuffle_state': False,
+                         'repeat_state': 'off', 'item': track}
+        if path == 'search':
+            query = params.get('q', '').lower()
+            limit = min(int(params.get('limit', 10)), 50)
+            matches = [track for track in tracks if query in track['name'].lower()] or tracks
+            artists = [dict(artist, images=[]) for artist in self.library['artists']]
+            albums = list({track['album']['id']: track['album'] for track in matches[:limit * 4]}.values())
+            return 200, {
+                'tracks': self._page(path, matches, params, max_limit=limit),
+                'artists': self._page(path, artists, params, max_limit=limit),
+                'albums': self._page(path, albums, params, max_limit=limit),
+                'playlists': self._page(path, [], params, max_limit=limit),
+            }
+        if path == 'me/player/recently-played':
+            now = datetime.now(dt_timezone.utc)
+            items = [{'track': track, 'played_at': (now - timedelta(minutes=i * 4)).isoformat()}
+                     for i, track in enumerate(tracks[:50])]
+            return 200, self._page(path, items, params)
+        raise KeyError(path)
@@ -11,6 +11,7 @@ urlpatterns = [
     path('callback/', views.spotify_callback_view, name='spotify_callback'),
     
     # Control del reproductor
+    path('player/token/', views.player_token, name='player_token'),
     path('player/current/', views.get_current_playback, name='player_current'),
     path('player/play/', views.play_spotify_uri, name='play_spotify_uri'),
     path('player/pause/', views.pause_playback, name='pause_playback'),
@@ -1,6 +1,5 @@
 # applications/spotify_api/utils.py (VERSIÓN CORREGIDA Y DEFINITIVA)
 
-import requests
 import base64
 import pytz # <-- AÑADIR ESTA LÍNEA
 from django.contrib.auth.models import User
@@ -8,9 +7,14 @@ from django.utils import timezone
 from datetime import timedelta
 from django.conf import settings
 from .models import SpotifyUserToken
+from applications.core.library_cache import bump_library_version
+from applications.core import metrics
+from applications.core.spotify_service import forget_access_token
 
 
 def get_spotify_user_profile(access_token):
+    import requests
+
     try:
         response = requests.get(
             'https://api.spotify.com/v1/me',
@@ -55,6 +59,8 @@ def save_spotify_tokens(user, access_token, refresh_token, expires_in, scope, sp
             'spotify_user_id': spotify_user_id,
         }
     )
+    forget_access_token(user.pk)
+    bump_library_version(user.pk)
 
 
 def refresh_spotify_token(user):
@@ -63,13 +69,18 @@ def refresh_spotify_token(user):
     except SpotifyUserToken.DoesNotExist:
         return None
 
+    import requests
+
     auth_str = f"{settings.SPOTIFY_CLIENT_ID}:{settings.SPOTIFY_CLIENT_SECRET}"
     auth_b64 = base64.b64encode(auth_str.encode()).decode()
     response = requests.post('https://accounts.spotify.com/api/token', data={
         'grant_type': 'refresh_token', 'refresh_token': token_instance.refresh_token,
     }, headers={'Authorization': f'Basic {auth_b64}'})
     
-    if response.status_code != 200: return None
+    if response.status_code != 200:
+        metrics.inc('spotify_token_refresh_total', result='error')
+        return None
+    metrics.inc('spotify_token_refresh_total', result='ok')
         
     token_data = response.json()
     access_token = token_data['access_token']
@@ -1,4 +1,3 @@
-import json
 from django.contrib import messages
 from django.shortcuts import redirect
 from django.conf import settings
@@ -8,7 +7,11 @@ from django.views.decorators.http import require_POST, require_http_methods
 from django.contrib.auth.decorators import login_required
 from django.views.decorators.csrf import csrf_exempt
 import urllib
-import requests
+from rest_framework.authentication import SessionAuthentication
+from rest_framework.decorators import api_view, authentication_classes, permission_classes
+from rest_framework.permissions import IsAuthenticated
+from rest_framework_simplejwt.authentication import JWTStatelessUserAuthentication
+from rest_framework_simplejwt.tokens import AccessToken
 from .models import SpotifyUserToken
 from applications.core.spotify_service import SpotifyService
 from .utils import get_spotify_user_profile, find_or_create_user_from_spotify, save_spotify_tokens, get_user_spotify_token
@@ -19,7 +22,7 @@ def spotify_login_view(request):
     """
     scope = (
         'user-read-private user-read-email '
-        'playlist-read-private user-library-read '
+        'playlist-read-private user-library-read user-follow-read '
         'user-top-read '
         'user-read-recently-played '
         'user-read-playback-state '
@@ -51,6 +54,8 @@ def spotify_callback_view(request):
         messages.error(request, 'Se canceló la autorización de Spotify.')
         return redirect('users:login')
 
+    import requests
+
     response = requests.post('https://accounts.spotify.com/api/token', data={
         'grant_type': 'authorization_code',
         'code': code,
@@ -114,7 +119,32 @@ def spotify_callback_view(request):
 # ===== VISTAS PARA EL CONTROL DEL REPRODUCTOR =====================
 # ===================================================================
 
+def player_endpoint(*methods):
+    """
+    Vista del reproductor: acepta la sesión o un token firmado de corta
+    duración (``Authorization: Bearer``, ver ``player_token``). Con el token,
+    el usuario sale de sus claims sin leer la sesión ni la tabla de usuarios,
+    y el token de Spotify sale de la caché (``get_access_token``): un comando
+    del reproductor no consulta la base de datos.
+    """
+    def decorator(view):
+        view = permission_classes([IsAuthenticated])(view)
+        view = authentication_classes([JWTStatelessUserAuthentication, SessionAuthentication])(view)
+        return api_view(methods)(view)
+    return decorator
+
+
 @login_required
+@require_POST
+def player_token(request):
+    """Emite el token del reproductor para el usuario de la sesión."""
+    token = AccessToken.for_user(request.user)
+    # Para que la auditoría registre el email sin cargar el usuario.
+    token['email'] = request.user.email
+    return JsonResponse({'token': str(token), 'expires_in': int(token.lifetime.total_seconds())})
+
+
+@player_endpoint('GET')
 def get_current_playback(request):
     """Obtiene el estado actual de reproducción"""
     try:
@@ -143,8 +173,7 @@ def get_current_playback(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
-@login_required
-@require_POST
+@player_endpoint('POST')
 def play_spotify_uri(request):
     """Inicia la reproducción de una canción/playlist/álbum específico"""
     try:
@@ -152,7 +181,7 @@ def play_spotify_uri(request):
         if not spotify_service.sp: 
             return JsonResponse({'error': 'Spotify connection failed'}, status=503)
         
-        data = json.loads(request.body) if request.body else {}
+        data = request.data
         device_id = data.get('device_id')
         uri_to_play = data.get('uri')
         context_uri = data.get('context_uri')
@@ -179,8 +208,7 @@ def play_spotify_uri(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
-@login_required
-@require_POST
+@player_endpoint('POST')
 def pause_playback(request):
     """Pausa la reproducción"""
     try:
@@ -188,15 +216,14 @@ def pause_playback(request):
         if not spotify_service.sp: 
             return JsonResponse({'error': 'Spotify connection failed'}, status=503)
         
-        data = json.loads(request.body) if request.body else {}
+        data = request.data
         spotify_service.sp.pause_playback(device_id=data.get('device_id'))
         return JsonResponse({'status': 'success'})
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
-@login_required
-@require_POST
+@player_endpoint('POST')
 def next_track(request):
     """Salta a la siguiente canción"""
     try:
@@ -204,15 +231,14 @@ def next_track(request):
         if not spotify_service.sp: 
             return JsonResponse({'error': 'Spotify connection failed'}, status=503)
         
-        data = json.loads(request.body) if request.body else {}
+        data = request.data
         spotify_service.sp.next_track(device_id=data.get('device_id'))
         return JsonResponse({'status': 'success'})
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
-@login_required
-@require_POST
+@player_endpoint('POST')
 def previous_track(request):
     """Vuelve a la canción anterior"""
     try:
@@ -220,15 +246,14 @@ def previous_track(request):
         if not spotify_service.sp: 
             return JsonResponse({'error': 'Spotify connection failed'}, status=503)
         
-        data = json.loads(request.body) if request.body else {}
+        data = request.data
         spotify_service.sp.previous_track(device_id=data.get('device_id'))
         return JsonResponse({'status': 'success'})
     except Exception as e:
         return JsonResponse({'error': str(e)}, status=500)
 
 
-@login_required
-@require_POST
+@player_endpoint('POST')
 def seek_in_track(request):
     """Salta a una posición específica en la canción"""
     try:
@@ -236,7 +261,7 @@ def seek_in_track(request):
         if not spotify_service.sp: 
             return JsonResponse({'error': 'Spotify connection failed'}, status=503)
         
-        data = json.loads(request.body)
+        data = request.data
         position_ms = int(data.get('position_ms'))
         
         if position_ms is None:
@@ -248,8 +273,7 @@ def seek_in_track(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
-@login_required
-@require_POST
+@player_endpoint('POST')
 def shuffle_playback(request):
     """Activa o desactiva el modo aleatorio"""
     try:
@@ -257,7 +281,7 @@ def shuffle_playback(request):
         if not spotify_service.sp: 
             return JsonResponse({'error': 'Spotify connection failed'}, status=503)
         
-        data = json.loads(request.body)
+        data = request.data
         shuffle_state = bool(data.get('state'))
         
         spotify_service.sp.shuffle(shuffle_state, device_id=data.get('device_id'))
@@ -266,8 +290,7 @@ def shuffle_playback(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
-@login_required
-@require_POST
+@player_endpoint('POST')
 def repeat_playback(request):
     """Cambia el modo de repetición: off -> context -> track"""
     try:
@@ -275,7 +298,7 @@ def repeat_playback(request):
         if not spotify_service.sp: 
             return JsonResponse({'error': 'Spotify connection failed'}, status=503)
         
-        data = json.loads(request.body)
+        data = request.data
         repeat_state = data.get('state')
         
         if repeat_state not in ['off', 'context', 'track']:
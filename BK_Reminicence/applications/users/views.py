@@ -6,6 +6,9 @@ from django.urls import reverse_lazy
 from django.views.generic.edit import CreateView
 from applications.spotify_api.models import SpotifyUserToken
 from applications.users.forms import UserProfileUpdateForm, UserRegisterForm
+from applications.core.dashboard import clear_snapshot
+from applications.core.spotify_service import forget_access_token
+from applications.core.library_cache import bump_library_version
 from django.contrib.auth.decorators import login_required
 
 
@@ -130,6 +133,9 @@ def unlink_spotify_view(request):
         try:
             token = SpotifyUserToken.objects.get(user=request.user)
             token.delete()
+            forget_access_token(request.user.pk)
+            clear_snapshot(request.user.pk)
+            bump_library_version(request.user.pk)
             messages.success(request, 'Tu cuenta de Spotify ha sido desvinculada correctamente.', extra_tags='settings_page')
         except SpotifyUserToken.DoesNotExist:
             messages.warning(request, 'Tu cuenta no estaba vinculada a Spotify.', extra_tags='settings_page')
@@ -167,24 +167,55 @@ const stopProgressUpdate = () => {
 const getCookie = name => document.cookie.match(`(^|;)\\s*${name}\\s*=\\s*([^;]+)`)?.pop() || '';
 
 // Realizar petición a la API
-const apiRequest = async (url, method = 'POST', body = {}) => {
-    const csrftoken = getCookie('csrftoken');
-    
+// Token firmado del reproductor (spotify_api:player_token): los comandos se
+// autentican con él sin cargar la sesión. Se renueva un minuto antes de caducar.
+let playerToken = null;
+let playerTokenExpiresAt = 0;
+
+const getPlayerToken = async () => {
+    if (playerToken && Date.now() < playerTokenExpiresAt) {
+        return playerToken;
+    }
+    try {
+        const response = await fetch('/spotify/player/token/', {
+            method: 'POST',
+            headers: { 'X-CSRFToken': getCookie('csrftoken') }
+        });
+        if (!response.ok) return null;
+        const data = await response.json();
+        playerToken = data.token;
+        playerTokenExpiresAt = Date.now() + (data.expires_in - 60) * 1000;
+        return playerToken;
+    } catch (error) {
+        console.error('Error obteniendo el token del reproductor:', error);
+        return null;
+    }
+};
+
+const apiRequest = async (url, method = 'POST', body = {}, retry = true) => {
     if (webPlaybackDeviceId) {
         body.device_id = webPlaybackDeviceId;
     }
     
+    // Sin token se usa la sesión, como antes.
+    const token = await getPlayerToken();
+    const headers = token
+        ? { 'Authorization': `Bearer ${token}` }
+        : { 'X-CSRFToken': getCookie('csrftoken') };
+    headers['Content-Type'] = 'application/json';
+
     const options = {
         method,
-        headers: {
-            'X-CSRFToken': csrftoken,
-            'Content-Type': 'application/json'
-        },
+        headers,
         body: JSON.stringify(body)
     };
     
     try {
         const response = await fetch(url, options);
+        if (response.status === 401 && token && retry) {
+            playerToken = null;
+            return apiRequest(url, method, body, false);
+        }
         if (!response.ok && response.status !== 204) {
             const errorData = await response.json().catch(() => ({}));
             throw new Error(errorData.error || `API request failed: ${response.status}`);
@@ -199,7 +230,8 @@ const apiRequest = async (url, method = 'POST', body = {}) => {
 // Manejar click en canciones
 const handleTrackClick = async (event) => {
     const clickableElement = event.target.closest('[data-spotify-uri]');
-    if (!clickableElement) return;
+    // El botón de canciones similares va dentro de la fila pero no la reproduce.
+    if (!clickableElement || event.target.closest('.similar-songs-button')) return;
 
     if (!webPlaybackDeviceId) {
         alert("El reproductor web no está listo. Por favor, asegúrate de tener Spotify Premium e inténtalo de nuevo en un momento.");